@@ -24,7 +24,8 @@ class MonitorsConfig(AppConfig):
             'handlers': {
                 'file': {
                     'level': 'INFO',
-                    'class': 'logging.FileHandler',
+                    # Several processes append to this file, logrotate renames it and each reopens it
+                    'class': 'logging.handlers.WatchedFileHandler',
                     'filename': log_file,
                     'formatter': 'verbose',
                 },
@@ -0,0 +1,170 @@
+import heapq
+import ipaddress
+import itertools
+import logging
+import time
+from collections import defaultdict
+
+logger = logging.getLogger('monitors')
+
+
+class TokenBucket:
+    """
+    Token bucket evaluated in virtual time.
+
+    Tokens refill at ``rate`` per second up to ``burst``. Instead of sleeping,
+    callers ask when the next token is available and then consume it at that
+    time, which lets a whole cycle be planned up front.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1 / rate
+        self.tolerance = (burst - 1) * self.interval
+        self.theoretical_arrival = 0.0
+
+    def available_at(self, now):
+        return max(now, self.theoretical_arrival - self.tolerance)
+
+    def consume(self, at):
+        self.theoretical_arrival = max(self.theoretical_arrival, at) + self.interval
+
+
+def subnet_key(address):
+    """The /24 (IPv4) or /64 (IPv6) network an address belongs to"""
+    try:
+        ip = ipaddress.ip_address(address)
+    except (TypeError, ValueError):
+        return address
+    prefix = 24 if ip.version == 4 else 64
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+class DispatchPlan:
+    """Send offsets for one cycle plus bookkeeping of when probes actually went out"""
+
+    def __init__(self, offsets, ideal_offsets, rate):
+        self.offsets = offsets
+        self.ideal_offsets = ideal_offsets
+        self.rate = rate
+        self.order = sorted(range(len(offsets)), key=offsets.__getitem__)
+        self.sent_at = [None] * len(offsets)
+        self.started = None
+
+    def start(self, now=None):
+        self.started = time.monotonic() if now is None else now
+
+    def due(self, index):
+        """Monotonic time at which the probe at index should be sent"""
+        return self.started + self.offsets[index]
+
+    def mark_sent(self, index, now=None):
+        self.sent_at[index] = (time.monotonic() if now is None else now) - self.started
+
+    def stats(self):
+        sent = [(index, at) for index, at in enumerate(self.sent_at) if at is not None]
+        if not sent:
+            return {
+                'probes': 0, 'budget_rate': self.rate, 'achieved_rate': 0,
+                'duration': 0, 'queue_delay_avg': 0, 'queue_delay_max': 0, 'lag_max': 0,
+            }
+
+        first = min(at for _, at in sent)
+        last = max(at for _, at in sent)
+        queue_delays = [at - self.ideal_offsets[index] for index, at in sent]
+        lags = [at - self.offsets[index] for index, at in sent]
+        duration = last - first
+
+        return {
+            'probes': len(sent),
+            'budget_rate': round(self.rate, 2),
+            'achieved_rate': round((len(sent) - 1) / duration, 2) if duration > 0 else len(sent),
+            'duration': round(duration, 3),
+            # Time a probe was held back beyond its evenly spread slot (rate caps, slow sends)
+            'queue_delay_avg': round(max(0, sum(queue_delays) / len(queue_delays)), 4),
+            'queue_delay_max': round(max(0, max(queue_delays)), 4),
+            # How late the sender ran against the plan
+            'lag_max': round(max(0, max(lags)), 4),
+        }
+
+
+class PacedDispatcher:
+    """
+    Spread a cycle's probes evenly across the monitoring window.
+
+    The global rate defaults to whatever spreads the host set over ``window``
+    seconds; ``max_rate`` caps it. Optional per-region and per-/24 caps keep
+    one gateway or one cloud region from seeing the whole burst.
+    """
+
+    def __init__(self, window, max_rate=0, region_rate=0, subnet_rate=0, burst=1):
+        self.window = window
+        self.max_rate = max_rate
+        self.region_rate = region_rate
+        self.subnet_rate = subnet_rate
+        self.burst = burst
+
+    @staticmethod
+    def interleave(targets):
+        """Round robin over /24s so neighbouring addresses are not probed back to back"""
+        groups = defaultdict(list)
+        for index, (address, _) in enumerate(targets):
+            groups[subnet_key(address)].append(index)
+        order = itertools.zip_longest(*groups.values())
+        return [index for row in order for index in row if index is not None]
+
+    def plan(self, targets):
+        """
+        Plan send offsets for a list of (address, region) targets.
+
+        Global slots are handed out in interleaved order. A target whose region
+        or /24 cap is not ready yet waits for a later slot and the slot goes to
+        the next target, so one capped group only delays its own probes.
+        Returns a DispatchPlan whose offsets are seconds from cycle start,
+        aligned with targets.
+        """
+        count = len(targets)
+        rate = count / self.window if count else 1
+        if self.max_rate:
+            rate = min(rate, self.max_rate)
+
+        overall = TokenBucket(rate, self.burst)
+        regions = defaultdict(lambda: TokenBucket(self.region_rate, self.burst))
+        subnets = defaultdict(lambda: TokenBucket(self.subnet_rate, self.burst))
+
+        offsets = [0.0] * count
+        ideal_offsets = [0.0] * count
+        order = self.interleave(targets)
+        deferred = []  # (ready, position, index) of capped targets waiting for their group
+        position = 0
+        while position < count or deferred:
+            now = overall.available_at(0.0)
+            if deferred and (deferred[0][0] <= now or position == count):
+                ready, waiting, index = heapq.heappop(deferred)
+                now = max(now, ready)
+            else:
+                waiting, index = position, order[position]
+                position += 1
+
+            address, region = targets[index]
+            caps = []
+            if self.region_rate:
+                caps.append(regions[region or ''])
+            if self.subnet_rate:
+                caps.append(subnets[subnet_key(address)])
+            ready = max((bucket.available_at(now) for bucket in caps), default=now)
+            if ready > now:
+                heapq.heappush(deferred, (ready, waiting, index))
+                continue
+
+            for bucket in (overall, *caps):
+                bucket.consume(now)
+            offsets[index] = now
+            ideal_offsets[index] = waiting / rate
+
+        if count and max(offsets) > self.window:
+            logger.warning(
+                f"Probe rate caps stretch {count} probes past the {self.window}s window "
+                f"(last probe at {max(offsets):.1f}s)"
+            )
+
+        return DispatchPlan(offsets, ideal_offsets, rate)
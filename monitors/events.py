@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from django.db.models import Count, Q
+from website.models import Hosts
+
+logger = logging.getLogger('monitors')
+
+
+def fleet_summary():
+    """Every host counter the pages show, from one conditional aggregation over Hosts"""
+    monitored = Q(is_monitored=True)
+    return Hosts.objects.aggregate(
+        host_count=Count('id'),
+        monitored_count=Count('id', filter=monitored),
+        unmonitored_count=Count('id', filter=Q(is_monitored=False)),
+        monitored_active_count=Count('id', filter=monitored & Q(is_active=True)),
+        monitored_inactive_count=Count('id', filter=monitored & Q(is_active=False)),
+        monitored_has_allotment_count=Count('id', filter=monitored & Q(downtime_allotment__gt=0)),
+        monitored_has_no_allotment_count=Count('id', filter=monitored & Q(downtime_allotment=0)),
+    )
+
+
+def cycle_event_path(shard):
+    return os.path.join(settings.MONITOR_EVENTS_DIR, f'cycle-{shard}.json')
+
+
+def publish_cycle_event(shard, slot, summary, changed, version=None):
+    """
+    Replace a shard's cycle event file.
+
+    Web workers watch MONITOR_EVENTS_DIR and push each new file to their
+    Server-Sent Events clients. The newest event's summary also stands in
+    for the host counters until it is older than MONITOR_COUNTS_MAX_AGE or
+    hosts changed after the hosts change version it was taken at. The file
+    is swapped in with a rename so a reader never sees half of it.
+    """
+    event = {
+        'id': f'{slot}-{shard}',
+        'shard': shard,
+        'slot': slot,
+        'published': time.time(),
+        'hosts_change_version': version,
+        'summary': summary,
+        'changed': [
+            {
+                'uuid': str(host.uuid),
+                'host_name': host.host_name,
+                'is_active': host.is_active,
+                'downtime_allotment': host.downtime_allotment,
+                'last_check': host.last_check.isoformat() if host.last_check else None,
+            }
+            for host in changed
+        ],
+    }
+    os.makedirs(settings.MONITOR_EVENTS_DIR, exist_ok=True)
+    path = cycle_event_path(shard)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(event, file, separators=(',', ':'))
+    os.replace(temporary, path)
+    return event
+
+
+def read_cycle_events(mtimes=None):
+    """
+    Cycle events of every shard, or with mtimes only those whose file changed.
+
+    mtimes maps file names to the modification time they were last read at
+    and is updated in place.
+    """
+    events = []
+    try:
+        entries = list(os.scandir(settings.MONITOR_EVENTS_DIR))
+    except FileNotFoundError:
+        return events
+
+    for entry in entries:
+        if not (entry.name.startswith('cycle-') and entry.name.endswith('.json')):
+            continue
+        try:
+            mtime = entry.stat().st_mtime_ns
+            if mtimes is not None:
+                if mtimes.get(entry.name) == mtime:
+                    continue
+                mtimes[entry.name] = mtime
+            with open(entry.path) as file:
+                events.append(json.load(file))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read cycle event {entry.name}: {str(e)}")
+    return sorted(events, key=lambda event: (event['slot'], event['shard']))
+
+
+latest_events = {}  # shard -> last event read by this process
+latest_mtimes = {}
+latest_lock = threading.Lock()
+
+def latest_cycle_event():
+    """The most recent cycle event of any shard, files are only reread when they change"""
+    with latest_lock:
+        for event in read_cycle_events(latest_mtimes):
+            latest_events[event['shard']] = event
+        if not latest_events:
+            return None
+        return max(latest_events.values(), key=lambda event: event.get('published', 0))
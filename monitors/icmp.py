@@ -3,64 +3,245 @@ import platform
 import time
 import logging
 import multiprocessing
+import functools
 import signal
 import sys
+import django
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from website.models import Hosts
+from monitors.models import MonitorStatus
 from rrd.services import RRDService
-import statistics
-from datetime import datetime
+from rrd.writer import RRDUpdateQueue
+from monitors.prober import ICMPSocketProber
+from monitors.dispatch import PacedDispatcher
+from monitors.scheduler import CycleScheduler
+from monitors.sharding import HashRing, stable_hash
+from monitors.registry import HostRegistry
+from monitors.events import fleet_summary, publish_cycle_event
+import os
+import re
+from collections import defaultdict
+from datetime import timedelta
 
 logger = logging.getLogger('monitors')
 
+# Data sources of the per-shard self-metrics RRD, in DS order
+SELF_METRICS = [
+    'cycle_time', 'registry_time', 'probe_time', 'status_time', 'db_time', 'rrd_time',
+    'probes', 'timeouts', 'db_rows', 'rrd_updates', 'lag', 'overruns',
+]
+
+def self_metrics_file(shard=0):
+    """RRD file holding a shard's own cycle metrics, kept next to monitors_aggregate_icmp"""
+    return 'monitors_self_icmp' if shard == 0 else f'monitors_self_icmp_shard{shard}'
+
+# Host fields the monitor keeps aggregate RRDs for, by group kind
+AGGREGATE_GROUPS = {
+    'region': 'region',
+    'account': 'account_id',
+}
+
+def group_rrd_file(kind, key):
+    """RRD file of one region or account aggregate, keys that are not file-name safe get a hash suffix"""
+    key = str(key or '')
+    if not key:
+        return f'monitors_aggregate_icmp_{kind}_unassigned'
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', key)
+    if safe != key:
+        safe = f'{safe}-{stable_hash(key) & 0xFFFFFFFF:08x}'
+    return f'monitors_aggregate_icmp_{kind}_{safe}'
+
+def aggregate_values(hosts, active, latency_sum):
+    """(uptime %, average latency of active hosts) for a set of hosts"""
+    if hosts == 0:
+        return 0, 0
+    return round((active / hosts) * 100, 4), round(latency_sum / active if active else 0, 4)
+
+def dispatch_window(interval, timeout):
+    """Seconds probes are spread over, MONITOR_DISPATCH_FRACTION of the interval and never into the last timeout"""
+    return max(1, min(interval * settings.MONITOR_DISPATCH_FRACTION, interval - timeout / 1000))
+
+def ping_address(address, timeout=2000):
+    """Ping a single address with the system ping command and return (is_active, latency)"""
+    try:
+        # Different ping commands for different OS
+        if platform.system().lower() == "windows":
+            ping_cmd = ['ping', '-n', '1', '-w', str(timeout), address]
+        else:
+            ping_cmd = ['ping', '-c', '1', '-W', str(timeout // 1000), address]
+
+        result = subprocess.run(ping_cmd, capture_output=True, text=True)
+
+        if result.returncode == 0:
+            # Extract latency from output
+            if platform.system().lower() == "windows":
+                # Windows format: "time=123ms"
+                latency_str = result.stdout.split("time=")[-1].split("ms")[0]
+            else:
+                # Unix format: "time=123.456 ms"
+                latency_str = result.stdout.split("time=")[-1].split(" ms")[0]
+
+            try:
+                latency = round(float(latency_str), 4)
+                return True, latency
+            except ValueError:
+                logger.error(f"Failed to parse latency for address {address}: {latency_str}")
+                return False, 0
+        else:
+            return False, 0
+
+    except Exception as e:
+        logger.error(f"Error pinging address {address}: {str(e)}")
+        return False, 0
+
+def ping_target(target, timeout=2000):
+    """Pool worker entry point, pings a (uuid, address) target and returns (uuid, (is_active, latency))"""
+    uuid, address = target
+    return uuid, ping_address(address, timeout)
+
 class ICMPMonitor:
-    def __init__(self):
+    def __init__(self, shard=0):
+        self.shard = shard
         self.rrd_service = RRDService()
-        self.timeout = 2000  # 2000ms timeout
+        self.rrd_queue = RRDUpdateQueue(self.rrd_service)
+        self.timeout = settings.MONITOR_PROBE_TIMEOUT  # milliseconds
+        self.prober = None
+        self.pool = None
+        self.dispatch_stats = None
+        self.write_time = None
+        # This shard's aggregate partials by slot, the last two are published with the heartbeat
+        self.partials = {}
+        self.registry = HostRegistry()
+        self.scheduler = None
+        self.cycle_stats = None
+        self.rrd_written = 0
+        self.ring = None
+        self.owners = {}
+        # Rows per UPDATE, stays under SQLite's bound parameter limit
+        self.write_batch_size = 500
+
+        # Spread probes over part of the interval, the last probe must be able to time out
+        # and the cycle's writes must finish before the next slot starts
+        self.dispatcher = PacedDispatcher(
+            window=dispatch_window(settings.MONITOR_INTERVAL, self.timeout),
+            max_rate=settings.MONITOR_PROBE_RATE,
+            region_rate=settings.MONITOR_REGION_PROBE_RATE,
+            subnet_rate=settings.MONITOR_SUBNET_PROBE_RATE,
+        )
+
+        self.ensure_self_metrics_file()
+
+        if settings.MONITOR_PROBE_ENGINE == 'socket':
+            try:
+                self.prober = ICMPSocketProber(timeout=self.timeout)
+            except OSError as e:
+                logger.warning(f"ICMP socket unavailable ({str(e)}), falling back to ping subprocesses")
 
     def ping_host(self, host):
         """Ping a single host and return (is_active, latency)"""
-        try:
-            # Different ping commands for different OS
-            if platform.system().lower() == "windows":
-                ping_cmd = ['ping', '-n', '1', '-w', str(self.timeout), host.host_ip_address]
-            else:
-                ping_cmd = ['ping', '-c', '1', '-W', str(self.timeout // 1000), host.host_ip_address]
+        return ping_address(host.host_ip_address, self.timeout)
 
-            result = subprocess.run(ping_cmd, capture_output=True, text=True)
+    def get_pool(self):
+        """The daemon's long-lived ping worker pool, created on first use"""
+        if self.pool is None:
+            # Recycled workers are started while the daemon holds database connections and runs
+            # the RRD writer thread, so they come from a clean server process instead of a fork
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self.pool = multiprocessing.get_context(method).Pool(
+                processes=settings.MONITOR_WORKERS,
+                maxtasksperchild=settings.MONITOR_WORKER_MAX_TASKS,
+                initializer=django.setup,
+            )
+            logger.info(
+                f"Started ping worker pool with {settings.MONITOR_WORKERS} workers "
+                f"(recycled every {settings.MONITOR_WORKER_MAX_TASKS} tasks)"
+            )
+        return self.pool
 
-            if result.returncode == 0:
-                # Extract latency from output
-                if platform.system().lower() == "windows":
-                    # Windows format: "time=123ms"
-                    latency_str = result.stdout.split("time=")[-1].split("ms")[0]
-                else:
-                    # Unix format: "time=123.456 ms"
-                    latency_str = result.stdout.split("time=")[-1].split(" ms")[0]
-
-                try:
-                    latency = round(float(latency_str), 4)
-                    return True, latency
-                except ValueError:
-                    logger.error(f"Failed to parse latency for host {host.host_name}: {latency_str}")
-                    return False, 0
-            else:
-                return False, 0
+    def close(self):
+        """Flush pending RRD updates, shut down the worker pool and probe socket"""
+        self.rrd_queue.close()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.prober is not None:
+            self.prober.close()
 
-        except Exception as e:
-            logger.error(f"Error pinging host {host.host_name}: {str(e)}")
-            return False, 0
+    def ping_with_pool(self, targets, plan=None):
+        """
+        Ping (index, uuid, address) targets with ping subprocesses, paced by plan when given.
+
+        Only the (uuid, address) pair crosses the process boundary.
+        Returns {index: (is_active, latency)}.
+        """
+        pool = self.get_pool()
+        ping = functools.partial(ping_target, timeout=self.timeout)
+        indices = {uuid: index for index, uuid, _ in targets}
+
+        if plan is None:
+            pinged = pool.map(ping, [(uuid, address) for _, uuid, address in targets])
+            return {indices[uuid]: result for uuid, result in pinged}
+
+        pending = []
+        wanted = {index: (uuid, address) for index, uuid, address in targets}
+        plan.start()
+        for index in plan.order:
+            if index not in wanted:
+                continue
+            delay = plan.due(index) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pending.append(pool.apply_async(ping, (wanted[index],)))
+            plan.mark_sent(index)
+
+        return {indices[uuid]: result for uuid, result in (item.get() for item in pending)}
+
+    def probe_hosts(self, hosts):
+        """Probe all hosts, returns a list of (is_active, latency) aligned with hosts"""
+        addresses = [host.host_ip_address for host in hosts]
+        plan = self.dispatcher.plan([(host.host_ip_address, host.region) for host in hosts])
+
+        if self.prober is not None:
+            results = self.prober.probe(addresses, plan)
+            # Anything the socket prober could not handle (IPv6, hostnames) goes through ping
+            fallback = [index for index, result in enumerate(results) if result is None]
+            if fallback:
+                targets = [(index, str(hosts[index].uuid), addresses[index]) for index in fallback]
+                for index, result in self.ping_with_pool(targets).items():
+                    results[index] = result
+        else:
+            targets = [(index, str(host.uuid), host.host_ip_address) for index, host in enumerate(hosts)]
+            pinged = self.ping_with_pool(targets, plan)
+            results = [pinged[index] for index in range(len(hosts))]
+
+        self.dispatch_stats = plan.stats()
+        logger.info(
+            f"Probe dispatch: {self.dispatch_stats['probes']} probes in {self.dispatch_stats['duration']}s, "
+            f"rate={self.dispatch_stats['achieved_rate']}/s (budget {self.dispatch_stats['budget_rate']}/s), "
+            f"queue_delay avg={self.dispatch_stats['queue_delay_avg']}s max={self.dispatch_stats['queue_delay_max']}s"
+        )
+        return results
+
+    def update_host_status(self, host, is_active, latency, checked_at, timestamp=None):
+        """
+        Apply a probe result to the in-memory host and its RRD.
 
-    def update_host_status(self, host, is_active, latency):
-        """Update host status in database and RRD"""
+        The database write is deferred to save_host_statuses. Returns True when
+        is_active or downtime_allotment changed.
+        """
+        was_active = host.is_active
+        was_allotment = host.downtime_allotment
         try:
             # If the host is down, check and update downtime allotment
             if not is_active:
                 original_allotment = host.downtime_allotment or 0
 
                 if original_allotment > 0:
-                    # Use up 30 seconds of allotment, but keep host up even if it hits zero
-                    new_allotment = max(0, original_allotment - 30)
+                    # Use up one interval of allotment, but keep host up even if it hits zero
+                    new_allotment = max(0, original_allotment - settings.MONITOR_INTERVAL)
                     host.downtime_allotment = new_allotment
                     logger.info(
                         f"Host {host.host_name} is DOWN, using downtime allotment ({original_allotment} -> {new_allotment}). Not marking as down yet."
@@ -72,13 +253,11 @@ class ICMPMonitor:
                         f"Host {host.host_name} is DOWN. Downtime allotment depleted. Marking as down."
                     )
 
-            # Update database
             host.is_active = is_active
-            host.last_check = datetime.now()
-            host.save()
+            host.last_check = checked_at
 
-            # Update RRD
-            self.rrd_service.update_rrd_file(host.uuid, 100 if is_active else 0, latency)
+            # Queue the RRD update for the writer thread
+            self.rrd_queue.submit(host.uuid, 100 if is_active else 0, latency, timestamp)
 
             logger.info(
                 f"Updated host {host.host_name}: active={is_active}, latency={latency}ms, downtime_allotment={host.downtime_allotment}"
@@ -86,87 +265,311 @@ class ICMPMonitor:
         except Exception as e:
             logger.error(f"Failed to update host {host.host_name}: {str(e)}")
 
-    def run(self):
-        """Run the ICMP monitor"""
-        logger.info("Starting ICMP monitor run")
+        return host.is_active != was_active or host.downtime_allotment != was_allotment
+
+    def save_host_statuses(self, changed, unchanged, checked_at):
+        """
+        Write a cycle's host states back in one transaction.
+
+        Changed hosts get a bulk UPDATE of is_active, last_check and
+        downtime_allotment, the rest only have last_check bumped in grouped
+        UPDATE ... WHERE id IN (...) statements. Returns the write time in seconds.
+        """
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                if changed:
+                    Hosts.objects.bulk_update(
+                        [
+                            Hosts(
+                                id=host.pk,
+                                is_active=host.is_active,
+                                last_check=host.last_check,
+                                downtime_allotment=host.downtime_allotment,
+                            )
+                            for host in changed
+                        ],
+                        ['is_active', 'last_check', 'downtime_allotment'],
+                        batch_size=self.write_batch_size,
+                    )
+                unchanged_ids = [host.pk for host in unchanged]
+                for offset in range(0, len(unchanged_ids), self.write_batch_size):
+                    Hosts.objects.filter(
+                        pk__in=unchanged_ids[offset:offset + self.write_batch_size]
+                    ).update(last_check=checked_at)
+        except Exception as e:
+            logger.error(f"Failed to save host statuses: {str(e)}")
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Saved host statuses: {len(changed)} changed, {len(unchanged)} unchanged in {elapsed:.4f}s"
+        )
+        return elapsed
+
+    def heartbeat(self, metrics=None):
+        """Register this shard as running, optionally publishing its cycle metrics"""
+        fields = {
+            'status': 'running',
+            'pid': os.getpid(),
+            'hostname': platform.node(),
+            'last_active': timezone.now(),
+        }
+        if metrics is not None:
+            fields['metrics'] = metrics
+        MonitorStatus.objects.update_or_create(monitor_type='icmp', shard=self.shard, defaults=fields)
+
+    def live_shards(self):
+        """Shards that are running and have sent a heartbeat recently, including this one"""
+        cutoff = timezone.now() - timedelta(seconds=settings.MONITOR_SHARD_TIMEOUT)
+        shards = set(MonitorStatus.objects.filter(
+            monitor_type='icmp', status='running', last_active__gte=cutoff
+        ).values_list('shard', flat=True))
+        shards.add(self.shard)
+        return shards
+
+    def owned_hosts(self, hosts, shards):
+        """
+        Hosts this shard probes, hosts of dead shards fall to their ring neighbours.
+
+        Status writes of the shard that probed a host until now do not move the
+        change version, so hosts taken over when the shard set changes are read
+        again instead of trusting our old records of them.
+        """
+        previous = self.ring
+        # Owners only change with the shard set, so hash each host once per set
+        if previous is None or previous.shards != sorted(shards):
+            self.ring = HashRing(shards)
+            self.owners = {}
+
+        if len(shards) == 1:
+            owned = hosts
+        else:
+            owners = self.owners
+            for host in hosts:
+                if host.pk not in owners:
+                    owners[host.pk] = self.ring.owner(str(host.uuid))
+            owned = [host for host in hosts if owners[host.pk] == self.shard]
+
+        if previous is not None and previous is not self.ring:
+            taken_over = [host.pk for host in owned if previous.owner(str(host.uuid)) != self.shard]
+            if taken_over:
+                loaded = self.registry.reload(taken_over)
+                logger.info(f"Reloaded {loaded} hosts taken over when live shards became {sorted(shards)}")
+                owned = [self.registry.records.get(host.pk, host) for host in owned]
+        return owned
+
+    def write_aggregate(self, slot, partial, shards):
+        """
+        Update monitors_aggregate_icmp from per-shard cycle results.
+
+        A lone shard writes its own cycle straight away. With several shards
+        the lowest live shard combines everyone's results for the previous
+        slot, by which time every shard has finished it. Each shard keeps its
+        last two slots so a shard that is already a cycle ahead still has the
+        previous one on its row.
+        """
+        self.partials[str(slot)] = partial
+        for key in sorted(self.partials, key=int)[:-2]:
+            del self.partials[key]
+
+        if len(shards) > 1:
+            if self.shard != min(shards):
+                return
+            slot = slot - settings.MONITOR_INTERVAL
+            key = str(slot)
+            partials = [
+                row['aggregates'][key] for row in MonitorStatus.objects.filter(
+                    monitor_type='icmp', shard__in=shards - {self.shard}
+                ).values_list('metrics', flat=True)
+                if key in row.get('aggregates', {})
+            ]
+            if key in self.partials:
+                partials.append(self.partials[key])
+        else:
+            partials = [partial]
+
+        if not partials:
+            return
+
+        total_hosts = sum(item['hosts'] for item in partials)
+        active_count = sum(item['active'] for item in partials)
+        latency_sum = sum(item['latency_sum'] for item in partials)
+        uptime_percentage, avg_latency = aggregate_values(total_hosts, active_count, latency_sum)
+
+        # Update monitor's RRD file
+        self.rrd_queue.submit('monitors_aggregate_icmp', uptime_percentage, avg_latency, slot)
+        logger.info(
+            f"Queued monitor metrics for {len(partials)} shard(s): uptime={uptime_percentage}%, avg_latency={avg_latency}ms"
+        )
+
+        # Region and account aggregates, merged across shards the same way
+        data_sources = self.rrd_service.aggregate_data_sources()
+        for kind in AGGREGATE_GROUPS:
+            merged = defaultdict(lambda: [0, 0, 0])
+            for item in partials:
+                for key, counts in item.get('groups', {}).get(kind, {}).items():
+                    total = merged[key]
+                    for index, value in enumerate(counts):
+                        total[index] += value
+
+            for key, (hosts, active, group_latency_sum) in merged.items():
+                uptime, latency = aggregate_values(hosts, active, group_latency_sum)
+                self.rrd_queue.submit_values(
+                    group_rrd_file(kind, key), (uptime, latency, hosts, active), slot, data_sources
+                )
+            logger.info(f"Queued {len(merged)} {kind} aggregates")
+
+    def self_metrics_file(self):
+        return self_metrics_file(self.shard)
+
+    def ensure_self_metrics_file(self):
+        if not self.rrd_service.rrd_exists(self.self_metrics_file()):
+            self.rrd_service.create_rrd_file(
+                self.self_metrics_file(),
+                data_sources=[f"DS:{name}:GAUGE:{self.rrd_service.heartbeat}:0:U" for name in SELF_METRICS]
+            )
+
+    def run(self, timestamp=None):
+        """
+        Run the ICMP monitor
+
+        Args:
+            timestamp (int): RRD step this cycle records into, defaults to the current step
+        """
+        logger.info(f"Starting ICMP monitor run (shard {self.shard})")
+        started = time.perf_counter()
+        if timestamp is None:
+            timestamp = self.rrd_service.aligned_time(time.time())
+
+        self.heartbeat()
+        shards = self.live_shards()
 
         # Get all monitored hosts
-        hosts = Hosts.objects.filter(is_monitored=True)
-        if not hosts.exists():
+        self.registry.refresh()
+        hosts = self.registry.hosts()
+        if not hosts:
             logger.warning("No monitored hosts found")
             return
 
-        # Create a pool of workers
-        with multiprocessing.Pool() as pool:
-            # Ping all hosts in parallel
-            results = pool.map(self.ping_host, hosts)
+        hosts = self.owned_hosts(hosts, shards)
+        logger.info(f"Shard {self.shard} owns {len(hosts)} hosts across live shards {sorted(shards)}")
+        registry_done = time.perf_counter()
+
+        # Ping all hosts in parallel
+        results = self.probe_hosts(hosts) if hosts else []
+        probe_done = time.perf_counter()
 
         # Process results
-        active_hosts = []
-        latencies = []
+        active_count = 0
+        latency_sum = 0
+        # [hosts, active, latency_sum] per group key, for the region and account aggregates
+        groups = {kind: defaultdict(lambda: [0, 0, 0]) for kind in AGGREGATE_GROUPS}
+        changed = []
+        unchanged = []
+        checked_at = timezone.now()
+        rrd_before = self.rrd_queue.stats()
 
         for host, (ping_active, latency) in zip(hosts, results):
             # Update host status and get final active state
-            self.update_host_status(host, ping_active, latency)
-            
+            if self.update_host_status(host, ping_active, latency, checked_at, timestamp):
+                changed.append(host)
+            else:
+                unchanged.append(host)
+
             # Use host.is_active (which considers downtime allotment) for aggregates
             if host.is_active:
-                active_hosts.append(1)
-                latencies.append(latency)
+                active_count += 1
+                latency_sum += latency
+            for kind, field in AGGREGATE_GROUPS.items():
+                counts = groups[kind][getattr(host, field) or '']
+                counts[0] += 1
+                if host.is_active:
+                    counts[1] += 1
+                    counts[2] += latency
+        status_done = time.perf_counter()
 
-        # Calculate aggregate metrics
-        total_hosts = len(hosts)
-        active_count = len(active_hosts)
+        self.write_time = self.save_host_statuses(changed, unchanged, checked_at)
 
-        if total_hosts > 0:
-            uptime_percentage = round((active_count / total_hosts) * 100, 4)
-            avg_latency = round(statistics.mean(latencies) if latencies else 0, 4)
-        else:
-            uptime_percentage = 0
-            avg_latency = 0
+        # Publish this shard's share of the fleet aggregate
+        partial = {
+            'slot': timestamp,
+            'hosts': len(hosts),
+            'active': active_count,
+            'latency_sum': latency_sum,
+            'groups': {kind: dict(counts) for kind, counts in groups.items()},
+        }
+        rrd_started = time.perf_counter()
+        self.write_aggregate(timestamp, partial, shards)
+        rrd_after = self.rrd_queue.stats()
+        finished = time.perf_counter()
 
-        # Update monitor's RRD file
+        # RRD updates are queued while processing results, blocking on a full queue shows up here
+        scheduler_stats = self.scheduler.stats() if self.scheduler else {}
+        cycle = {
+            'slot': timestamp,
+            'budget': settings.MONITOR_INTERVAL,
+            'cycle_time': round(finished - started, 4),
+            'registry_time': round(registry_done - started, 4),
+            'probe_time': round(probe_done - registry_done, 4),
+            'status_time': round(status_done - probe_done - (rrd_after['blocked_time'] - rrd_before['blocked_time']), 4),
+            'db_time': round(self.write_time, 4),
+            'rrd_time': round(finished - rrd_started + rrd_after['blocked_time'] - rrd_before['blocked_time'], 4),
+            'probes': len(results),
+            'timeouts': sum(1 for is_active, _ in results if not is_active),
+            'db_rows': len(changed) + len(unchanged),
+            'rrd_updates': rrd_after['written'] - self.rrd_written,
+            'rrd_queue_depth': rrd_after['depth'],
+            'lag': scheduler_stats.get('last_lag', 0),
+            'overruns': scheduler_stats.get('overruns', 0),
+            'dispatch': self.dispatch_stats,
+        }
+        self.rrd_written = rrd_after['written']
+        self.cycle_stats = cycle
+
+        self.heartbeat({'aggregates': dict(self.partials), 'cycle': cycle})
+        self.rrd_queue.submit_values(self.self_metrics_file(), [cycle[name] for name in SELF_METRICS], timestamp)
+
+        # Live pages get the new counts and the hosts that changed instead of polling, the version was
+        # read before the counts so edits made in between mark the snapshot stale
         try:
-            self.rrd_service.update_rrd_file('monitors_aggregate_icmp', uptime_percentage, avg_latency)
-            logger.info(f"Updated monitor metrics: uptime={uptime_percentage}%, avg_latency={avg_latency}ms")
+            publish_cycle_event(self.shard, timestamp, fleet_summary(), changed, self.registry.version)
         except Exception as e:
-            logger.error(f"Failed to update monitor metrics: {str(e)}")
+            logger.error(f"Failed to publish cycle event: {str(e)}")
 
+        logger.info(
+            f"Cycle metrics: {cycle['cycle_time']}s of {cycle['budget']}s budget "
+            f"(registry {cycle['registry_time']}s, probe {cycle['probe_time']}s, status {cycle['status_time']}s, "
+            f"db {cycle['db_time']}s, rrd {cycle['rrd_time']}s), {cycle['probes']} probes, "
+            f"{cycle['timeouts']} timed out, {cycle['db_rows']} rows, {cycle['rrd_updates']} RRD updates"
+        )
+        logger.info(f"RRD writer queue: {rrd_after}")
         logger.info("Completed ICMP monitor run")
 
-    # Add before the run_monitor function
-    def signal_handler(signum, frame):
-        """Handle termination signals"""
-        logger.info("Received termination signal, shutting down...")
-        sys.exit(0)
+def signal_handler(signum, frame):
+    """Handle termination signals"""
+    logger.info("Received termination signal, shutting down...")
+    sys.exit(0)
 
-    # Update the run_monitor function
-    def run_monitor():
-        """Entry point for the monitor daemon"""
-        # Set up signal handlers
-        signal.signal(signal.SIGTERM, signal_handler)
-        signal.signal(signal.SIGINT, signal_handler)
+def run_monitor(shard=0):
+    """Entry point for the monitor daemon"""
+    # Exit through SystemExit so queued RRD updates are flushed on SIGTERM
+    signal.signal(signal.SIGTERM, signal_handler)
+    signal.signal(signal.SIGINT, signal_handler)
 
-        monitor = ICMPMonitor()
+    monitor = ICMPMonitor(shard)
+    scheduler = CycleScheduler(settings.MONITOR_INTERVAL)
+    monitor.scheduler = scheduler
+    try:
         while True:
+            # Start on the next interval boundary, each cycle owns one RRD step
+            slot = scheduler.wait()
             try:
-                monitor.run()
-                time.sleep(30)  # Wait 30 seconds before next run
+                monitor.run(slot)
             except Exception as e:
                 logger.error(f"Monitor run failed: {str(e)}")
-                time.sleep(30)  # Wait before retrying
-
-
-def run_monitor():
-    """Entry point for the monitor daemon"""
-    monitor = ICMPMonitor()
-    while True:
-        try:
-            monitor.run()
-            time.sleep(30)  # Wait 30 seconds before next run
-        except Exception as e:
-            logger.error(f"Monitor run failed: {str(e)}")
-            time.sleep(30)  # Wait before retrying
+            scheduler.finish()
+    finally:
+        monitor.close()
 
 if __name__ == '__main__':
     run_monitor()
\ No newline at end of file
@@ -0,0 +1,372 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import connection
+from django.test.utils import override_settings
+from website.models import Hosts
+from website.services import HostService
+from rrd.services import RRDService
+from rrd.cache import fetch_cache
+from monitors.icmp import ICMPMonitor
+from datetime import datetime, timezone
+from pathlib import Path
+import json
+import logging
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+import psutil
+
+REGIONS = ['us-east-1', 'us-west-2', 'eu-west-1', 'eu-central-1', 'ap-southeast-1', 'ap-northeast-1']
+
+
+class StubProber:
+    """
+    Stands in for ICMPSocketProber so the pipeline can be timed without a network.
+
+    Every address answers except a ``loss`` fraction, chosen at random each
+    cycle. The dispatch plan is walked without sleeping, so planning cost is
+    still measured but pacing is not.
+    """
+
+    def __init__(self, loss=0.05, seed=0):
+        self.loss = loss
+        self.random = random.Random(seed)
+
+    def supports(self, address):
+        return True
+
+    def probe(self, addresses, plan=None):
+        if plan is not None:
+            plan.start()
+            for index in plan.order:
+                plan.mark_sent(index)
+        return [
+            (False, 0) if self.random.random() < self.loss else (True, round(self.random.uniform(1, 80), 4))
+            for _ in addresses
+        ]
+
+    def close(self):
+        pass
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def peak_rss_kb():
+    """High-water mark of this process's resident set size in KiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB
+    return peak // 1024 if platform.system() == 'Darwin' else peak
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the monitor and RRD pipeline against a throwaway database and RRD directory '
+        'filled with synthetic hosts, and print the results as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hosts',
+            type=int,
+            nargs='+',
+            default=[1000],
+            help='Host counts to benchmark, e.g. --hosts 1000 10000 100000 (default: 1000)'
+        )
+        parser.add_argument(
+            '--cycles',
+            type=int,
+            default=3,
+            help='Monitor cycles to run per host count, the first one loads the registry cold (default: 3)'
+        )
+        parser.add_argument(
+            '--fetches',
+            type=int,
+            default=200,
+            help='RRDService.get_metrics calls per host count (default: 200)'
+        )
+        parser.add_argument(
+            '--resolution',
+            type=int,
+            default=1,
+            help='time_range_resolution_code used for get_metrics (default: 1)'
+        )
+        parser.add_argument(
+            '--service-ops',
+            type=int,
+            default=100,
+            help='Hosts created, edited and deleted through HostService per host count (default: 100)'
+        )
+        parser.add_argument(
+            '--backend',
+            choices=['rrdtool', 'columnar'],
+            default=settings.RRD_BACKEND,
+            help='RRD_BACKEND to benchmark (default: the configured one)'
+        )
+        parser.add_argument(
+            '--loss',
+            type=float,
+            default=0.05,
+            help='Fraction of stub probes that time out (default: 0.05)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for synthetic hosts and probe results (default: 0)'
+        )
+        parser.add_argument(
+            '--workdir',
+            type=str,
+            default=None,
+            help='Directory for the throwaway database and RRD files, every host gets an RRD file (default: a temp dir)'
+        )
+        parser.add_argument(
+            '--log-level',
+            type=str,
+            default='WARNING',
+            help='Level for the monitors and rrd loggers while benchmarking, INFO logs every host (default: WARNING)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Write the JSON results to this file instead of stdout'
+        )
+
+    def git_commit(self):
+        """Commit the benchmark ran against, so results can be compared across commits"""
+        try:
+            result = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True
+            )
+            return result.stdout.strip() or None
+        except OSError:
+            return None
+
+    def stage(self, name, latencies, items, elapsed, **extra):
+        """Summarise one stage, latencies are per operation in seconds"""
+        stats = {
+            'operations': len(latencies),
+            'items': items,
+            'seconds': round(elapsed, 4),
+            'throughput': round(items / elapsed, 2) if elapsed > 0 else 0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'max_ms': round(max(latencies, default=0) * 1000, 3),
+            'rss_kb': psutil.Process().memory_info().rss // 1024,
+            'peak_rss_kb': peak_rss_kb(),
+            **extra,
+        }
+        self.stderr.write(
+            f"  {name}: {stats['items']} items in {stats['seconds']}s, "
+            f"{stats['throughput']}/s, p50 {stats['p50_ms']}ms, p99 {stats['p99_ms']}ms"
+        )
+        return stats
+
+    def timed(self, operation, arguments):
+        """Call operation for each argument tuple, returns (latencies, elapsed)"""
+        latencies = []
+        started = time.perf_counter()
+        for args in arguments:
+            op_started = time.perf_counter()
+            operation(*args)
+            latencies.append(time.perf_counter() - op_started)
+        return latencies, time.perf_counter() - started
+
+    def synthetic_hosts(self, count, rng):
+        """count monitored hosts spread over REGIONS, numbered through 10.0.0.0/8"""
+        return [
+            Hosts(
+                host_name=f"bench.host-{index}",
+                host_ip_address=f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}",
+                region=rng.choice(REGIONS),
+                account_id=f"{rng.randrange(10 ** 12):012d}",
+                account_label=f"bench-{rng.randrange(20)}",
+                is_monitored=True,
+                is_active=True,
+                downtime_allotment=rng.choice([0, 0, 60, 300]),
+            )
+            for index in range(count)
+        ]
+
+    def bench_rrd(self, rrd_service, uuids, fetches, resolution, rng):
+        stages = {}
+        latencies, elapsed = self.timed(rrd_service.create_rrd_file, ((uuid,) for uuid in uuids))
+        stages['rrd_create'] = self.stage('rrd_create', latencies, len(uuids), elapsed)
+
+        latencies, elapsed = self.timed(
+            rrd_service.update_rrd_file,
+            ((uuid, 100, round(rng.uniform(1, 80), 4)) for uuid in uuids)
+        )
+        stages['rrd_update'] = self.stage('rrd_update', latencies, len(uuids), elapsed)
+
+        sample = [rng.choice(uuids) for _ in range(fetches)]
+        latencies, elapsed = self.timed(rrd_service.get_metrics, ((uuid, resolution, False) for uuid in sample))
+        stages['rrd_get_metrics'] = self.stage(
+            'rrd_get_metrics', latencies, len(sample), elapsed, resolution=resolution
+        )
+
+        # Fill the step-aligned fetch cache, then time the same requests served from it
+        fetch_cache.clear()
+        for uuid in sample:
+            rrd_service.get_metrics(uuid, resolution)
+        latencies, elapsed = self.timed(rrd_service.get_metrics, ((uuid, resolution) for uuid in sample))
+        stages['rrd_get_metrics_cached'] = self.stage(
+            'rrd_get_metrics_cached', latencies, len(sample), elapsed, resolution=resolution, cache=fetch_cache.stats()
+        )
+        return stages
+
+    def bench_monitor(self, count, cycles, loss, seed, rrd_service):
+        monitor = ICMPMonitor()
+        monitor.prober = StubProber(loss, seed)
+        try:
+            # Start after the step rrd_update wrote so no sample is skipped
+            first_slot = rrd_service.aligned_time(time.time()) + settings.MONITOR_INTERVAL
+            latencies = []
+            started = time.perf_counter()
+            for cycle in range(cycles):
+                cycle_started = time.perf_counter()
+                monitor.run(first_slot + cycle * settings.MONITOR_INTERVAL)
+                # End to end includes the write-behind RRD queue draining
+                monitor.rrd_queue.flush()
+                latencies.append(time.perf_counter() - cycle_started)
+            elapsed = time.perf_counter() - started
+        finally:
+            monitor.close()
+
+        last = dict(monitor.cycle_stats or {})
+        last.pop('dispatch', None)
+        return self.stage(
+            'monitor_cycle', latencies, count * cycles, elapsed,
+            cold_cycle_ms=round(latencies[0] * 1000, 3) if latencies else 0,
+            last_cycle=last,
+            rrd_writer=monitor.rrd_queue.stats(),
+        )
+
+    def bench_host_service(self, ops, rng):
+        stages = {}
+        created = []
+
+        def create(index):
+            created.append(HostService.create_host({
+                'host_name': f"bench.service-{index}",
+                'host_ip_address': f"172.16.{index >> 8 & 255}.{index & 255}",
+                'region': rng.choice(REGIONS),
+                'account_id': f"{rng.randrange(10 ** 12):012d}",
+                'account_label': 'bench-service',
+                'downtime_allotment': '',
+            }))
+
+        latencies, elapsed = self.timed(create, ((index,) for index in range(ops)))
+        stages['host_create'] = self.stage('host_create', latencies, ops, elapsed)
+
+        uuids = [host.uuid for host in created]
+        latencies, elapsed = self.timed(
+            HostService.update_host_settings, ((uuid, {'downtime_allotment': 120}) for uuid in uuids)
+        )
+        stages['host_update'] = self.stage('host_update', latencies, ops, elapsed)
+
+        latencies, elapsed = self.timed(
+            HostService.update_host_monitoring_status, ((uuid, False) for uuid in uuids)
+        )
+        stages['host_unmonitor'] = self.stage('host_unmonitor', latencies, ops, elapsed)
+
+        # Counted from the database, the cycle event snapshot would hide the query
+        latencies, elapsed = self.timed(HostService.get_host_counts, ((False,) for _ in range(50)))
+        stages['host_counts'] = self.stage('host_counts', latencies, 50, elapsed)
+
+        latencies, elapsed = self.timed(HostService.delete_host, ((uuid,) for uuid in uuids))
+        stages['host_delete'] = self.stage('host_delete', latencies, ops, elapsed)
+        return stages
+
+    def bench_size(self, count, options, workdir):
+        """Run every stage against a fresh database and RRD directory holding count hosts"""
+        rng = random.Random(options['seed'])
+        rrd_dir = workdir / f"rrd-{count}"
+        database = connection.settings_dict
+        old_name = database['NAME']
+        database.setdefault('TEST', {})['NAME'] = str(workdir / f"benchmark-{count}.sqlite3")
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        try:
+            caches = {
+                **settings.CACHES,
+                'rrd_fetch': {**settings.CACHES['rrd_fetch'], 'LOCATION': workdir / f"cache-{count}"},
+            }
+            # Cycle events go to the work directory too, a running web server must not pick them up
+            with override_settings(
+                RRD_DIR=rrd_dir,
+                RRD_BACKEND=options['backend'],
+                MONITOR_PROBE_ENGINE='stub',
+                MONITOR_EVENTS_DIR=workdir / f"events-{count}",
+                CACHES=caches,
+            ):
+                self.stderr.write(f"Benchmarking {count} hosts in {workdir}")
+                started = time.perf_counter()
+                Hosts.objects.bulk_create(self.synthetic_hosts(count, rng), batch_size=2000)
+                stages = {
+                    'setup': self.stage('setup', [time.perf_counter() - started], count, time.perf_counter() - started)
+                }
+
+                rrd_service = RRDService()
+                uuids = [str(uuid) for uuid in Hosts.objects.values_list('uuid', flat=True)]
+                stages.update(self.bench_rrd(rrd_service, uuids, options['fetches'], options['resolution'], rng))
+                stages['monitor_cycle'] = self.bench_monitor(
+                    count, options['cycles'], options['loss'], options['seed'], rrd_service
+                )
+                stages.update(self.bench_host_service(options['service_ops'], rng))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(rrd_dir, ignore_errors=True)
+            shutil.rmtree(workdir / f"cache-{count}", ignore_errors=True)
+
+        return {'hosts': count, 'stages': stages, 'peak_rss_kb': peak_rss_kb()}
+
+    def handle(self, *args, **options):
+        for name in ('monitors', 'rrd'):
+            logging.getLogger(name).setLevel(options['log_level'].upper())
+
+        if options['workdir']:
+            workdir = Path(options['workdir'])
+            workdir.mkdir(parents=True, exist_ok=True)
+            cleanup = False
+        else:
+            workdir = Path(tempfile.mkdtemp(prefix='reuptime-benchmark-'))
+            cleanup = True
+
+        report = {
+            'benchmark': 'monitor_pipeline',
+            'commit': self.git_commit(),
+            'started': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {
+                key: options[key]
+                for key in ('hosts', 'cycles', 'fetches', 'resolution', 'service_ops', 'backend', 'loss', 'seed')
+            },
+            'results': [],
+        }
+        try:
+            for count in options['hosts']:
+                report['results'].append(self.bench_size(count, options, workdir))
+        finally:
+            if cleanup:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Benchmark results written to {options['output']}"))
+        else:
+            self.stdout.write(output)
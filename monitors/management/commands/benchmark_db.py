@@ -0,0 +1,268 @@
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.utils import OperationalError
+from django.test.utils import override_settings
+from django.utils import timezone
+from website.models import Hosts
+from website.services import HostService
+from monitors.events import fleet_summary
+from monitors.management.commands.benchmark import Command as BenchmarkCommand, percentile
+from pathlib import Path
+import json
+import multiprocessing
+import platform
+import random
+import shutil
+import tempfile
+import time
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Run a monitor-style writer, host editors and dashboard-style readers against one throwaway SQLite '
+        'database, with and without SQLITE_PROFILE, and print lock errors, lock waits and query latency as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hosts',
+            type=int,
+            default=10000,
+            help='Synthetic hosts in the database (default: 10000)'
+        )
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=3,
+            help='Reader processes, one per web worker (default: 3)'
+        )
+        parser.add_argument(
+            '--editors',
+            type=int,
+            default=1,
+            help='Processes editing hosts like the web UI, a read then a write in one transaction (default: 1)'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10,
+            help='Seconds each profile runs for (default: 10)'
+        )
+        parser.add_argument(
+            '--write-interval',
+            type=float,
+            default=0.5,
+            help='Seconds the writer sleeps between cycles, far below MONITOR_INTERVAL to provoke contention (default: 0.5)'
+        )
+        parser.add_argument(
+            '--changed',
+            type=float,
+            default=0.05,
+            help='Fraction of hosts whose state changes each cycle (default: 0.05)'
+        )
+        parser.add_argument(
+            '--wait-ms',
+            type=float,
+            default=100,
+            help='Operations slower than this are counted as lock waits, SQLite waits on a busy lock inside the call (default: 100)'
+        )
+        parser.add_argument(
+            '--profile',
+            choices=['both', 'on', 'off'],
+            default='both',
+            help='Run with SQLITE_PROFILE on, off or both (default: both)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for synthetic hosts and state changes (default: 0)'
+        )
+        parser.add_argument(
+            '--workdir',
+            type=str,
+            default=None,
+            help='Directory for the throwaway databases (default: a temp dir)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Write the JSON report to this file instead of stdout'
+        )
+
+    def write_cycle(self, ids, changed, batch_size=500):
+        """One cycle's host status write, the same statements as ICMPMonitor.save_host_statuses"""
+        checked_at = timezone.now()
+        with transaction.atomic():
+            Hosts.objects.bulk_update(
+                [
+                    Hosts(id=pk, is_active=is_active, last_check=checked_at, downtime_allotment=allotment)
+                    for pk, is_active, allotment in changed
+                ],
+                ['is_active', 'last_check', 'downtime_allotment'],
+                batch_size=batch_size,
+            )
+            unchanged = sorted(set(ids) - {pk for pk, _, _ in changed})
+            for offset in range(0, len(unchanged), batch_size):
+                Hosts.objects.filter(pk__in=unchanged[offset:offset + batch_size]).update(last_check=checked_at)
+
+    def edit_host(self, uuids, rng):
+        """A host settings edit: reads the row and the change version, then writes both in one transaction"""
+        HostService.update_host_settings(rng.choice(uuids), {'downtime_allotment': rng.choice([0, 30, 60])})
+
+    def read_dashboard(self, rng):
+        """What a page view asks the database for: the counters and one page of hosts"""
+        fleet_summary()
+        HostService.get_hosts_page(True, sort=rng.choice(list(HostService.listing_sorts)), limit=100)
+
+    def worker(self, role, index, options, deadline, results):
+        """Body of one writer, editor or reader process, puts its latencies and errors on results"""
+        rng = random.Random(options['seed'] + index)
+        ids = list(Hosts.objects.values_list('id', flat=True)) if role == 'writer' else None
+        uuids = [str(uuid) for uuid in Hosts.objects.values_list('uuid', flat=True)] if role == 'editor' else None
+        latencies = []
+        errors = 0
+        journal_mode = None
+        try:
+            while time.time() < deadline:
+                started = time.perf_counter()
+                try:
+                    if role == 'writer':
+                        changed = [
+                            (pk, rng.random() < 0.7, rng.choice([0, 60, 300]))
+                            for pk in rng.sample(ids, int(len(ids) * options['changed']))
+                        ]
+                        self.write_cycle(ids, changed)
+                    elif role == 'editor':
+                        self.edit_host(uuids, rng)
+                    else:
+                        self.read_dashboard(rng)
+                    latencies.append(time.perf_counter() - started)
+                except OperationalError as e:
+                    if 'locked' not in str(e) and 'busy' not in str(e):
+                        raise
+                    errors += 1
+                if role == 'writer':
+                    time.sleep(options['write_interval'])
+                elif role == 'editor':
+                    time.sleep(0.05)
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+        finally:
+            # Always report back, the parent waits for every process
+            results.put({'role': role, 'latencies': latencies, 'errors': errors, 'journal_mode': journal_mode})
+            connections.close_all()
+
+    def summarize(self, runs, wait_seconds):
+        latencies = [latency for run in runs for latency in run['latencies']]
+        return {
+            'operations': len(latencies),
+            'lock_errors': sum(run['errors'] for run in runs),
+            'lock_waits': sum(1 for latency in latencies if latency > wait_seconds),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'max_ms': round(max(latencies, default=0) * 1000, 3),
+        }
+
+    def bench_profile(self, enabled, options, workdir):
+        """Fill a fresh database and run the writer, editors and readers against it concurrently"""
+        database = connection.settings_dict
+        old_name = database['NAME']
+        old_options = database.get('OPTIONS', {})
+        name = 'profile' if enabled else 'default'
+        database.setdefault('TEST', {})['NAME'] = str(workdir / f"benchmark-db-{name}.sqlite3")
+        # Transaction mode is part of the profile, it is read when each process connects
+        database['OPTIONS'] = {**old_options, 'transaction_mode': 'IMMEDIATE' if enabled else None}
+
+        with override_settings(SQLITE_PROFILE=enabled):
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                Hosts.objects.bulk_create(
+                    self.synthetic_hosts(options['hosts'], random.Random(options['seed'])), batch_size=2000
+                )
+                # Forked processes must open their own connections
+                connections.close_all()
+
+                context = multiprocessing.get_context('fork')
+                results = context.Queue()
+                deadline = time.time() + options['duration']
+                processes = [context.Process(target=self.worker, args=('writer', 0, options, deadline, results))]
+                processes += [
+                    context.Process(target=self.worker, args=('editor', index, options, deadline, results))
+                    for index in range(1, options['editors'] + 1)
+                ]
+                processes += [
+                    context.Process(target=self.worker, args=('reader', index, options, deadline, results))
+                    for index in range(options['editors'] + 1, options['editors'] + options['readers'] + 1)
+                ]
+                self.stderr.write(
+                    f"Running {'with' if enabled else 'without'} SQLITE_PROFILE: 1 writer, "
+                    f"{options['editors']} editors, {options['readers']} readers, {options['duration']}s"
+                )
+                for process in processes:
+                    process.start()
+                runs = [results.get() for _ in processes]
+                for process in processes:
+                    process.join()
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                database['OPTIONS'] = old_options
+
+        wait_seconds = options['wait_ms'] / 1000
+        result = {
+            'profile': enabled,
+            'journal_mode': runs[0]['journal_mode'],
+            'writer': self.summarize([run for run in runs if run['role'] == 'writer'], wait_seconds),
+            'editors': self.summarize([run for run in runs if run['role'] == 'editor'], wait_seconds),
+            'readers': self.summarize([run for run in runs if run['role'] == 'reader'], wait_seconds),
+        }
+        for role in ('writer', 'editors', 'readers'):
+            stats = result[role]
+            self.stderr.write(
+                f"  {role}: {stats['operations']} operations, {stats['lock_errors']} lock errors, "
+                f"{stats['lock_waits']} lock waits, p50 {stats['p50_ms']}ms, p99 {stats['p99_ms']}ms"
+            )
+        return result
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stderr.write(self.style.ERROR('benchmark_db only applies to SQLite databases'))
+            return
+
+        if options['workdir']:
+            workdir = Path(options['workdir'])
+            workdir.mkdir(parents=True, exist_ok=True)
+            cleanup = False
+        else:
+            workdir = Path(tempfile.mkdtemp(prefix='reuptime-benchmark-db-'))
+            cleanup = True
+
+        report = {
+            'benchmark': 'sqlite_contention',
+            'commit': self.git_commit(),
+            'started': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {
+                key: options[key]
+                for key in ('hosts', 'readers', 'editors', 'duration', 'write_interval', 'changed', 'wait_ms', 'seed')
+            },
+            'pragmas': settings.SQLITE_PRAGMAS,
+            'results': [],
+        }
+        profiles = {'both': [False, True], 'on': [True], 'off': [False]}[options['profile']]
+        try:
+            for enabled in profiles:
+                report['results'].append(self.bench_profile(enabled, options, workdir))
+        finally:
+            if cleanup:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Benchmark results written to {options['output']}"))
+        else:
+            self.stdout.write(output)
@@ -1,8 +1,11 @@
 from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.utils import timezone
 from monitors.models import MonitorStatus
 from monitors.icmp import run_monitor
 from datetime import datetime
 import os
+import platform
 import signal
 import psutil
 import logging
@@ -12,7 +15,7 @@ import subprocess
 logger = logging.getLogger('monitors')
 
 class Command(BaseCommand):
-    help = 'Control the ICMP monitor daemon (start/stop/restart)'
+    help = 'Control the ICMP monitor daemons (start/stop/restart/status), per shard or for all shards'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -21,11 +24,18 @@ class Command(BaseCommand):
             choices=['start', 'stop', 'restart', 'status'],
             help='Action to perform on the ICMP monitor'
         )
+        parser.add_argument(
+            '--shard',
+            type=int,
+            default=None,
+            help='Only act on this shard (default: all shards, start launches MONITOR_SHARDS shards)'
+        )
 
-    def get_monitor_status(self):
-        """Get or create monitor status record"""
+    def get_monitor_status(self, shard=0):
+        """Get or create monitor status record for a shard"""
         status, created = MonitorStatus.objects.get_or_create(
             monitor_type='icmp',
+            shard=shard,
             defaults={
                 'status': 'stopped',
                 'pid': None
@@ -33,6 +43,20 @@ class Command(BaseCommand):
         )
         return status
 
+    def get_shards(self, shard=None, action='status'):
+        """Shards an action applies to"""
+        if shard is not None:
+            return [shard]
+        if action == 'start':
+            return list(range(settings.MONITOR_SHARDS))
+
+        shards = list(MonitorStatus.objects.filter(monitor_type='icmp').order_by('shard').values_list('shard', flat=True))
+        return shards or [0]
+
+    def is_local(self, status):
+        """Whether a shard's pid refers to a process on this machine"""
+        return not status.hostname or status.hostname == platform.node()
+
     def is_process_running(self, pid):
         """Check if a process is running"""
         try:
@@ -40,20 +64,25 @@ class Command(BaseCommand):
         except (psutil.NoSuchProcess, psutil.AccessDenied):
             return False
 
-    def start_monitor(self):
-        """Start the ICMP monitor daemon"""
-        status = self.get_monitor_status()
+    def start_monitor(self, shard=None):
+        """Start ICMP monitor daemons"""
+        for shard in self.get_shards(shard, 'start'):
+            self.start_shard(shard)
+
+    def start_shard(self, shard):
+        """Start the ICMP monitor daemon for one shard"""
+        status = self.get_monitor_status(shard)
 
         # Check if already running
-        if status.status == 'running' and status.pid and self.is_process_running(status.pid):
-            self.stdout.write(self.style.WARNING('ICMP monitor is already running'))
+        if status.status == 'running' and status.pid and self.is_local(status) and self.is_process_running(status.pid):
+            self.stdout.write(self.style.WARNING(f'ICMP monitor shard {shard} is already running'))
             return
 
         # Start the daemon
         try:
             # Use subprocess.Popen to start the daemon
             process = subprocess.Popen(
-                [sys.executable, 'manage.py', 'shell', '-c', 'from monitors.icmp import run_monitor; run_monitor()'],
+                [sys.executable, 'manage.py', 'shell', '-c', f'from monitors.icmp import run_monitor; run_monitor(shard={shard})'],
                 stdout=subprocess.DEVNULL,  # Redirect stdout to /dev/null
                 stderr=subprocess.DEVNULL,  # Redirect stderr to /dev/null
                 preexec_fn=os.setpgrp  # Create new process group
@@ -62,20 +91,32 @@ class Command(BaseCommand):
             # Update status
             status.status = 'running'
             status.pid = process.pid
+            status.hostname = platform.node()
             status.save()
 
-            self.stdout.write(self.style.SUCCESS(f'ICMP monitor started with PID {process.pid}'))
-            logger.info(f'ICMP monitor started with PID {process.pid}')
+            self.stdout.write(self.style.SUCCESS(f'ICMP monitor shard {shard} started with PID {process.pid}'))
+            logger.info(f'ICMP monitor shard {shard} started with PID {process.pid}')
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Failed to start ICMP monitor: {str(e)}'))
-            logger.error(f'Failed to start ICMP monitor: {str(e)}')
+            self.stdout.write(self.style.ERROR(f'Failed to start ICMP monitor shard {shard}: {str(e)}'))
+            logger.error(f'Failed to start ICMP monitor shard {shard}: {str(e)}')
+
+    def stop_monitor(self, shard=None):
+        """Stop ICMP monitor daemons"""
+        for shard in self.get_shards(shard, 'stop'):
+            self.stop_shard(shard)
 
-    def stop_monitor(self):
-        """Stop the ICMP monitor daemon"""
-        status = self.get_monitor_status()
+    def stop_shard(self, shard):
+        """Stop the ICMP monitor daemon for one shard"""
+        status = self.get_monitor_status(shard)
 
         if status.status != 'running' or not status.pid:
-            self.stdout.write(self.style.WARNING('ICMP monitor is not running'))
+            self.stdout.write(self.style.WARNING(f'ICMP monitor shard {shard} is not running'))
+            return
+
+        if not self.is_local(status):
+            self.stdout.write(self.style.WARNING(
+                f'ICMP monitor shard {shard} runs on {status.hostname}, stop it there'
+            ))
             return
 
         try:
@@ -93,25 +134,45 @@ class Command(BaseCommand):
             status.pid = None
             status.save()
 
-            self.stdout.write(self.style.SUCCESS('ICMP monitor stopped'))
-            logger.info('ICMP monitor stopped')
+            self.stdout.write(self.style.SUCCESS(f'ICMP monitor shard {shard} stopped'))
+            logger.info(f'ICMP monitor shard {shard} stopped')
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Failed to stop ICMP monitor: {str(e)}'))
-            logger.error(f'Failed to stop ICMP monitor: {str(e)}')
-
-    def restart_monitor(self):
-        """Restart the ICMP monitor daemon"""
-        self.stop_monitor()
-        self.start_monitor()
-
-    def show_status(self):
-        """Show the current status of the ICMP monitor"""
-        status = self.get_monitor_status()
+            self.stdout.write(self.style.ERROR(f'Failed to stop ICMP monitor shard {shard}: {str(e)}'))
+            logger.error(f'Failed to stop ICMP monitor shard {shard}: {str(e)}')
+
+    def restart_monitor(self, shard=None):
+        """Restart ICMP monitor daemons"""
+        shards = self.get_shards(shard, 'stop')
+        for shard in shards:
+            self.stop_shard(shard)
+        for shard in shards:
+            self.start_shard(shard)
+
+    def show_status(self, shard=None):
+        """Show the current status of ICMP monitor daemons"""
+        for shard in self.get_shards(shard, 'status'):
+            self.show_shard_status(shard)
+
+    def show_shard_status(self, shard):
+        """Show the current status of one ICMP monitor shard"""
+        status = self.get_monitor_status(shard)
 
         if status.status == 'running' and status.pid:
-            if self.is_process_running(status.pid):
+            if not self.is_local(status):
+                # Remote shards can only be judged by their heartbeat
+                if (timezone.now() - status.last_active).total_seconds() > settings.MONITOR_SHARD_TIMEOUT:
+                    style = self.style.WARNING
+                    state = 'has no recent heartbeat'
+                else:
+                    style = self.style.SUCCESS
+                    state = 'is running'
+                self.stdout.write(style(
+                    f'ICMP monitor shard {shard} {state} on {status.hostname} '
+                    f'(PID: {status.pid}, Last Activity: {status.last_active})'
+                ))
+            elif self.is_process_running(status.pid):
                 self.stdout.write(self.style.SUCCESS(
-                    f'ICMP monitor is running (PID: {status.pid}, Last Activity: {status.last_active})'
+                    f'ICMP monitor shard {shard} is running (PID: {status.pid}, Last Activity: {status.last_active})'
                 ))
             else:
                 # Process is not running but status says it is
@@ -119,20 +180,21 @@ class Command(BaseCommand):
                 status.pid = None
                 status.last_active = datetime.utcnow()
                 status.save()
-                self.stdout.write(self.style.WARNING('ICMP monitor is not running (stale status)'))
+                self.stdout.write(self.style.WARNING(f'ICMP monitor shard {shard} is not running (stale status)'))
         else:
             self.stdout.write(self.style.WARNING(
-                f'ICMP monitor is stopped (Last Activity: {status.last_active})'
+                f'ICMP monitor shard {shard} is stopped (Last Activity: {status.last_active})'
             ))
 
     def handle(self, *args, **options):
         action = options['action']
+        shard = options['shard']
 
         if action == 'start':
-            self.start_monitor()
+            self.start_monitor(shard)
         elif action == 'stop':
-            self.stop_monitor()
+            self.stop_monitor(shard)
         elif action == 'restart':
-            self.restart_monitor()
+            self.restart_monitor(shard)
         elif action == 'status':
-            self.show_status()
\ No newline at end of file
+            self.show_status(shard)
\ No newline at end of file
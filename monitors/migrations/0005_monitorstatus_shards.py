@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitors', '0004_rename_last_update_monitorstatus_last_active'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monitorstatus',
+            name='hostname',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='monitorstatus',
+            name='metrics',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='monitorstatus',
+            name='shard',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='monitorstatus',
+            name='monitor_type',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AddConstraint(
+            model_name='monitorstatus',
+            constraint=models.UniqueConstraint(fields=('monitor_type', 'shard'), name='unique_monitor_shard'),
+        ),
+    ]
@@ -3,7 +3,9 @@ import uuid
 
 class MonitorStatus(models.Model):
     uuid = models.UUIDField(unique=True, default=uuid.uuid4, editable=False)
-    monitor_type = models.CharField(max_length=50, unique=True)
+    monitor_type = models.CharField(max_length=50)
+    shard = models.IntegerField(default=0)
+    hostname = models.CharField(max_length=255, blank=True, default='')
     status = models.CharField(max_length=20, choices=[
         ('running', 'Running'),
         ('stopped', 'Stopped')
@@ -11,9 +13,14 @@ class MonitorStatus(models.Model):
     pid = models.IntegerField(null=True, blank=True)
     last_active = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Per-shard results of the last cycle, used to build fleet-wide aggregates
+    metrics = models.JSONField(default=dict, blank=True)
 
     class Meta:
         verbose_name_plural = "Monitor Statuses"
+        constraints = [
+            models.UniqueConstraint(fields=['monitor_type', 'shard'], name='unique_monitor_shard'),
+        ]
 
     def __str__(self):
-        return f"{self.monitor_type} - {self.status}"
\ No newline at end of file
+        return f"{self.monitor_type}[{self.shard}] - {self.status}"
\ No newline at end of file
@@ -0,0 +1,191 @@
+import asyncio
+import ipaddress
+import itertools
+import logging
+import os
+import socket
+import struct
+import time
+
+logger = logging.getLogger('monitors')
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+ICMP_HEADER = struct.Struct('!BBHHH')
+
+
+def icmp_checksum(data: bytes) -> int:
+    """Internet checksum (RFC 1071) of an ICMP message"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class ICMPSocketProber:
+    """
+    Probe many hosts with ICMP echo requests over a single socket.
+
+    An unprivileged ``SOCK_DGRAM`` ICMP socket is preferred (Linux, governed by
+    ``net.ipv4.ping_group_range``); a raw socket is used when that is not
+    permitted. Replies are matched to probes by (address, sequence) and each
+    probe is resolved by its own timer, so dead hosts cost nothing but a
+    pending entry.
+    """
+
+    payload = b'reuptime'.ljust(16, b'\x00')
+
+    def __init__(self, timeout=2000):
+        self.timeout = timeout  # milliseconds
+        self.sock, self.raw = self.open_socket()
+        self.identifier = os.getpid() & 0xFFFF
+        self.sequence = itertools.count()
+        self.pending = {}
+
+    @staticmethod
+    def open_socket():
+        """Open a non-blocking ICMP socket, returns (socket, is_raw)"""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            raw = False
+        except PermissionError:
+            # Raises PermissionError when neither socket type is allowed
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            raw = True
+        sock.setblocking(False)
+        # Replies for a whole host set can arrive faster than we drain them
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        return sock, raw
+
+    def close(self):
+        self.sock.close()
+
+    def supports(self, address):
+        """Only IPv4 literals can be probed over this socket"""
+        try:
+            return isinstance(ipaddress.ip_address(address), ipaddress.IPv4Address)
+        except (TypeError, ValueError):
+            return False
+
+    def build_packet(self, sequence):
+        header = ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, 0, self.identifier, sequence)
+        checksum = icmp_checksum(header + self.payload)
+        return ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, checksum, self.identifier, sequence) + self.payload
+
+    def parse_reply(self, data):
+        """Return the sequence number of an echo reply addressed to us, else None"""
+        if self.raw:
+            # Raw sockets deliver the IP header as well
+            data = data[(data[0] & 0x0F) * 4:]
+        if len(data) < ICMP_HEADER.size:
+            return None
+
+        icmp_type, _, _, identifier, sequence = ICMP_HEADER.unpack_from(data)
+        if icmp_type != ICMP_ECHO_REPLY:
+            return None
+        # The kernel rewrites the identifier of SOCK_DGRAM probes and filters replies for us
+        if self.raw and identifier != self.identifier:
+            return None
+        return sequence
+
+    def on_readable(self):
+        """Drain every datagram waiting on the socket"""
+        received = time.perf_counter()
+        while True:
+            try:
+                data, (address, _) = self.sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.debug(f"ICMP socket receive error: {str(e)}")
+                return
+
+            sequence = self.parse_reply(data)
+            if sequence is None:
+                continue
+
+            probe = self.pending.pop((address, sequence), None)
+            if probe is None:
+                continue
+
+            future, sent, timer = probe
+            timer.cancel()
+            if not future.done():
+                future.set_result((True, round((received - sent) * 1000, 4)))
+
+    def on_timeout(self, key):
+        probe = self.pending.pop(key, None)
+        if probe is not None and not probe[0].done():
+            probe[0].set_result((False, 0))
+
+    async def send(self, address):
+        """Send one echo request and return a future for its (is_active, latency)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        sequence = next(self.sequence) & 0xFFFF
+        key = (address, sequence)
+        packet = self.build_packet(sequence)
+
+        while True:
+            try:
+                self.sock.sendto(packet, (address, 0))
+                break
+            except (BlockingIOError, InterruptedError):
+                # Socket buffer full, let the receiver catch up
+                await asyncio.sleep(0.001)
+            except OSError as e:
+                logger.debug(f"Failed to send ICMP echo to {address}: {str(e)}")
+                future.set_result((False, 0))
+                return future
+
+        timer = loop.call_later(self.timeout / 1000, self.on_timeout, key)
+        self.pending[key] = (future, time.perf_counter(), timer)
+        return future
+
+    async def probe_many(self, addresses, plan=None):
+        """
+        Probe every address concurrently.
+
+        When a DispatchPlan is given each probe is held until its planned
+        offset, otherwise probes go out as fast as the socket accepts them.
+        Returns a list aligned with ``addresses`` of (is_active, latency)
+        tuples, or None for addresses this socket cannot probe.
+        """
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self.sock.fileno(), self.on_readable)
+        futures = [None] * len(addresses)
+        order = plan.order if plan is not None else range(len(addresses))
+        if plan is not None:
+            plan.start(loop.time())
+
+        try:
+            for count, index in enumerate(order):
+                if plan is not None:
+                    delay = plan.due(index) - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                elif count % 64 == 63:
+                    # Give the reader a chance to drain replies between bursts
+                    await asyncio.sleep(0)
+
+                if not self.supports(addresses[index]):
+                    continue
+                futures[index] = await self.send(addresses[index])
+                if plan is not None:
+                    plan.mark_sent(index, loop.time())
+
+            return [
+                await future if future is not None else None
+                for future in futures
+            ]
+        finally:
+            loop.remove_reader(self.sock.fileno())
+            for future, _, timer in self.pending.values():
+                timer.cancel()
+            self.pending.clear()
+
+    def probe(self, addresses, plan=None):
+        """Synchronous wrapper around probe_many"""
+        return asyncio.run(self.probe_many(addresses, plan))
@@ -0,0 +1,102 @@
+import logging
+import time
+from website.models import Hosts, GlobalSettings
+
+logger = logging.getLogger('monitors')
+
+# Columns the monitor needs, everything else stays in the database
+RECORD_FIELDS = (
+    'id', 'uuid', 'host_name', 'host_ip_address', 'region', 'account_id',
+    'is_active', 'downtime_allotment', 'last_check',
+)
+
+
+class HostRecord:
+    """Slim stand-in for a monitored Hosts row, also carries the host's live state"""
+
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, row):
+        for field in RECORD_FIELDS:
+            setattr(self, field, row[field])
+
+    @property
+    def pk(self):
+        return self.id
+
+
+class HostRegistry:
+    """
+    In-memory set of monitored hosts kept in sync incrementally.
+
+    HostService stamps every row it changes with a new hosts_change_version.
+    When that version moves the registry reloads only rows stamped after the
+    version it last saw and drops ids that are no longer monitored. Deleted
+    rows leave nothing to stamp, so after a version change the monitored host
+    count is compared with the registry and only a mismatch reconciles ids.
+    While the version stays put a refresh is a single query.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.version = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def hosts(self):
+        return list(self.records.values())
+
+    @staticmethod
+    def current_version():
+        setting = GlobalSettings.objects.filter(key='hosts_change_version').values_list('value', flat=True).first()
+        return setting or 0
+
+    def load(self, queryset):
+        loaded = 0
+        for row in queryset.values(*RECORD_FIELDS).iterator(chunk_size=2000):
+            self.records[row['id']] = HostRecord(row)
+            loaded += 1
+        return loaded
+
+    def reconcile(self):
+        """Drop hosts no longer monitored and load monitored hosts we have never seen"""
+        monitored = set(Hosts.objects.filter(is_monitored=True).values_list('id', flat=True))
+        for pk in self.records.keys() - monitored:
+            del self.records[pk]
+        missing = monitored - self.records.keys()
+        if missing:
+            self.reload(missing)
+
+    def reload(self, ids):
+        """Read the given hosts again if they are still monitored, returns the number of rows read"""
+        ids = list(ids)
+        loaded = 0
+        for offset in range(0, len(ids), 500):
+            loaded += self.load(Hosts.objects.filter(id__in=ids[offset:offset + 500], is_monitored=True))
+        return loaded
+
+    def refresh(self):
+        """Bring the registry up to date, returns the number of rows read"""
+        started = time.perf_counter()
+        version = self.current_version()
+        loaded = 0
+
+        if self.version is None:
+            self.records.clear()
+            loaded = self.load(Hosts.objects.filter(is_monitored=True))
+        elif version != self.version:
+            changed = Hosts.objects.filter(change_version__gt=self.version)
+            for pk in changed.filter(is_monitored=False).values_list('id', flat=True):
+                self.records.pop(pk, None)
+            loaded = self.load(changed.filter(is_monitored=True))
+            # Deletes and unstamped changes show up as a count that disagrees
+            if Hosts.objects.filter(is_monitored=True).count() != len(self.records):
+                self.reconcile()
+
+        self.version = version
+        logger.info(
+            f"Host registry at version {version}: {len(self.records)} hosts, "
+            f"{loaded} rows loaded in {time.perf_counter() - started:.4f}s"
+        )
+        return loaded
@@ -0,0 +1,82 @@
+import logging
+import math
+import time
+
+logger = logging.getLogger('monitors')
+
+
+class CycleScheduler:
+    """
+    Start monitor cycles on fixed interval boundaries.
+
+    Boundaries are multiples of ``interval`` in wall-clock time, so with a
+    30 second interval every cycle owns exactly one RRD step. Waiting is done
+    on the monotonic clock. A cycle that runs past the next boundary is an
+    overrun: the boundaries it covered are skipped and counted instead of
+    letting later cycles slide.
+    """
+
+    def __init__(self, interval=30):
+        self.interval = interval
+        self.slot = None
+        self.started = None
+        self.cycles = 0
+        self.overruns = 0
+        self.skipped_slots = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def next_slot(self, now=None):
+        """The next boundary strictly after the previous slot and not before now"""
+        now = time.time() if now is None else now
+        slot = math.ceil(now / self.interval) * self.interval
+        if self.slot is not None and slot <= self.slot:
+            slot = self.slot + self.interval
+        return int(slot)
+
+    def wait(self):
+        """Sleep until the next boundary and return its wall-clock timestamp"""
+        slot = self.next_slot()
+        if self.slot is not None:
+            missed = (slot - self.slot) // self.interval - 1
+            if missed > 0:
+                self.overruns += 1
+                self.skipped_slots += missed
+                logger.warning(
+                    f"Monitor cycle overran its {self.interval}s slot, skipping {missed} slot(s)"
+                )
+
+        # Convert to a monotonic deadline once so clock steps do not stretch the sleep
+        deadline = time.monotonic() + (slot - time.time())
+        while (remaining := deadline - time.monotonic()) > 0:
+            time.sleep(remaining)
+
+        self.slot = slot
+        self.started = time.monotonic()
+        self.last_lag = max(0.0, time.time() - slot)
+        self.max_lag = max(self.max_lag, self.last_lag)
+        return slot
+
+    def finish(self):
+        """Record the duration of the cycle started by the last wait()"""
+        self.cycles += 1
+        self.last_duration = time.monotonic() - self.started
+        self.max_duration = max(self.max_duration, self.last_duration)
+        logger.info(
+            f"Monitor cycle {self.slot} took {self.last_duration:.3f}s "
+            f"(lag {self.last_lag:.3f}s, overruns {self.overruns}, skipped slots {self.skipped_slots})"
+        )
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'cycles': self.cycles,
+            'overruns': self.overruns,
+            'skipped_slots': self.skipped_slots,
+            'last_duration': round(self.last_duration, 4),
+            'max_duration': round(self.max_duration, 4),
+            'last_lag': round(self.last_lag, 4),
+            'max_lag': round(self.max_lag, 4),
+        }
@@ -0,0 +1,32 @@
+import bisect
+import hashlib
+
+
+def stable_hash(value):
+    """64-bit hash that is the same in every process and on every machine"""
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping host uuids onto monitor shards.
+
+    Every shard is placed on the ring ``replicas`` times, so when a shard
+    joins or leaves only the hosts next to its points move to another shard.
+    """
+
+    def __init__(self, shards, replicas=64):
+        self.shards = sorted(set(shards))
+        self.points = sorted(
+            (stable_hash(f"shard-{shard}-{replica}"), shard)
+            for shard in self.shards
+            for replica in range(replicas)
+        )
+        self.keys = [point for point, _ in self.points]
+
+    def owner(self, key):
+        """Shard that owns key"""
+        if not self.points:
+            return None
+        position = bisect.bisect(self.keys, stable_hash(key)) % len(self.points)
+        return self.points[position][1]
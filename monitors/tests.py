@@ -1,3 +1,306 @@
-from django.test import TestCase
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from monitors.dispatch import PacedDispatcher
+from monitors.icmp import ICMPMonitor, dispatch_window
+from monitors.models import MonitorStatus
+from monitors.registry import HostRegistry
+from monitors.prober import ICMPSocketProber, icmp_checksum
+from monitors.scheduler import CycleScheduler
+from monitors.sharding import HashRing
+from website.models import Hosts
+from website.services import HostService
+
+
+class ICMPSocketProberTests(SimpleTestCase):
+    def setUp(self):
+        try:
+            self.prober = ICMPSocketProber(timeout=500)
+        except OSError as e:
+            self.skipTest(f"ICMP sockets not permitted here: {e}")
+        self.addCleanup(self.prober.close)
+
+    def test_checksum_of_packet_is_zero(self):
+        self.assertEqual(icmp_checksum(self.prober.build_packet(1234)), 0)
+
+    def test_loopback_range_is_active(self):
+        addresses = [f"127.0.{i}.{j}" for i in range(4) for j in range(1, 65)]
+        results = self.prober.probe(addresses)
+
+        self.assertEqual(len(results), len(addresses))
+        for is_active, latency in results:
+            self.assertTrue(is_active)
+            self.assertGreaterEqual(latency, 0)
+            self.assertLess(latency, 500)
+
+    def test_unsupported_addresses_are_left_for_fallback(self):
+        results = self.prober.probe(["127.0.0.1", "::1", "localhost"])
+
+        self.assertTrue(results[0][0])
+        self.assertIsNone(results[1])
+        self.assertIsNone(results[2])
+
+
+class PacedDispatcherTests(SimpleTestCase):
+    def test_probes_are_spread_across_window(self):
+        targets = [(f"10.0.{i // 250}.{i % 250 + 1}", "us-east-1") for i in range(1000)]
+        plan = PacedDispatcher(window=20).plan(targets)
+
+        self.assertEqual(len(plan.offsets), 1000)
+        self.assertEqual(min(plan.offsets), 0)
+        self.assertLess(max(plan.offsets), 20)
+        self.assertAlmostEqual(plan.rate, 50)
+
+    def test_subnet_cap_limits_probes_per_24(self):
+        targets = [(f"10.0.0.{i}", None) for i in range(1, 11)]
+        plan = PacedDispatcher(window=1, subnet_rate=2).plan(targets)
+
+        # 10 probes into one /24 at 2/s cannot finish in under 4.5 seconds
+        self.assertGreaterEqual(max(plan.offsets), 4.5)
+
+    def test_capped_region_only_delays_its_own_probes(self):
+        # 300 probes of one region at 20/s need 15s, the 700 others must still fit the 10s window
+        targets = [(f"10.1.{i}.1", "hot") for i in range(300)]
+        targets += [(f"10.2.{i // 10}.{i % 10 + 1}", f"region-{i // 10}") for i in range(700)]
+        plan = PacedDispatcher(window=10, region_rate=20).plan(targets)
+
+        hot = [plan.offsets[i] for i in range(300)]
+        others = [plan.offsets[i] for i in range(300, 1000)]
+        self.assertLess(max(others), 10)
+        self.assertGreaterEqual(max(hot), 14.9)
+        # Each hot probe is at least 1/20s after the previous one
+        hot.sort()
+        self.assertGreaterEqual(min(b - a for a, b in zip(hot, hot[1:])), 0.05 - 1e-9)
+        self.assertEqual(len(set(plan.offsets)), 1000)
+
+    def test_stats_report_rate_and_queue_delay(self):
+        plan = PacedDispatcher(window=10).plan([(f"10.0.0.{i}", None) for i in range(1, 11)])
+        plan.start(now=0)
+        for index in plan.order:
+            plan.mark_sent(index, now=plan.offsets[index] + 0.5)
+
+        stats = plan.stats()
+        self.assertEqual(stats['probes'], 10)
+        self.assertAlmostEqual(stats['queue_delay_max'], 0.5)
+        self.assertAlmostEqual(stats['achieved_rate'], 1)
+
+
+class CycleSchedulerTests(SimpleTestCase):
+    def test_slots_land_on_interval_boundaries(self):
+        scheduler = CycleScheduler(interval=30)
+
+        self.assertEqual(scheduler.next_slot(now=1000), 1020)
+        self.assertEqual(scheduler.next_slot(now=1020), 1020)
+
+    def test_slot_is_never_reused(self):
+        scheduler = CycleScheduler(interval=30)
+        scheduler.slot = 1020
+
+        # A fast cycle finishing inside its own slot moves on to the next one
+        self.assertEqual(scheduler.next_slot(now=1020.5), 1050)
+        # An overrun skips the boundaries it covered
+        self.assertEqual(scheduler.next_slot(now=1085), 1110)
+
+
+class HashRingTests(SimpleTestCase):
+    keys = [f"00000000-0000-0000-0000-{i:012d}" for i in range(2000)]
+
+    def test_every_shard_gets_a_share(self):
+        ring = HashRing([0, 1, 2, 3])
+        owners = [ring.owner(key) for key in self.keys]
+
+        for shard in range(4):
+            self.assertGreater(owners.count(shard), 2000 / 4 * 0.5)
+
+    def test_dead_shard_only_moves_its_own_hosts(self):
+        before = HashRing([0, 1, 2, 3])
+        after = HashRing([0, 1, 3])
+
+        for key in self.keys:
+            if before.owner(key) != 2:
+                self.assertEqual(before.owner(key), after.owner(key))
+            else:
+                self.assertIn(after.owner(key), [0, 1, 3])
+
+
+class PacedStubProber:
+    """Sends on the plan's schedule and loses the last few probes, which then wait out the timeout"""
+
+    def __init__(self, timeout, lost=2):
+        self.timeout = timeout
+        self.lost = lost
+
+    def probe(self, addresses, plan):
+        plan.start()
+        for index in plan.order:
+            delay = plan.due(index) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            plan.mark_sent(index)
+        lost = set(plan.order[-self.lost:])
+        time.sleep(self.timeout / 1000)
+        return [(False, 0) if index in lost else (True, 1.0) for index in range(len(addresses))]
+
+    def close(self):
+        pass
+
+
+class MonitorCycleTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(
+            MONITOR_INTERVAL=2,
+            MONITOR_PROBE_TIMEOUT=500,
+            MONITOR_PROBE_ENGINE='stub',
+            RRD_DIR=Path(directory.name) / 'rrd',
+            MONITOR_EVENTS_DIR=Path(directory.name) / 'events',
+        ))
+
+    def test_window_leaves_room_for_timeout_and_writes(self):
+        with override_settings(MONITOR_DISPATCH_FRACTION=0.6):
+            self.assertEqual(dispatch_window(30, 2000), 18)
+            self.assertEqual(dispatch_window(30, 25000), 5)
+
+    def test_full_cycle_finishes_inside_one_interval(self):
+        Hosts.objects.bulk_create([
+            Hosts(host_name=f"host-{index}", host_ip_address=f"10.0.{index // 250}.{index % 250 + 1}")
+            for index in range(200)
+        ])
+        monitor = ICMPMonitor()
+        self.addCleanup(monitor.close)
+        monitor.prober = PacedStubProber(monitor.timeout)
+
+        monitor.run()
+
+        self.assertEqual(monitor.cycle_stats['probes'], 200)
+        self.assertEqual(monitor.cycle_stats['timeouts'], 2)
+        self.assertLess(monitor.cycle_stats['cycle_time'], 2)
+
+    def test_save_host_statuses_writes_changed_hosts_and_groups_last_check(self):
+        Hosts.objects.bulk_create([
+            Hosts(host_name=f"host-{index}", host_ip_address=f"10.0.0.{index}", downtime_allotment=30)
+            for index in range(10)
+        ])
+        hosts = list(Hosts.objects.order_by('id'))
+        monitor = ICMPMonitor()
+        self.addCleanup(monitor.close)
+        monitor.write_batch_size = 3
+        checked_at = timezone.now()
+
+        changed, unchanged, untouched = hosts[:2], hosts[2:9], hosts[9]
+        for host in changed:
+            host.is_active = False
+            host.downtime_allotment = 0
+            host.last_check = checked_at
+        # Unchanged hosts only get last_check, in-memory edits to other fields must not be written
+        for host in unchanged:
+            host.downtime_allotment = 99
+
+        with CaptureQueriesContext(connection) as queries:
+            monitor.save_host_statuses(changed, unchanged, checked_at)
+
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        # One bulk UPDATE for the changed hosts, the 7 unchanged ids in groups of 3
+        self.assertEqual(len(updates), 4)
+        self.assertEqual(sum('"last_check" = ' in sql and 'CASE' not in sql for sql in updates), 3)
+
+        rows = {host.pk: host for host in Hosts.objects.all()}
+        for host in changed:
+            self.assertFalse(rows[host.pk].is_active)
+            self.assertEqual(rows[host.pk].downtime_allotment, 0)
+            self.assertEqual(rows[host.pk].last_check, checked_at)
+        for host in unchanged:
+            self.assertTrue(rows[host.pk].is_active)
+            self.assertEqual(rows[host.pk].downtime_allotment, 30)
+            self.assertEqual(rows[host.pk].last_check, checked_at)
+        self.assertIsNone(rows[untouched.pk].last_check)
+
+    def test_aggregate_combines_the_previous_slot_when_a_shard_is_ahead(self):
+        def partial(slot, hosts, active):
+            return {'slot': slot, 'hosts': hosts, 'active': active, 'latency_sum': active * 10, 'groups': {}}
+
+        # Shard 1 already finished the current slot, its previous one must still be found
+        MonitorStatus.objects.create(monitor_type='icmp', shard=1, status='running', metrics={
+            'aggregates': {'58': partial(58, 10, 5), '60': partial(60, 10, 10)},
+        })
+        monitor = ICMPMonitor()
+        self.addCleanup(monitor.close)
+        monitor.partials = {'56': partial(56, 10, 0), '58': partial(58, 10, 10)}
+
+        with mock.patch.object(monitor.rrd_queue, 'submit') as submit:
+            monitor.write_aggregate(60, partial(60, 10, 0), {0, 1})
+
+        submit.assert_called_once_with('monitors_aggregate_icmp', 75.0, 10.0, 58)
+        self.assertEqual(sorted(monitor.partials), ['58', '60'])
+
+    def test_hosts_taken_over_from_another_shard_are_reloaded(self):
+        Hosts.objects.bulk_create([
+            Hosts(host_name=f"host-{index}", host_ip_address=f"10.0.0.{index}", downtime_allotment=30)
+            for index in range(40)
+        ])
+        monitor = ICMPMonitor()
+        self.addCleanup(monitor.close)
+        monitor.registry.refresh()
+        kept = {host.pk for host in monitor.owned_hosts(monitor.registry.hosts(), {0, 1})}
+        self.assertTrue(0 < len(kept) < 40)
+
+        # Shard 1's status writes leave change_version alone, then shard 1 dies
+        Hosts.objects.exclude(pk__in=kept).update(is_active=False, downtime_allotment=0)
+        owned = monitor.owned_hosts(monitor.registry.hosts(), {0})
+
+        self.assertEqual(len(owned), 40)
+        for host in owned:
+            self.assertEqual(host.is_active, host.pk in kept)
+            self.assertEqual(host.downtime_allotment, 30 if host.pk in kept else 0)
+
+    def test_failed_check_uses_one_interval_of_allotment(self):
+        host = Hosts.objects.create(host_name='host', host_ip_address='10.0.0.1', downtime_allotment=5)
+        monitor = ICMPMonitor()
+        self.addCleanup(monitor.close)
+        checked_at = timezone.now()
+
+        with mock.patch.object(monitor.rrd_queue, 'submit'):
+            self.assertTrue(monitor.update_host_status(host, False, 0, checked_at))
+            self.assertEqual((host.is_active, host.downtime_allotment), (True, 3))
+            monitor.update_host_status(host, False, 0, checked_at)
+            monitor.update_host_status(host, False, 0, checked_at)
+            monitor.update_host_status(host, False, 0, checked_at)
+
+        self.assertEqual((host.is_active, host.downtime_allotment), (False, 0))
+
+
+class HostRegistryTests(TestCase):
+    def setUp(self):
+        Hosts.objects.bulk_create([Hosts(host_name=f"host-{index}") for index in range(20)])
+        self.registry = HostRegistry()
+        self.registry.refresh()
+
+    def test_unchanged_version_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.registry.refresh(), 0)
+
+    def test_changed_rows_are_loaded_without_reconciling(self):
+        host = Hosts.objects.get(host_name='host-3')
+        HostService.update_host_settings(str(host.uuid), {'host_name': 'renamed'})
+        HostService.update_host_monitoring_status(str(Hosts.objects.get(host_name='host-4').uuid), False)
+
+        with mock.patch.object(self.registry, 'reconcile') as reconcile:
+            self.assertEqual(self.registry.refresh(), 1)
+        reconcile.assert_not_called()
+        self.assertEqual(self.registry.records[host.pk].host_name, 'renamed')
+        self.assertEqual(len(self.registry), 19)
+
+    def test_deletes_reconcile(self):
+        HostService.delete_host(str(Hosts.objects.get(host_name='host-5').uuid))
+
+        self.registry.refresh()
+        self.assertEqual(len(self.registry), 19)
+        self.assertNotIn('host-5', [host.host_name for host in self.registry.hosts()])
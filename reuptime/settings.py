@@ -97,16 +97,129 @@ WSGI_APPLICATION = 'reuptime.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Pragmas run on every new SQLite connection so the monitor, its pool workers and the web workers can read while
+# a cycle writes. WAL stays set in the database file once enabled, the others apply per connection.
+# Transactions take the write lock when they begin: a deferred transaction that reads and then writes gets
+# SQLITE_BUSY on the lock upgrade straight away instead of waiting out busy_timeout.
+# Set SQLITE_PROFILE=0 to keep SQLite's defaults, './manage.py benchmark_db' compares both.
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', '1') == '1'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 10000)),  # milliseconds
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative is KiB, 64 MiB
+}
+SQLITE_TRANSACTION_MODE = 'IMMEDIATE' if SQLITE_PROFILE else None
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': INSTANCE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': SQLITE_TRANSACTION_MODE,
+        },
     }
 }
 
 RRD_DIR = INSTANCE_DIR / 'rrd'
 
+# RRD files are spread over subdirectories of RRD_DIR, one level per entry using that many characters of the
+# file's key, e.g. 2,2 stores ab/cd/<uuid>.rrd. Leave empty to keep every file directly in RRD_DIR.
+# Flat files stay readable after enabling this, './manage.py migrate_rrd_layout' moves them into place.
+RRD_DIR_FANOUT = [int(width) for width in os.environ.get('RRD_DIR_FANOUT', '2,2').split(',') if width.strip()]
+
+# Storage for host uptime/latency series
+# 'rrdtool' keeps one RRD file per host, 'columnar' keeps every host in one memory-mapped ring buffer per
+# resolution under RRD_DIR/columnar so a cycle is written with a few array assignments. Host RRD files that
+# already exist keep being used with 'columnar', new hosts start in the store without history.
+RRD_BACKEND = os.environ.get('RRD_BACKEND', 'rrdtool')
+
+# Threads copying the template RRD file when many hosts are provisioned at once (imports, init_rrd)
+RRD_PROVISION_WORKERS = int(os.environ.get('RRD_PROVISION_WORKERS', 8))
+
+# Optional rrdcached address (e.g. unix:/var/run/rrdcached.sock) so RRD writes are coalesced
+RRDCACHED_ADDRESS = os.environ.get('RRDCACHED_ADDRESS')
+
+# Pending updates held by the monitor's RRD writer thread before callers block
+RRD_QUEUE_SIZE = int(os.environ.get('RRD_QUEUE_SIZE', 20000))
+
+# RRD fetch results are cached until the next RRD step
+# Each process keeps an LRU of up to RRD_FETCH_CACHE_BYTES in front of the rrd_fetch cache shared by all web workers
+RRD_FETCH_CACHE_BYTES = int(os.environ.get('RRD_FETCH_CACHE_BYTES', 32 * 1024 * 1024))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'rrd_fetch': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': INSTANCE_DIR / 'cache' / 'rrd_fetch',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('RRD_FETCH_CACHE_ENTRIES', 5000)),
+        },
+    },
+}
+
+# Batch metrics requests fetch up to METRICS_BATCH_WORKERS RRD files at once per web worker
+METRICS_BATCH_WORKERS = int(os.environ.get('METRICS_BATCH_WORKERS', 8))
+METRICS_BATCH_MAX_HOSTS = int(os.environ.get('METRICS_BATCH_MAX_HOSTS', 500))
+
+# Hosts per page on the host listings and their JSON API, the API's limit parameter is capped at HOSTS_PAGE_MAX
+HOSTS_PAGE_SIZE = int(os.environ.get('HOSTS_PAGE_SIZE', 100))
+HOSTS_PAGE_MAX = int(os.environ.get('HOSTS_PAGE_MAX', 1000))
+
+# CSV host imports insert and provision HOST_IMPORT_CHUNK hosts at a time
+# Uploads over HOST_IMPORT_BACKGROUND_BYTES run as a background job, its file and progress are kept in HOST_IMPORT_DIR
+HOST_IMPORT_CHUNK = int(os.environ.get('HOST_IMPORT_CHUNK', 1000))
+HOST_IMPORT_BACKGROUND_BYTES = int(os.environ.get('HOST_IMPORT_BACKGROUND_BYTES', 256 * 1024))
+HOST_IMPORT_DIR = INSTANCE_DIR / 'imports'
+HOST_IMPORT_MAX_ERRORS = 1000
+
 APP_LOG_DIR = INSTANCE_DIR / 'logs'
+# monitors.log and rrd.log are written by the monitor, its ping workers and every web worker, rotate them
+# with logrotate (renaming to .1, no copytruncate), each process reopens the file once it was moved
+# Most the log monitor returns per poll
+LOG_READ_MAX_BYTES = 1024 * 1024
+
+# The monitor drops one event file per shard here after every cycle, web workers check it every
+# MONITOR_EVENTS_POLL_INTERVAL seconds and push new events to /events/cycles clients
+MONITOR_EVENTS_DIR = INSTANCE_DIR / 'events'
+MONITOR_EVENTS_POLL_INTERVAL = float(os.environ.get('MONITOR_EVENTS_POLL_INTERVAL', 1))
+# Seconds between keep-alive comments on idle event streams, proxies drop silent connections
+MONITOR_EVENTS_KEEPALIVE = 15
+
+# ICMP probe engine used by the monitor daemon
+# 'socket' multiplexes every probe over one ICMP socket, 'subprocess' runs the system ping per host
+MONITOR_PROBE_ENGINE = os.environ.get('MONITOR_PROBE_ENGINE', 'socket')
+
+# Seconds between monitor cycles, probes are spread evenly across it
+# Cycles start on multiples of this interval, keep it equal to the RRD step
+MONITOR_INTERVAL = 30
+
+# Probes are sent within the first MONITOR_DISPATCH_FRACTION of the interval and time out after
+# MONITOR_PROBE_TIMEOUT milliseconds, the rest of the interval is left for the status, RRD and heartbeat writes
+MONITOR_DISPATCH_FRACTION = float(os.environ.get('MONITOR_DISPATCH_FRACTION', 0.6))
+MONITOR_PROBE_TIMEOUT = int(os.environ.get('MONITOR_PROBE_TIMEOUT', 2000))
+
+# Probe rate caps in probes per second, 0 disables the cap
+# The global rate defaults to spreading all hosts across the interval
+MONITOR_PROBE_RATE = float(os.environ.get('MONITOR_PROBE_RATE', 0))
+MONITOR_REGION_PROBE_RATE = float(os.environ.get('MONITOR_REGION_PROBE_RATE', 0))
+MONITOR_SUBNET_PROBE_RATE = float(os.environ.get('MONITOR_SUBNET_PROBE_RATE', 0))
+
+# Monitor shards started on this machine by 'monitor_icmp start', hosts are split between all live shards
+# A shard without a heartbeat for MONITOR_SHARD_TIMEOUT seconds is considered dead and its hosts rebalanced
+MONITOR_SHARDS = int(os.environ.get('MONITOR_SHARDS', 1))
+MONITOR_SHARD_TIMEOUT = MONITOR_INTERVAL * 3
+
+# Host counters come from the newest cycle event while it is younger than this, else from the database
+MONITOR_COUNTS_MAX_AGE = int(os.environ.get('MONITOR_COUNTS_MAX_AGE', MONITOR_INTERVAL * 2))
+
+# Long-lived ping worker pool used by the subprocess probe engine and for addresses the socket cannot probe
+# Workers are replaced after MONITOR_WORKER_MAX_TASKS pings to bound their memory
+MONITOR_WORKERS = int(os.environ.get('MONITOR_WORKERS', 16))
+MONITOR_WORKER_MAX_TASKS = int(os.environ.get('MONITOR_WORKER_MAX_TASKS', 1000))
 
 
 # Password validation
@@ -25,7 +25,8 @@ class RrdConfig(AppConfig):
             'handlers': {
                 'file': {
                     'level': 'INFO',
-                    'class': 'logging.FileHandler',
+                    # Several processes append to this file, logrotate renames it and each reopens it
+                    'class': 'logging.handlers.WatchedFileHandler',
                     'filename': log_file,
                     'formatter': 'verbose',
                 },
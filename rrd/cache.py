@@ -0,0 +1,103 @@
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger("rrd")
+
+class FetchCache:
+    """
+    Two level cache for rrdtool.fetch results.
+
+    Keys carry the RRD file, resolution code, the step the fetch ended on and
+    the file's last update, so an entry can only be reused within its own step
+    while the file is unchanged, and expires at the next step boundary. Each
+    process keeps an LRU capped at ``max_bytes`` in front of the shared Django
+    cache, which lets gunicorn workers reuse each other's fetches. Shared hits
+    are copied into the local LRU until the same expiry.
+    """
+
+    def __init__(self, alias="rrd_fetch", max_bytes=None):
+        self.alias = alias
+        self.max_bytes = settings.RRD_FETCH_CACHE_BYTES if max_bytes is None else max_bytes
+        self.entries = OrderedDict()  # key -> (expires, size, value)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.counters = {"local_hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def key(rrd_file, time_range_resolution_code, step, last_update):
+        return f"rrd_fetch:{rrd_file}:{time_range_resolution_code}:{step}:{last_update}"
+
+    def get(self, key):
+        """Cached value for key or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self.entries.move_to_end(key)
+                    self.counters["local_hits"] += 1
+                    return entry[2]
+                self.discard(key)
+
+        try:
+            entry = caches[self.alias].get(key)
+        except Exception as e:
+            logger.warning(f"Shared fetch cache unavailable: {str(e)}")
+            entry = None
+
+        with self.lock:
+            self.counters["shared_hits" if entry is not None else "misses"] += 1
+        if entry is None:
+            return None
+
+        # Shared entries carry their expiry so the local copy ends with them
+        expires, value = entry
+        if expires > time.time():
+            self.remember(key, value, expires)
+        return value
+
+    def set(self, key, value, expires):
+        """Cache value in both levels until the wall-clock time expires"""
+        ttl = expires - time.time()
+        if ttl <= 0:
+            return
+        try:
+            caches[self.alias].set(key, (expires, value), ttl)
+        except Exception as e:
+            logger.warning(f"Shared fetch cache unavailable: {str(e)}")
+        self.remember(key, value, expires)
+
+    def remember(self, key, value, expires):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self.discard(key)
+            self.entries[key] = (expires, size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                self.discard(next(iter(self.entries)))
+                self.counters["evictions"] += 1
+
+    def discard(self, key):
+        """Drop key from the local level, the caller holds the lock"""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "entries": len(self.entries), "bytes": self.size}
+
+
+# One per process, shared by every RRDService instance
+fetch_cache = FetchCache()
@@ -0,0 +1,100 @@
+import numpy as np
+
+def lttb_indices(x, ys, max_points):
+    """
+    Rows kept by Largest-Triangle-Three-Buckets over series sharing x.
+
+    The first and last rows are always kept and the rest are split into
+    max_points - 2 buckets. In each bucket the row forming the largest
+    triangle with its neighbouring buckets is kept. The previous bucket's
+    average stands in for the previously kept point, which lets every bucket
+    be solved at once instead of one after the other. With several series
+    their areas are scaled by each series' range and the largest wins, so a
+    latency spike and an uptime dip are both kept. NaN values never win
+    unless a bucket holds nothing else.
+
+    Args:
+        x (ndarray): Row positions, increasing
+        ys (ndarray): Shape (series, rows), NaN for missing values
+        max_points (int): Rows to keep, at least 3
+
+    Returns:
+        ndarray: Indices of the kept rows in increasing order
+    """
+    count = len(x)
+    if max_points >= count or max_points < 3:
+        return np.arange(count)
+
+    buckets = max_points - 2
+    inner = np.arange(1, count - 1)
+    bucket = (inner - 1) * buckets // (count - 2)
+    sizes = np.bincount(bucket, minlength=buckets)
+
+    ys = np.atleast_2d(np.asarray(ys, dtype=float))
+    x = np.asarray(x, dtype=float)
+    inner_x = x[inner]
+    mean_x = np.bincount(bucket, weights=inner_x, minlength=buckets) / sizes
+    # Neighbour averages: bucket k is compared with buckets k - 1 and k + 1, the ends with the end rows
+    ax = np.concatenate(([x[0]], mean_x[:-1]))[bucket]
+    cx = np.concatenate((mean_x[1:], [x[-1]]))[bucket]
+
+    scores = np.full((len(ys), len(inner)), -1.0)
+    for row, y in enumerate(ys):
+        inner_y = y[inner]
+        present = ~np.isnan(inner_y)
+        valid = np.bincount(bucket, weights=present, minlength=buckets)
+        sums = np.bincount(bucket, weights=np.where(present, inner_y, 0.0), minlength=buckets)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_y = sums / valid
+        ay = np.concatenate(([y[0]], mean_y[:-1]))[bucket]
+        cy = np.concatenate((mean_y[1:], [y[-1]]))[bucket]
+
+        area = np.abs((ax - cx) * (inner_y - ay) - (ax - inner_x) * (cy - ay))
+        span = np.nanmax(y) - np.nanmin(y) if present.any() else 0
+        area = area / (span or 1)
+        scores[row] = np.where(np.isnan(area), -1.0, area)
+
+    score = scores.max(axis=0)
+    # Buckets are contiguous runs, keep the first row of each that reaches its bucket's best score
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    best = np.flatnonzero(score == np.maximum.reduceat(score, starts)[bucket])
+    best = best[np.concatenate(([True], np.diff(bucket[best]) != 0))]
+    return np.concatenate(([0], inner[best], [count - 1]))
+
+def downsample(rrd_data, max_points):
+    """
+    Reduce an rrdtool.fetch result to at most max_points rows.
+
+    Kept rows are no longer evenly spaced, so the result carries their
+    timestamps as a fourth element: ((start, end, step), names, rows, timestamps).
+    Results that already fit are returned unchanged.
+    """
+    (start, end, step), names, rows = rrd_data[:3]
+    if not max_points or len(rows) <= max_points:
+        return rrd_data
+
+    # None becomes NaN
+    values = np.array(rows, dtype=float)
+    x = start + step * np.arange(len(rows))
+    keep = lttb_indices(x, values.T, max_points)
+
+    return (
+        (start, end, step),
+        names,
+        [rows[index] for index in keep],
+        [int(timestamp) for timestamp in x[keep]],
+    )
+
+def column_means(rrd_data):
+    """Mean of each data source over its non-null rows, None when a column is empty"""
+    names, rows = rrd_data[1], rrd_data[2]
+    if not rows:
+        return {name: None for name in names}
+    values = np.array(rows, dtype=float)
+    present = ~np.isnan(values)
+    sums = np.where(present, values, 0.0).sum(axis=0)
+    counts = present.sum(axis=0)
+    return {
+        name: round(float(sums[index] / counts[index]), 4) if counts[index] else None
+        for index, name in enumerate(names)
+    }
@@ -0,0 +1,171 @@
+import array
+import json
+import math
+import struct
+import sys
+
+# Binary metrics format, version 1
+#
+#   magic "RUC1" | uint32 LE header length | JSON header | payload
+#
+# The header carries start, end, step, count and the DS names, and for every
+# column its type, number of present values and the [offset, length] of its
+# null bitmap and data within the payload. Bit i of a bitmap (LSB first) is
+# set when row i is null. Data holds only the present values:
+#   uint8    delta from the previous present value, modulo 256
+#   float32  IEEE bits XORed with the previous present value's bits, stored as
+#            four byte planes (all low bytes first) so gzip finds the runs
+# Downsampled series are not evenly spaced. They add a "timestamps" entry with
+# the [offset, length] of each row's step index since start, delta coded as
+# uint32 in four byte planes.
+MAGIC = b"RUC1"
+
+def is_null(value):
+    return value is None or math.isnan(value)
+
+def column_type(name, values):
+    """uint8 for uptime columns holding whole percentages, float32 for everything else"""
+    if name == "uptime" and all(value.is_integer() and 0 <= value <= 255 for value in values):
+        return "uint8"
+    return "float32"
+
+def null_bitmap(values):
+    bitmap = bytearray((len(values) + 7) // 8)
+    for index, value in enumerate(values):
+        if is_null(value):
+            bitmap[index >> 3] |= 1 << (index & 7)
+    return bytes(bitmap)
+
+def byte_planes(words):
+    if sys.byteorder != "little":
+        words.byteswap()
+    raw = words.tobytes()
+    return b"".join(raw[plane::4] for plane in range(4))
+
+def from_byte_planes(data, count):
+    words = array.array("I", bytes(data[plane * count + index] for index in range(count) for plane in range(4)))
+    if sys.byteorder != "little":
+        words.byteswap()
+    return words
+
+def encode_uint8(values):
+    data = bytearray(len(values))
+    previous = 0
+    for index, value in enumerate(values):
+        value = int(value)
+        data[index] = (value - previous) & 0xFF
+        previous = value
+    return bytes(data)
+
+def encode_float32(values):
+    words = array.array("I", array.array("f", values).tobytes())
+    previous = 0
+    for index, word in enumerate(words):
+        words[index] = word ^ previous
+        previous = word
+    return byte_planes(words)
+
+def encode_timestamps(timestamps, start, step):
+    words = array.array("I")
+    previous = 0
+    for timestamp in timestamps:
+        index = (timestamp - start) // step
+        words.append(index - previous)
+        previous = index
+    return byte_planes(words)
+
+def encode_columnar(rrd_data, **meta):
+    """
+    Encode an rrdtool.fetch result as RUC1 bytes.
+
+    Args:
+        rrd_data (tuple): ((start, end, step), names, rows) as returned by rrdtool.fetch,
+            optionally followed by the row timestamps of a downsampled series
+        meta: Extra header fields, e.g. rrd_file
+    """
+    (start, end, step), names, rows = rrd_data[:3]
+    header = {
+        **meta,
+        "start": start,
+        "end": end,
+        "step": step,
+        "count": len(rows),
+        "names": list(names),
+        "columns": [],
+    }
+
+    payload = bytearray()
+    for index, name in enumerate(names):
+        values = [row[index] for row in rows]
+        present = [value for value in values if not is_null(value)]
+        kind = column_type(name, present)
+        bitmap = null_bitmap(values)
+        data = encode_uint8(present) if kind == "uint8" else encode_float32(present)
+
+        header["columns"].append({
+            "name": name,
+            "type": kind,
+            "present": len(present),
+            "bitmap": [len(payload), len(bitmap)],
+            "data": [len(payload) + len(bitmap), len(data)],
+        })
+        payload += bitmap
+        payload += data
+
+    if len(rrd_data) > 3:
+        data = encode_timestamps(rrd_data[3], start, step)
+        header["timestamps"] = [len(payload), len(data)]
+        payload += data
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    return MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes + bytes(payload)
+
+def decode_columnar(body):
+    """Decode RUC1 bytes back into an rrdtool.fetch style tuple, nulls as None, plus timestamps if present"""
+    if body[:4] != MAGIC:
+        raise ValueError("Not a RUC1 metrics payload")
+    (header_length,) = struct.unpack_from("<I", body, 4)
+    header = json.loads(body[8:8 + header_length])
+    payload = body[8 + header_length:]
+    count = header["count"]
+
+    columns = []
+    for column in header["columns"]:
+        offset, length = column["bitmap"]
+        bitmap = payload[offset:offset + length]
+        offset, length = column["data"]
+        data = payload[offset:offset + length]
+        present = column["present"]
+
+        if column["type"] == "uint8":
+            decoded = []
+            previous = 0
+            for delta in data:
+                previous = (previous + delta) & 0xFF
+                decoded.append(float(previous))
+        else:
+            words = from_byte_planes(data, present)
+            previous = 0
+            for index, word in enumerate(words):
+                previous ^= word
+                words[index] = previous
+            decoded = list(array.array("f", words.tobytes()))
+
+        values = iter(decoded)
+        columns.append([
+            None if bitmap[index >> 3] >> (index & 7) & 1 else next(values)
+            for index in range(count)
+        ])
+
+    rows = list(zip(*columns)) if columns else [() for _ in range(count)]
+    timing = (header["start"], header["end"], header["step"])
+    if "timestamps" not in header:
+        return timing, tuple(header["names"]), rows
+
+    offset, length = header["timestamps"]
+    index = 0
+    timestamps = []
+    for delta in from_byte_planes(payload[offset:offset + length], count):
+        index += delta
+        timestamps.append(header["start"] + index * header["step"])
+    return timing, tuple(header["names"]), rows, timestamps
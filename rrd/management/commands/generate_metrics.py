@@ -1,11 +1,9 @@
 from django.core.management.base import BaseCommand
-from django.conf import settings
 from rrd.services import RRDService
 import logging
 import time
 import random
 from pathlib import Path
-import rrdtool
 from website.models import Hosts
 
 logger = logging.getLogger('rrd')
@@ -25,20 +23,19 @@ class Command(BaseCommand):
         """Round up to the next interval"""
         return ((timestamp + interval - 1) // interval) * interval
 
-    def get_last_update(self, rrd_path):
+    def get_last_update(self, service, host_id):
         """Get the last update time from RRD file"""
         try:
-            return rrdtool.last(str(rrd_path))
+            return service.last_update(host_id)
         except Exception as e:
-            logger.error(f"Failed to get last update time for {rrd_path}: {str(e)}")
+            logger.error(f"Failed to get last update time for host {host_id}: {str(e)}")
             return None
 
     def generate_metrics(self, host_id, hours):
         """Generate metrics for a specific host"""
-        rrd_path = settings.RRD_DIR / f"{host_id}.rrd"
         service = RRDService()
 
-        if not rrd_path.exists():
+        if not service.rrd_exists(host_id):
             logger.info(f"RRD file not found for host {host_id}, creating new file")
             try:
                 service.create_rrd_file(host_id)
@@ -48,9 +45,9 @@ class Command(BaseCommand):
                 return
 
         # Get the last update time
-        last_update = self.get_last_update(rrd_path)
+        last_update = self.get_last_update(service, host_id)
         if last_update is None:
-            logger.error(f"Failed to get last update time for {rrd_path}")
+            logger.error(f"Failed to get last update time for host {host_id}")
             return
 
         # Calculate start time (next interval after last update)
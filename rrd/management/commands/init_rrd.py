@@ -8,11 +8,27 @@ logger = logging.getLogger('rrd')
 class Command(BaseCommand):
     help = 'Initialize RRD database files for all hosts'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.RRD_PROVISION_WORKERS,
+            help=f'Files created in parallel (default: {settings.RRD_PROVISION_WORKERS})'
+        )
+
+    def progress(self, done, total):
+        self.stdout.write(f'\r{done}/{total} RRD files created', ending='')
+        if done == total:
+            self.stdout.write('')
+
     def handle(self, *args, **options):
         try:
             service = RRDService()
-            service.initialize_all_rrd_files()
-            self.stdout.write(self.style.SUCCESS('Successfully initialized RRD files'))
+            counts = service.initialize_all_rrd_files(progress=self.progress, workers=options['workers'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Successfully initialized RRD files: {counts['created']} created, "
+                f"{counts['existing']} already present, {counts['failed']} failed"
+            ))
         except Exception as e:
             logger.error(f"Failed to initialize RRD files: {str(e)}")
             self.stdout.write(self.style.ERROR(f'Failed to initialize RRD files: {str(e)}'))
\ No newline at end of file
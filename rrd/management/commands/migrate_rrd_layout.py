@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+from concurrent.futures import ThreadPoolExecutor
+from rrd.services import RRDService
+from pathlib import Path
+import logging
+import os
+import rrdtool
+import time
+
+logger = logging.getLogger('rrd')
+
+class Command(BaseCommand):
+    help = 'Move RRD files into the RRD_DIR_FANOUT layout while the monitor keeps running'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Files moved in parallel (default: 8)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many files would move'
+        )
+
+    def find_misplaced(self, service):
+        """(current, target) for every RRD file not where the layout puts it, flat or from an older layout"""
+        for directory, _, files in os.walk(service.rrd_dir):
+            for file_name in files:
+                if not file_name.endswith('.rrd'):
+                    continue
+                path = Path(directory) / file_name
+                target = service.layout_path(file_name[:-len('.rrd')])
+                if path != target:
+                    yield path, target
+
+    def move(self, service, path, target):
+        """
+        Move one file, returns 'moved', 'exists' or 'failed'
+
+        A rename is atomic on one filesystem, readers and writers see the file
+        at either its old or new path and RRDService finds both. Pending
+        rrdcached updates are flushed first so they are not written to a file
+        that has gone.
+        """
+        try:
+            if target.exists():
+                logger.warning(f"Not moving {path}, {target} already exists")
+                return 'exists'
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if service.daemon_args:
+                rrdtool.flushcached(*service.daemon_args, str(path))
+            os.rename(path, target)
+            return 'moved'
+        except Exception as e:
+            logger.error(f"Failed to move {path} to {target}: {str(e)}")
+            return 'failed'
+
+    def prune(self, service):
+        """Remove directories left empty by a previous layout"""
+        for directory, _, _ in os.walk(service.rrd_dir, topdown=False):
+            if directory != str(service.rrd_dir):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+
+    def handle(self, *args, **options):
+        service = RRDService()
+        misplaced = list(self.find_misplaced(service))
+        layout = '/'.join(str(width) for width in service.fanout) or 'flat'
+
+        if options['dry_run'] or not misplaced:
+            self.stdout.write(f'{len(misplaced)} RRD files to move into the {layout} layout')
+            return
+
+        started = time.perf_counter()
+        results = {'moved': 0, 'exists': 0, 'failed': 0}
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='rrd-migrate') as executor:
+            for index, result in enumerate(executor.map(lambda move: self.move(service, *move), misplaced), 1):
+                results[result] += 1
+                if index % 10000 == 0:
+                    self.stdout.write(f'{index}/{len(misplaced)} files processed')
+        self.prune(service)
+
+        message = (
+            f"Moved {results['moved']} RRD files into the {layout} layout in {time.perf_counter() - started:.1f}s, "
+            f"{results['exists']} skipped as already present, {results['failed']} failed"
+        )
+        logger.info(message)
+        if results['exists'] or results['failed']:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
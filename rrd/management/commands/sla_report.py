@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from rrd.reports import REPORT_WINDOWS
+from website.services import ReportService
+import json
+import logging
+import sys
+import time
+
+logger = logging.getLogger('rrd')
+
+class Command(BaseCommand):
+    help = 'Report uptime, downtime against allotment and latency of every monitored host'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window',
+            choices=list(REPORT_WINDOWS),
+            default='30d',
+            help='Report window (default: 30d)'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['json', 'csv'],
+            default='json',
+            help='Output format (default: json)'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the report to this file instead of stdout'
+        )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='Recompute the report even if a cached one is still current'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            report = ReportService.get_sla_report(options['window'], use_cache=not options['no_cache'])
+        except Exception as e:
+            logger.error(f"Failed to build SLA report: {str(e)}")
+            raise CommandError(f'Failed to build SLA report: {str(e)}')
+
+        file = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            if options['format'] == 'csv':
+                ReportService.write_sla_report_csv(report, file)
+            else:
+                json.dump(report, file, indent=2)
+                file.write('\n')
+        finally:
+            if options['output']:
+                file.close()
+
+        logger.info(f"SLA report for {options['window']} covered {report['fleet']['hosts']} hosts in {time.perf_counter() - started:.2f}s")
+        if report['errors']:
+            self.stderr.write(self.style.WARNING(f"{len(report['errors'])} hosts could not be read"))
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['window']} report for {report['fleet']['hosts']} hosts to {options['output']}"))
@@ -0,0 +1,134 @@
+from itertools import chain
+import numpy as np
+
+# Report window -> (length in seconds, resolution of the RRA that covers it)
+REPORT_WINDOWS = {
+    "7d": (7 * 86400, 300),      # 5 minute RRA, 2016 rows
+    "30d": (30 * 86400, 3600),   # 1 hour RRA, 720 rows
+    "90d": (90 * 86400, 86400),  # 1 day RRA, 90 rows
+}
+
+# Allotments are seconds of downtime per 14 days (the default_downtime_allotment setting is bi-weekly),
+# prorated to the window. A host's downtime_allotment is what is left of it, the monitor uses up
+# MONITOR_INTERVAL seconds of it per failed check.
+ALLOTMENT_PERIOD = 14 * 86400
+
+def window_bounds(window, now):
+    """
+    Start, end and resolution of a report window ending on the last
+    completed row of its RRA, so the result only changes once per row.
+    """
+    length, resolution = REPORT_WINDOWS[window]
+    end = int(now) // resolution * resolution
+    return end - length, end, resolution
+
+def stack_series(series, count=None):
+    """
+    Stack the rows of many rrdtool.fetch results into one array.
+
+    Args:
+        series (list): Row lists, one per host, each row (uptime, latency)
+        count (int): Rows per host, defaults to the longest series
+
+    Returns:
+        ndarray: Shape (hosts, rows, 2), NaN where a value is missing
+    """
+    count = max((len(rows) for rows in series), default=0) if count is None else count
+    stacked = np.full((len(series), count, 2), np.nan)
+    for index, rows in enumerate(series):
+        rows = rows[:count]
+        if rows:
+            # Flattening by hand is about twice as fast as np.array on a list of tuples holding None
+            width = len(rows[0])
+            values = np.fromiter(
+                (np.nan if value is None else value for value in chain.from_iterable(rows)),
+                dtype=float,
+                count=len(rows) * width,
+            )
+            stacked[index, :len(rows)] = values.reshape(-1, width)[:, :2]
+    return stacked
+
+def align_rows(fetched, start, count, resolution):
+    """
+    Rows of a fetch result on the report grid, one per resolution from start.
+
+    rrdtool falls back to a coarser RRA when the requested one does not reach
+    back to start, so the step it returns is not always the one asked for.
+    Coarser rows are repeated for every grid row they cover and finer rows are
+    averaged, unknown values stay out of the average.
+
+    Returns:
+        ndarray: Shape (count, 2), NaN where a value is missing
+    """
+    (fetch_start, _, step), _, rows = fetched
+    values = stack_series([rows])[0]
+    if step == resolution and fetch_start == start:
+        aligned = np.full((count, 2), np.nan)
+        aligned[:min(count, len(values))] = values[:count]
+        return aligned
+
+    if step >= resolution:
+        index = (start + np.arange(count) * resolution - fetch_start) // step
+        valid = (index >= 0) & (index < len(values))
+        aligned = np.full((count, 2), np.nan)
+        aligned[valid] = values[index[valid]]
+        return aligned
+
+    target = (fetch_start + np.arange(len(values)) * step - start) // resolution
+    inside = (target >= 0) & (target < count)
+    present = ~np.isnan(values) & inside[:, None]
+    sums = np.zeros((count, 2))
+    counts = np.zeros((count, 2))
+    for column in range(2):
+        np.add.at(sums[:, column], target[present[:, column]], values[present[:, column], column])
+        np.add.at(counts[:, column], target[present[:, column]], 1)
+    with np.errstate(invalid="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+def summarize(stacked, step, window_seconds, allotments):
+    """
+    Uptime, downtime, allotment use and latency of every host at once.
+
+    Rows without data count neither as uptime nor downtime, coverage tells
+    how much of the window had samples. The RRAs only keep averages, so
+    latency_max is the worst row average at the window's resolution.
+
+    Args:
+        stacked (ndarray): Shape (hosts, rows, 2) from stack_series
+        step (int): Seconds per row
+        window_seconds (int): Length of the window
+        allotments (ndarray): Downtime allotment of each host in seconds per ALLOTMENT_PERIOD
+
+    Returns:
+        dict: Arrays of length hosts, NaN where a host has no data or no allotment
+    """
+    uptime = stacked[:, :, 0]
+    latency = stacked[:, :, 1]
+    rows = uptime.shape[1]
+
+    uptime_present = ~np.isnan(uptime)
+    uptime_samples = uptime_present.sum(axis=1)
+    latency_present = ~np.isnan(latency)
+    latency_samples = latency_present.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        uptime_mean = np.where(uptime_present, uptime, 0.0).sum(axis=1) / uptime_samples
+        downtime_minutes = np.where(uptime_present, 100.0 - uptime, 0.0).sum(axis=1) / 100.0 * step / 60.0
+        latency_mean = np.where(latency_present, latency, 0.0).sum(axis=1) / latency_samples
+        latency_max = np.where(latency_present, latency, -np.inf).max(axis=1, initial=-np.inf)
+        latency_max = np.where(latency_samples > 0, latency_max, np.nan)
+
+        allotments = np.asarray(allotments, dtype=float)
+        allotment_minutes = allotments / 60.0 * window_seconds / ALLOTMENT_PERIOD
+        has_allotment = allotment_minutes > 0
+        allotment_used = np.where(has_allotment, downtime_minutes / allotment_minutes * 100.0, np.nan)
+
+    return {
+        "uptime": uptime_mean,
+        "coverage": uptime_samples / rows * 100.0 if rows else np.full(len(uptime), np.nan),
+        "downtime_minutes": np.where(uptime_samples > 0, downtime_minutes, np.nan),
+        "allotment_minutes": np.where(has_allotment, allotment_minutes, np.nan),
+        "allotment_used": allotment_used,
+        "latency_mean": latency_mean,
+        "latency_max": latency_max,
+    }
@@ -1,23 +1,40 @@
+import hashlib
 import os
+import shutil
+import tempfile
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import rrdtool
 from django.conf import settings
 import logging
 import math
 from pathlib import Path
 from website.models import Hosts
+from rrd.cache import fetch_cache
+from rrd.store import ColumnarStore
 
 logger = logging.getLogger("rrd")
 
 class RRDService:
     def __init__(self):
         self.rrd_dir = settings.RRD_DIR
+        # Characters of the file key used for each subdirectory level, empty keeps every file in rrd_dir
+        self.fanout = settings.RRD_DIR_FANOUT
         self.step = 30  # 30 second collection frequency
         self.heartbeat = 60  # 2x step for heartbeat
 
+        # Route updates and reads through rrdcached when configured
+        self.daemon_args = ["--daemon", settings.RRDCACHED_ADDRESS] if settings.RRDCACHED_ADDRESS else []
+
         # Ensure RRD directory exists
         os.makedirs(self.rrd_dir, exist_ok=True)
 
+        # Host uptime/latency series live in the columnar store when it is enabled,
+        # files with other data sources (self metrics, group aggregates) stay RRD files
+        self.store = ColumnarStore.open(self.rrd_dir / "columnar") if settings.RRD_BACKEND == "columnar" else None
+
         # Define RRA configurations
         self.rra_config = [
             # 30 second resolution (24 hours worth)
@@ -36,31 +53,108 @@ class RRDService:
             f"RRA:AVERAGE:0.5:1M:60",      # 60 points = 5 years of monthly data
         ]
 
+    def host_data_sources(self):
+        return [
+            f"DS:uptime:GAUGE:{self.heartbeat}:0:100",
+            f"DS:latency:GAUGE:{self.heartbeat}:0:2000",
+        ]
+
+    def aggregate_data_sources(self):
+        """Fleet and group aggregates: uptime %, average latency of active hosts, host counts"""
+        return [
+            f"DS:uptime:GAUGE:{self.heartbeat}:0:100",
+            f"DS:latency:GAUGE:{self.heartbeat}:0:U",
+            f"DS:hosts:GAUGE:{self.heartbeat}:0:U",
+            f"DS:active:GAUGE:{self.heartbeat}:0:U",
+        ]
+
     def aligned_time(self, timestamp):
         seconds_past_minute = timestamp % 60
         base_minute = timestamp - seconds_past_minute
         return int(base_minute + (30 if seconds_past_minute >= 30 else 0))
 
-    def get_rrd_path(self, host_id):
-        """Get the path for a host RRD file"""
+    def current_step(self):
+        """Start of the RRD step the current time falls in"""
+        return self.aligned_time(time.time())
+
+    def flat_path(self, host_id):
+        """Location of an RRD file before the fan-out layout, directly in rrd_dir"""
         return self.rrd_dir / f"{host_id}.rrd"
 
-    def create_rrd_file(self, host_id):
-        """Create a new RRD file for a host"""
-        rrd_path = self.get_rrd_path(host_id)
+    def layout_path(self, host_id):
+        """
+        Location of an RRD file in the fan-out layout, e.g. ab/cd/<uuid>.rrd
+
+        Host files are spread by the leading hex digits of their UUID, which
+        are already random. Other files, like the monitor aggregates, by the
+        leading digits of an MD5 of their name.
+        """
+        if not self.fanout:
+            return self.flat_path(host_id)
+
+        name = str(host_id)
+        try:
+            key = uuid.UUID(name).hex
+        except ValueError:
+            key = hashlib.md5(name.encode()).hexdigest()
+
+        path = self.rrd_dir
+        offset = 0
+        for width in self.fanout:
+            path = path / key[offset:offset + width]
+            offset += width
+        return path / f"{name}.rrd"
+
+    def get_rrd_path(self, host_id):
+        """
+        Get the path for a host RRD file
+
+        Files are looked up in the fan-out layout first. Until migrate_rrd_layout
+        has moved them, files still sitting flat in rrd_dir are used where they
+        are. Files that exist in neither place resolve to the layout.
+        """
+        rrd_path = self.layout_path(host_id)
+        if not self.fanout or rrd_path.exists():
+            return rrd_path
+
+        flat_path = self.flat_path(host_id)
+        return flat_path if flat_path.exists() else rrd_path
+
+    def in_store(self, host_id):
+        """Whether a host's series is held by the columnar store"""
+        return self.store is not None and self.store.contains(host_id)
+
+    def rrd_exists(self, host_id):
+        """Whether a host has a series in either backend"""
+        return self.in_store(host_id) or self.get_rrd_path(host_id).exists()
+
+    def create_rrd_file(self, host_id, data_sources=None):
+        """
+        Create a new RRD file for a host
 
-        if rrd_path.exists():
+        Args:
+            host_id (str): Host UUID or name of the RRD file
+            data_sources (list): DS definitions, defaults to the host uptime and latency sources
+        """
+        if self.rrd_exists(host_id):
             logger.warning(f"RRD file already exists for host {host_id}")
             return
 
+        if self.store is not None and not data_sources:
+            self.store.create_many([host_id])
+            logger.info(f"Created columnar series for host {host_id}")
+            return
+
+        rrd_path = self.get_rrd_path(host_id)
+
         try:
+            rrd_path.parent.mkdir(parents=True, exist_ok=True)
             rrdtool.create(
                 str(rrd_path),
                 f"--step", str(self.step),
                 f"--start", str(self.aligned_time(time.time() - 60)),
                 # Data Sources
-                f"DS:uptime:GAUGE:{self.heartbeat}:0:100",
-                f"DS:latency:GAUGE:{self.heartbeat}:0:2000",
+                *(data_sources or self.host_data_sources()),
                 # Round Robin Archives
                 *self.rra_config
             )
@@ -69,95 +163,264 @@ class RRDService:
             logger.error(f"Failed to create RRD file for host {host_id}: {str(e)}")
             raise
 
+    def create_rrd_files(self, host_ids, data_sources=None, progress=None, workers=None):
+        """
+        Create RRD files for many hosts at once
+
+        One template file is built for the data sources and rra_config and
+        copied for every host on a thread pool. Copies are made under a
+        temporary name and hard linked into place, so a host never shows a
+        partial file and files that appear meanwhile are left alone. The
+        columnar store adds all hosts in one index update instead.
+
+        Args:
+            host_ids (list): Host UUIDs or names of the RRD files
+            data_sources (list): DS definitions, defaults to the host uptime and latency sources
+            progress (callable): Called as progress(done, total) while files are created
+            workers (int): Copy threads, defaults to RRD_PROVISION_WORKERS
+
+        Returns:
+            dict: Counts of files created, already existing and failed
+        """
+        host_ids = list(dict.fromkeys(str(host_id) for host_id in host_ids))
+        missing = [host_id for host_id in host_ids if not self.rrd_exists(host_id)]
+        counts = {"created": 0, "existing": len(host_ids) - len(missing), "failed": 0}
+        total = len(missing)
+
+        if self.store is not None and not data_sources:
+            self.store.create_many(missing)
+            counts["created"] = total
+            if progress:
+                progress(total, total)
+            logger.info(f"Created columnar series for {total} hosts")
+            return counts
+
+        if total <= 1:
+            for host_id in missing:
+                self.create_rrd_file(host_id, data_sources)
+                counts["created"] += 1
+            if progress:
+                progress(total, total)
+            return counts
+
+        started = time.perf_counter()
+        fd, template = tempfile.mkstemp(dir=self.rrd_dir, prefix=".template-", suffix=".tmp")
+        os.close(fd)
+        lock = threading.Lock()
+        done = 0
+        # Report roughly every percent
+        every = max(1, total // 100)
+
+        def copy(host_id):
+            nonlocal done
+            rrd_path = self.layout_path(host_id)
+            temporary = rrd_path.with_name(f".{rrd_path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+            try:
+                rrd_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(template, temporary)
+                os.link(temporary, rrd_path)
+                result = "created"
+            except FileExistsError:
+                result = "existing"
+            except Exception as e:
+                logger.error(f"Failed to create RRD file for host {host_id}: {str(e)}")
+                result = "failed"
+            finally:
+                if os.path.exists(temporary):
+                    os.unlink(temporary)
+
+            with lock:
+                counts[result] += 1
+                done += 1
+                if progress and (done % every == 0 or done == total):
+                    progress(done, total)
+
+        try:
+            rrdtool.create(
+                template,
+                f"--step", str(self.step),
+                f"--start", str(self.aligned_time(time.time() - 60)),
+                *(data_sources or self.host_data_sources()),
+                *self.rra_config
+            )
+            with ThreadPoolExecutor(max_workers=workers or settings.RRD_PROVISION_WORKERS, thread_name_prefix="rrd-provision") as executor:
+                list(executor.map(copy, missing))
+        finally:
+            os.unlink(template)
+
+        logger.info(
+            f"Created {counts['created']} RRD files in {time.perf_counter() - started:.2f}s, "
+            f"{counts['existing']} already existed, {counts['failed']} failed"
+        )
+        return counts
+
     def update_rrd_file(self, host_id, uptime, latency):
         """Update RRD file with new metrics"""
-        rrd_path = self.get_rrd_path(host_id)
-
-        if not rrd_path.exists():
+        if not self.rrd_exists(host_id):
             logger.warning(f"RRD file not found for host {host_id}, creating new file")
             self.create_rrd_file(host_id)
 
         try:
             current_time = self.aligned_time(time.time())
-            last_update = rrdtool.last(str(rrd_path))
+            last_update = self.last_update(host_id)
 
             # Ensure we are not updating in the past
             if current_time <= last_update:
                 logger.warning(f"Update time {current_time} is not after last update {last_update}")
                 return
 
-            rrdtool.update(
-                str(rrd_path),
-                f"{current_time}:{uptime}:{latency}"
-            )
-            logger.info(f"Updated RRD file for host {host_id}")
+            self.write_update(host_id, current_time, uptime, latency)
         except Exception as e:
             logger.error(f"Failed to update RRD file for host {host_id}: {str(e)}")
             raise
 
-    def initialize_all_rrd_files(self):
+    def last_update(self, host_id):
+        """Timestamp of the last update to a host RRD file"""
+        if self.in_store(host_id):
+            return self.store.last_update(host_id)
+        return rrdtool.last(*self.daemon_args, str(self.get_rrd_path(host_id)))
+
+    def write_update(self, host_id, timestamp, *values, rrd_path=None):
+        """
+        Write one sample without any existence or ordering checks
+
+        rrd_path skips looking the file up again, callers that write often keep
+        the returned path, which is None for the columnar store.
+        """
+        if self.in_store(host_id):
+            self.store.write([host_id], [timestamp], [values])
+            logger.info(f"Updated columnar series for host {host_id}")
+            return None
+
+        rrd_path = rrd_path or self.get_rrd_path(host_id)
+        sample = ":".join(str(value) for value in (timestamp, *values))
+        try:
+            rrdtool.update(*self.daemon_args, str(rrd_path), sample)
+        except Exception:
+            # The layout migration may have moved the file since it was looked up
+            moved_path = self.get_rrd_path(host_id)
+            if moved_path == rrd_path:
+                raise
+            rrdtool.update(*self.daemon_args, str(moved_path), sample)
+            rrd_path = moved_path
+        logger.info(f"Updated RRD file for host {host_id}")
+        return rrd_path
+
+    def write_updates(self, host_ids, timestamps, values):
+        """
+        Write one uptime/latency sample for each of many columnar store hosts at once
+
+        Returns:
+            tuple: (written, skipped) counts, samples not after a host's last update are skipped
+        """
+        return self.store.write(host_ids, timestamps, values)
+
+    def initialize_all_rrd_files(self, progress=None, workers=None):
         """Initialize RRD files for all hosts"""
         host_uuid_list = Hosts.objects.all().values_list("uuid", flat=True)
-        for host_uuid in host_uuid_list:
-            self.create_rrd_file(host_uuid)
+        return self.create_rrd_files(host_uuid_list, progress=progress, workers=workers)
 
-    def get_metrics(self, rrd_file, time_range_resolution_code=1):
+    def get_metrics(self, rrd_file, time_range_resolution_code=1, use_cache=True):
         """
         Get metrics from RRD file for a specific resolution
 
         Args:
             rrd_file (str): The RRD file to get metrics for
             time_range_resolution_code (int): 0-n
+            use_cache (bool): Serve and store the result in the step-aligned fetch cache
 
         Returns:
             dict: Dictionary of raw RRD data
         """
-        rrd_path = self.get_rrd_path(rrd_file)
+        # ensure time_range_resolution_code is an integer
+        time_range_resolution_code = int(time_range_resolution_code)
 
-        if not rrd_path.exists():
+        # for now, end_time is always now
+        end_time = self.current_step()
+
+        if not self.rrd_exists(rrd_file):
             message = f"RRD file not found for host {rrd_file}"
             logger.error(message)
             return { "error": message }
 
+        # A fetch can only change when a new step starts or the file takes an update, reuse it until then
+        try:
+            last_update = self.last_update(rrd_file)
+        except Exception as e:
+            message = f"Failed to read last update of host {rrd_file}: {str(e)}"
+            logger.error(message)
+            return { "error": message }
+        cache_key = fetch_cache.key(rrd_file, time_range_resolution_code, end_time, last_update)
+        if use_cache:
+            cached = fetch_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        # start, resolution and the start in seconds for the columnar store
         trrc_map = [
-            ["-15minutes", "30"],       # 30 seconds
-            ["-1hour", "60"],           # 1 minute
-            ["-3hours", "300"],         # 5 minutes
-            ["-1days", "3600"],         # 1 hour
-            ["-3days", "3600"],         # 1 hour
-            ["-1months", "86400"],      # 1 day
-            ["-1years", "604800"]       # 1 week
+            ["-15minutes", "30", 900],              # 30 seconds
+            ["-1hour", "60", 3600],                 # 1 minute
+            ["-3hours", "300", 3 * 3600],           # 5 minutes
+            ["-1days", "3600", 86400],              # 1 hour
+            ["-3days", "3600", 3 * 86400],          # 1 hour
+            ["-1months", "86400", 30 * 86400],      # 1 day
+            ["-1years", "604800", 365 * 86400]      # 1 week
         ]
 
-        # ensure time_range_resolution_code is an integer
-        time_range_resolution_code = int(time_range_resolution_code)
-        
         if 0 < time_range_resolution_code > len(trrc_map):
             message = f"Invalid time range resolution code: {time_range_resolution_code} valid range is 0-{len(trrc_map)-1}"
             logger.error(message)
             return { "error": message }
 
-        start_time, resolution = trrc_map[time_range_resolution_code]
+        start_time, resolution, start_seconds = trrc_map[time_range_resolution_code]
 
-        # for now, end_time is always now
-        end_time = self.aligned_time(time.time())
-        
         logger.info(f"Start time: {start_time}, Resolution: {resolution}, End time: {end_time}, time_range_resolution_code: {time_range_resolution_code}")
         try:
-            # Fetch data from RRD
-            return rrdtool.fetch(
-                str(rrd_path),
-                "AVERAGE",
-                "--start", str(start_time),
-                "--end", str(end_time),
-                "--resolution", str(resolution),
-                "--align-start"
-            )
+            if self.in_store(rrd_file):
+                rrd_data = self.store.fetch(rrd_file, end_time - start_seconds, end_time, int(resolution))
+            else:
+                # Fetch data from RRD
+                rrd_data = rrdtool.fetch(
+                    *self.daemon_args,
+                    str(self.get_rrd_path(rrd_file)),
+                    "AVERAGE",
+                    "--start", str(start_time),
+                    "--end", str(end_time),
+                    "--resolution", str(resolution),
+                    "--align-start"
+                )
         except Exception as e:
             message = f"Failed to fetch metrics for host {rrd_file}: {str(e)}"
             logger.error(message)
             return { "error": message }
 
+        if use_cache:
+            fetch_cache.set(cache_key, rrd_data, end_time + self.step)
+        return rrd_data
+
+    def fetch_window(self, rrd_file, start_time, end_time, resolution):
+        """
+        Fetch averages between two timestamps at a given resolution, uncached
+
+        Raises:
+            FileNotFoundError: If the RRD file doesn't exist
+        """
+        if self.in_store(rrd_file):
+            return self.store.fetch(rrd_file, start_time, end_time, resolution)
+
+        rrd_path = self.get_rrd_path(rrd_file)
+        if not rrd_path.exists():
+            raise FileNotFoundError(f"RRD file not found for host {rrd_file}")
+
+        return rrdtool.fetch(
+            *self.daemon_args,
+            str(rrd_path),
+            "AVERAGE",
+            "--start", str(start_time),
+            "--end", str(end_time),
+            "--resolution", str(resolution)
+        )
+
     def destroy_rrd_file(self, host_id: str) -> None:
         """
         Safely remove the RRD file for a host.
@@ -170,6 +433,10 @@ class RRDService:
             PermissionError: If there are permission issues deleting the file
             Exception: For any other unexpected errors
         """
+        if self.store is not None and self.store.destroy(host_id):
+            logger.info(f"Successfully removed columnar series for host {host_id}")
+            return
+
         rrd_path = self.get_rrd_path(host_id)
         
         if not rrd_path.exists():
@@ -0,0 +1,295 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import numpy as np
+
+logger = logging.getLogger("rrd")
+
+# (step seconds, rows) of each tier, mirrors RRDService.rra_config
+# Months are taken as 30 days
+TIERS = [
+    (30, 2880),
+    (60, 1440),
+    (300, 2016),
+    (3600, 720),
+    (86400, 365),
+    (604800, 104),
+    (2592000, 60),
+]
+NAMES = ("uptime", "latency")
+
+class ColumnarStore:
+    """
+    Uptime and latency of every host in one memory-mapped file per tier.
+
+    Each tier file is a ring buffer with one row per host and one slot per
+    step, ``values`` holding float32 (uptime, latency) pairs and ``buckets``
+    the step number each slot was last written for. A slot only counts when
+    its bucket matches the step being read, so gaps and ring wrap-around
+    read as unknown without ever clearing old data. Every write goes to all
+    tiers at once: coarser tiers keep a running sum and count of their open
+    step per host and store the average of the known samples so far.
+
+    Host names map to rows in index.json, which is rewritten under a file
+    lock when hosts are added or removed. Other processes notice the change
+    by its mtime and remap. Freed rows are reused. Files grow by doubling
+    their row capacity, which only appends since every host is one row.
+    """
+
+    index_name = "index.json"
+    initial_capacity = 1024
+
+    stores = {}
+    stores_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, directory):
+        """One store per directory and process, shared by every RRDService"""
+        directory = str(directory)
+        with cls.stores_lock:
+            if directory not in cls.stores:
+                cls.stores[directory] = cls(directory)
+            return cls.stores[directory]
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.RLock()
+        self.rows = {}
+        self.free = []
+        self.capacity = 0
+        self.mapped_capacity = 0
+        self.index_mtime = None
+        self.refresh()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    # Index
+
+    def refresh(self):
+        """Reload the index and remap the tier files if another process changed them"""
+        try:
+            mtime = os.stat(self.path(self.index_name)).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self.lock:
+            if mtime != self.index_mtime or self.capacity == 0:
+                self.load_index()
+                self.index_mtime = mtime
+            if self.capacity != self.mapped_capacity:
+                self.map_files()
+
+    def load_index(self):
+        try:
+            with open(self.path(self.index_name)) as file:
+                index = json.load(file)
+        except FileNotFoundError:
+            index = {"capacity": self.initial_capacity, "rows": {}, "free": []}
+        self.capacity = index["capacity"]
+        self.rows = index["rows"]
+        self.free = index["free"]
+
+    def save_index(self):
+        temporary = self.path(f"{self.index_name}.{os.getpid()}.tmp")
+        with open(temporary, "w") as file:
+            json.dump({"capacity": self.capacity, "rows": self.rows, "free": self.free}, file)
+        os.replace(temporary, self.path(self.index_name))
+        self.index_mtime = os.stat(self.path(self.index_name)).st_mtime_ns
+
+    def modify_index(self, change):
+        """Apply change() to the latest index while holding the process and file locks"""
+        with self.lock, open(self.path("index.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.load_index()
+            result = change()
+            self.save_index()
+            if self.capacity != self.mapped_capacity:
+                self.map_files()
+            return result
+
+    def map_files(self):
+        """(Re)open every file at the current capacity, growing them when needed"""
+        def mapped(name, dtype, shape):
+            path = self.path(name)
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            with open(path, "ab") as file:
+                if file.tell() < size:
+                    file.truncate(size)
+            return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+        capacity = self.capacity
+        self.values = [mapped(f"tier-{step}.values", np.float32, (capacity, rows, 2)) for step, rows in TIERS]
+        self.buckets = [mapped(f"tier-{step}.buckets", np.int32, (capacity, rows)) for step, rows in TIERS]
+        self.last = mapped("last.dat", np.int64, (capacity,))
+        # Open step, sum and count of each coarser tier per host, only the writer uses them
+        self.open_buckets = mapped("open.buckets", np.int64, (capacity, len(TIERS)))
+        self.sums = mapped("open.sums", np.float64, (capacity, len(TIERS), 2))
+        self.counts = mapped("open.counts", np.float64, (capacity, len(TIERS), 2))
+        self.mapped_capacity = capacity
+
+    # Hosts
+
+    def contains(self, name):
+        self.refresh()
+        return str(name) in self.rows
+
+    def row(self, name):
+        self.refresh()
+        return self.rows.get(str(name))
+
+    def missing(self, names):
+        """Names without a row"""
+        self.refresh()
+        return {str(name) for name in names} - self.rows.keys()
+
+    def create_many(self, names):
+        """Give each new name a row, existing names are left alone. Returns the rows added."""
+        def change():
+            added = []
+            for name in dict.fromkeys(str(name) for name in names):
+                if name in self.rows:
+                    continue
+                if self.free:
+                    row = self.free.pop()
+                else:
+                    row = len(self.rows)
+                    while row >= self.capacity:
+                        self.capacity *= 2
+                self.rows[name] = row
+                added.append(row)
+            return added
+
+        added = self.modify_index(change)
+        if added:
+            self.clear_rows(np.array(added))
+        return added
+
+    def destroy(self, name):
+        """Free a host's row, returns False when the name is unknown"""
+        def change():
+            row = self.rows.pop(str(name), None)
+            if row is not None:
+                self.free.append(row)
+            return row
+
+        row = self.modify_index(change)
+        if row is None:
+            return False
+        self.clear_rows(np.array([row]))
+        return True
+
+    def clear_rows(self, rows):
+        with self.lock:
+            for buckets in self.buckets:
+                buckets[rows] = 0
+            self.last[rows] = 0
+            self.open_buckets[rows] = 0
+            self.sums[rows] = 0
+            self.counts[rows] = 0
+
+    def last_update(self, name):
+        row = self.row(name)
+        return int(self.last[row]) if row is not None else 0
+
+    # Writes
+
+    def write(self, names, timestamps, values):
+        """
+        Write one sample per host as a few slice assignments per tier.
+
+        Args:
+            names (list): Host names, unknown names are skipped
+            timestamps (list): Sample time of each host, aligned to the 30 second step
+            values (list): (uptime, latency) of each host, None when unknown
+
+        Returns:
+            tuple: (written, skipped) counts, samples not after a host's last update are skipped
+        """
+        self.refresh()
+        rows = np.array([self.rows.get(str(name), -1) for name in names], dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.array(values, dtype=float).reshape(len(rows), 2)
+
+        written = 0
+        with self.lock:
+            known = rows >= 0
+            # One pass per distinct timestamp, usually one per cycle, keeps every host's samples in order
+            for timestamp in np.unique(timestamps[known]):
+                selected = np.flatnonzero(known & (timestamps == timestamp))
+                selected_rows, first = np.unique(rows[selected], return_index=True)
+                selected = selected[first]
+                newer = self.last[selected_rows] < timestamp
+                self.write_step(int(timestamp), selected_rows[newer], values[selected[newer]])
+                written += int(newer.sum())
+        return written, len(rows) - written
+
+    def write_step(self, timestamp, rows, values):
+        if not len(rows):
+            return
+        present = ~np.isnan(values)
+        samples = np.where(present, values, 0.0)
+        self.last[rows] = timestamp
+
+        for tier, (step, size) in enumerate(TIERS):
+            bucket = timestamp // step
+            # Hosts moving into a new step start a new sum
+            stale = rows[self.open_buckets[rows, tier] != bucket]
+            self.open_buckets[stale, tier] = bucket
+            self.sums[stale, tier] = 0
+            self.counts[stale, tier] = 0
+
+            self.sums[rows, tier] += samples
+            self.counts[rows, tier] += present
+            counts = self.counts[rows, tier]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                averages = np.where(counts > 0, self.sums[rows, tier] / counts, np.nan)
+
+            slot = bucket % size
+            self.values[tier][rows, slot] = averages
+            self.buckets[tier][rows, slot] = bucket
+
+    # Reads
+
+    def tier_for(self, start, end, resolution):
+        """
+        The tier rrdtool would pick: the one covering start whose step is
+        closest to resolution, or the longest one when none covers it
+        """
+        covering = [tier for tier, (step, rows) in enumerate(TIERS) if end - step * rows <= start]
+        if not covering:
+            return max(range(len(TIERS)), key=lambda tier: TIERS[tier][0] * TIERS[tier][1])
+        return min(covering, key=lambda tier: (abs(TIERS[tier][0] - resolution), TIERS[tier][0]))
+
+    def fetch(self, name, start, end, resolution):
+        """
+        Averages between start and end in the shape rrdtool.fetch returns
+
+        Returns:
+            tuple: ((start, end, step), names, rows), rows of (uptime, latency) with None when unknown
+        """
+        row = self.row(name)
+        if row is None:
+            raise FileNotFoundError(f"No columnar series for host {name}")
+
+        tier = self.tier_for(start, end, resolution)
+        step, size = TIERS[tier]
+        first = -(-int(start) // step)
+        last = int(end) // step
+        buckets = np.arange(first, max(first, last) + 1)[-size:]
+        slots = buckets % size
+
+        values = self.values[tier][row, slots].astype(float)
+        values[self.buckets[tier][row, slots] != buckets] = np.nan
+        rows = [
+            tuple(None if value != value else value for value in pair)
+            for pair in values.tolist()
+        ]
+        return (int(buckets[0]) * step, int(buckets[-1]) * step + step, step), NAMES, rows
+
+    def flush(self):
+        with self.lock:
+            for array in (*self.values, *self.buckets, self.last, self.open_buckets, self.sums, self.counts):
+                array.flush()
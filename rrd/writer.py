@@ -0,0 +1,180 @@
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+
+logger = logging.getLogger("rrd")
+
+class RRDUpdateQueue:
+    """
+    Write-behind queue for RRD updates.
+
+    Updates are accepted on the caller's thread and written by a background
+    thread. The writer remembers where each file is and when it was last
+    updated, so steady state costs one rrdtool.update per sample instead of
+    path lookups and an exists(), last() and update() round trip. When the queue is full
+    submit() blocks, and the time spent blocked is reported as backpressure.
+
+    With the columnar store the writer takes everything already queued, up
+    to batch_size updates, and writes the host samples among them in one
+    vectorised call.
+    """
+
+    batch_size = 10000
+
+    def __init__(self, rrd_service, maxsize=None):
+        self.rrd_service = rrd_service
+        self.queue = queue.Queue(maxsize or settings.RRD_QUEUE_SIZE)
+        self.last_updates = {}
+        self.paths = {}  # host_id -> resolved RRD file path, legacy flat files cost extra stats to find
+        self.lock = threading.Lock()
+        self.counters = {
+            'queued': 0,
+            'written': 0,
+            'skipped': 0,
+            'failed': 0,
+            'blocked': 0,
+            'blocked_time': 0.0,
+            'high_water': 0,
+        }
+        self.thread = threading.Thread(target=self.drain, name="rrd-writer", daemon=True)
+        self.thread.start()
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def submit(self, host_id, uptime, latency, timestamp=None):
+        """Queue a host uptime/latency update, timestamp defaults to the current RRD step"""
+        self.submit_values(host_id, (uptime, latency), timestamp)
+
+    def submit_values(self, host_id, values, timestamp=None, data_sources=None):
+        """Queue an update of every data source in the file, in DS order, data_sources create a missing file"""
+        if timestamp is None:
+            timestamp = self.rrd_service.aligned_time(time.time())
+
+        # Cheap pre-check against the cached last update, the writer re-checks
+        if timestamp <= self.last_updates.get(str(host_id), -1):
+            self.count('skipped')
+            return
+
+        item = (str(host_id), timestamp, values, data_sources)
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            started = time.perf_counter()
+            self.queue.put(item)
+            self.count('blocked')
+            self.count('blocked_time', time.perf_counter() - started)
+
+        self.count('queued')
+        depth = self.queue.qsize()
+        with self.lock:
+            self.counters['high_water'] = max(self.counters['high_water'], depth)
+
+    def write(self, host_id, timestamp, values, data_sources=None):
+        last_update = self.last_updates.get(host_id)
+        if last_update is None:
+            # First sample for this file since start, look it up once
+            if not self.rrd_service.rrd_exists(host_id):
+                logger.warning(f"RRD file not found for host {host_id}, creating new file")
+                self.rrd_service.create_rrd_file(host_id, data_sources)
+            last_update = self.rrd_service.last_update(host_id)
+
+        if timestamp <= last_update:
+            logger.warning(f"Update time {timestamp} is not after last update {last_update} for host {host_id}")
+            self.last_updates[host_id] = last_update
+            self.count('skipped')
+            return
+
+        self.paths[host_id] = self.rrd_service.write_update(
+            host_id, timestamp, *values, rrd_path=self.paths.get(host_id)
+        )
+        self.last_updates[host_id] = timestamp
+        self.count('written')
+
+    def write_item(self, item):
+        try:
+            self.write(*item)
+        except Exception as e:
+            logger.error(f"Failed to update RRD file for host {item[0]}: {str(e)}")
+            # Forget the cached state, it is re-read on the next sample
+            self.last_updates.pop(item[0], None)
+            self.paths.pop(item[0], None)
+            self.count('failed')
+
+    def write_batch(self, items):
+        """Write host samples held by the columnar store in one call, everything else one at a time"""
+        store = self.rrd_service.store
+        if store is None:
+            for item in items:
+                self.write_item(item)
+            return
+
+        # Items with data sources belong to RRD files, so do hosts that still have one from before the store
+        candidates = [item for item in items if item[3] is None]
+        others = [item for item in items if item[3] is not None]
+        missing = store.missing([item[0] for item in candidates])
+        legacy = {
+            host_id for host_id in missing
+            if self.paths.get(host_id) or self.rrd_service.get_rrd_path(host_id).exists()
+        }
+        if missing - legacy:
+            logger.warning(f"Columnar series not found for {len(missing - legacy)} hosts, creating them")
+            store.create_many(missing - legacy)
+
+        bulk = [item for item in candidates if item[0] not in legacy]
+        others += [item for item in candidates if item[0] in legacy]
+        try:
+            written, skipped = self.rrd_service.write_updates(
+                [item[0] for item in bulk],
+                [item[1] for item in bulk],
+                [item[2] for item in bulk],
+            )
+            self.count('written', written)
+            self.count('skipped', skipped)
+        except Exception as e:
+            logger.error(f"Failed to write {len(bulk)} columnar updates: {str(e)}")
+            self.count('failed', len(bulk))
+
+        for item in others:
+            self.write_item(item)
+
+    def drain(self):
+        while True:
+            items = [self.queue.get()]
+            # Take whatever else is already waiting, up to batch_size
+            while items[-1] is not None and len(items) < self.batch_size:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = items[-1] is None
+            try:
+                self.write_batch(items[:-1] if stop else items)
+            finally:
+                for _ in items:
+                    self.queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """Block until every queued update has been written"""
+        self.queue.join()
+
+    def close(self):
+        """Write out everything still queued and stop the writer thread"""
+        if not self.thread.is_alive():
+            return
+        self.queue.put(None)
+        self.thread.join()
+        logger.info(f"RRD writer stopped: {self.stats()}")
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats['depth'] = self.queue.qsize()
+        stats['blocked_time'] = round(stats['blocked_time'], 4)
+        return stats
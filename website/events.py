@@ -0,0 +1,89 @@
+import asyncio
+import json
+import logging
+from django.conf import settings
+from monitors.events import read_cycle_events
+
+logger = logging.getLogger('monitors')
+
+
+def format_event(event):
+    """One Server-Sent Events message for a cycle event"""
+    return f"id: {event['id']}\nevent: cycle\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+class CycleEventBroadcaster:
+    """
+    Fans the monitor's cycle events out to every stream in this worker.
+
+    One task per worker checks the event files every
+    MONITOR_EVENTS_POLL_INTERVAL seconds, however many clients are
+    connected, and hands new events to each client's queue. It stops when
+    the last client leaves. A client that stops reading loses events rather
+    than holding the rest back.
+    """
+
+    queue_size = 16
+
+    def __init__(self):
+        self.subscribers = set()
+        self.latest = {}  # shard -> last event
+        self.mtimes = {}
+        self.task = None
+
+    async def subscribe(self):
+        queue = asyncio.Queue(self.queue_size)
+        if self.task is None or self.task.done():
+            # Nobody was watching, catch up before the watcher starts handing out events
+            await asyncio.to_thread(self.poll)
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.watch())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def poll(self):
+        """New events since the last poll, also kept as each shard's latest"""
+        events = read_cycle_events(self.mtimes)
+        for event in events:
+            self.latest[event['shard']] = event
+        return events
+
+    async def watch(self):
+        while self.subscribers:
+            try:
+                events = await asyncio.to_thread(self.poll)
+            except Exception as e:
+                logger.error(f"Failed to read cycle events: {str(e)}")
+                events = []
+            for event in events:
+                for queue in list(self.subscribers):
+                    try:
+                        queue.put_nowait(event)
+                    except asyncio.QueueFull:
+                        logger.warning("Dropping cycle event for a slow event stream client")
+            await asyncio.sleep(settings.MONITOR_EVENTS_POLL_INTERVAL)
+
+    async def stream(self, last_event_id=None):
+        """
+        Server-Sent Events for one client: each shard's latest event unless
+        the client already has it, then every new cycle as it completes
+        """
+        queue = await self.subscribe()
+        try:
+            for event in sorted(self.latest.values(), key=lambda event: event['shard']):
+                if event['id'] != last_event_id:
+                    yield format_event(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), settings.MONITOR_EVENTS_KEEPALIVE)
+                    yield format_event(event)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+
+broadcaster = CycleEventBroadcaster()
@@ -2,6 +2,7 @@ import random
 from datetime import datetime, timedelta, timezone
 from django.core.management.base import BaseCommand
 from website.models import Hosts
+from website.services import HostService
 
 def random_account_name():
     prefix = ["Prod", "Dev", "Staging", "Backup"]
@@ -62,6 +63,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **kwargs):
         item_count = 10
+        # Stamp the new rows so the monitor's host registry picks them up
+        change_version = HostService.next_change_version()
         for _ in range(item_count):
             Hosts.objects.create(
                 account_label=random_account_name(),
@@ -73,7 +76,8 @@ class Command(BaseCommand):
                 last_check=random_last_check(),
                 is_active=random_is_active(),
                 is_monitored=random_is_monitored(),
-                downtime_allotment=random_downtime_allotment()
+                downtime_allotment=random_downtime_allotment(),
+                change_version=change_version,
             )
 
         self.stdout.write(self.style.SUCCESS(f"✅ {item_count} example Hosts created."))
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from website.models import Hosts
+from website.services import HostService
 
 class Command(BaseCommand):
     help = "Remove example Host records"
@@ -7,4 +8,6 @@ class Command(BaseCommand):
     def handle(self, *args, **kwargs):
         example_host_count = Hosts.objects.filter(host_name__startswith="example.host-").count()
         Hosts.objects.filter(host_name__startswith="example.host-").delete()
+        # Tell the monitor's host registry that hosts are gone
+        HostService.next_change_version()
         self.stdout.write(self.style.SUCCESS(f"✅ {example_host_count} example Hosts removed."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0008_hosts_monitor_params_hosts_monitor_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hosts',
+            name='change_version',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0009_hosts_change_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hosts',
+            index=models.Index(fields=['is_monitored', 'is_active', 'host_name'], name='hosts_listing_status'),
+        ),
+        migrations.AddIndex(
+            model_name='hosts',
+            index=models.Index(fields=['is_monitored', 'host_name'], name='hosts_listing_name'),
+        ),
+        migrations.AddIndex(
+            model_name='hosts',
+            index=models.Index(fields=['is_monitored', 'region', 'host_name'], name='hosts_listing_region'),
+        ),
+        migrations.AddIndex(
+            model_name='hosts',
+            index=models.Index(fields=['is_monitored', 'account_id', 'host_name'], name='hosts_listing_account'),
+        ),
+        migrations.AddIndex(
+            model_name='hosts',
+            index=models.Index(fields=['is_monitored', 'downtime_allotment', 'host_name'], name='hosts_listing_allotment'),
+        ),
+    ]
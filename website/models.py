@@ -18,6 +18,19 @@ class Hosts(models.Model):
     last_allotment_reset = models.DateTimeField(auto_now_add=True)
     monitor_type = models.TextField(null=True, blank=True)
     monitor_params = models.TextField(null=True, blank=True)
+    # Value of the hosts_change_version setting when this row was last edited
+    change_version = models.IntegerField(default=0, db_index=True)
+
+    class Meta:
+        # Host listings seek into one of these for each sort and filter, the implicit rowid
+        # makes them covering for the id lookup of a page
+        indexes = [
+            models.Index(fields=["is_monitored", "is_active", "host_name"], name="hosts_listing_status"),
+            models.Index(fields=["is_monitored", "host_name"], name="hosts_listing_name"),
+            models.Index(fields=["is_monitored", "region", "host_name"], name="hosts_listing_region"),
+            models.Index(fields=["is_monitored", "account_id", "host_name"], name="hosts_listing_account"),
+            models.Index(fields=["is_monitored", "downtime_allotment", "host_name"], name="hosts_listing_allotment"),
+        ]
 
 class GlobalSettings(models.Model):
     key = models.CharField(primary_key=True, max_length=255)
@@ -3,49 +3,202 @@ from typing import Dict, Any, List
 from django.conf import settings
 from django.forms.models import model_to_dict
 from django.contrib import messages
-from collections import deque
+from django.db import transaction
+from django.db.models import F, Count, Q
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import csv
+import io
+import json
+import logging
+import math
 import os
+import re
+import time
+import threading
+import uuid
+import numpy as np
 import psutil
+from django.db import connection
 
 from website.models import Hosts, GlobalSettings
 from rrd.services import RRDService
+from rrd.downsample import downsample
+from rrd.cache import fetch_cache
+from rrd.reports import REPORT_WINDOWS, window_bounds, align_rows, summarize
 from monitors.models import MonitorStatus
 from monitors.management.commands.monitor_icmp import Command
+from monitors.icmp import self_metrics_file, AGGREGATE_GROUPS, group_rrd_file
+from monitors.events import fleet_summary, latest_cycle_event
+from monitors.registry import HostRegistry
+
+logger = logging.getLogger('monitors')
 
 class HostService:
     @staticmethod
-    def get_monitored_hosts() -> List[Hosts]:
-        return Hosts.objects.filter(is_monitored=1).order_by("is_active")
+    def next_change_version() -> int:
+        """Bump and return the hosts change version the monitor registry refreshes from"""
+        with transaction.atomic():
+            GlobalSettings.objects.get_or_create(key="hosts_change_version", defaults={"value": 0})
+            GlobalSettings.objects.filter(key="hosts_change_version").update(value=F("value") + 1)
+            return GlobalSettings.objects.get(key="hosts_change_version").value
 
     @staticmethod
-    def get_host_count() -> int:
-        return Hosts.objects.count()
+    def get_host_counts(use_snapshot: bool = True) -> Dict[str, int]:
+        """
+        Host counters for the summary and admin pages.
+
+        The monitor publishes them with every cycle event, so the database
+        is only counted when there is no recent event or hosts changed since
+        it was taken.
+        """
+        if use_snapshot:
+            event = latest_cycle_event()
+            if (
+                event is not None
+                and time.time() - event.get('published', 0) <= settings.MONITOR_COUNTS_MAX_AGE
+                and event.get('hosts_change_version') == HostRegistry.current_version()
+            ):
+                return event['summary']
+        return fleet_summary()
+
+    # Sort keys of the host listing, each ends in id so every row has a distinct position
+    # and is served by one of the (is_monitored, ...) indexes on Hosts
+    listing_sorts = {
+        "status": ("is_active", "host_name", "id"),
+        "host_name": ("host_name", "id"),
+        "region": ("region", "host_name", "id"),
+        "account": ("account_id", "host_name", "id"),
+        "allotment": ("downtime_allotment", "host_name", "id"),
+    }
+    listing_fields = [
+        "uuid", "account_label", "account_id", "region", "host_id", "host_ip_address", "host_name",
+        "created_at", "last_check", "is_active", "is_monitored", "downtime_allotment", "monitor_type", "monitor_params",
+    ]
 
     @staticmethod
-    def get_monitored_active_count() -> int:
-        return Hosts.objects.filter(is_monitored=1, is_active=1).count()
-    
+    def encode_cursor(values: List[Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
     @staticmethod
-    def get_monitored_inactive_count() -> int:
-        return Hosts.objects.filter(is_monitored=1, is_active=0).count()
+    def decode_cursor(cursor: str, length: int) -> List[Any]:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        except ValueError:
+            raise ValueError("Invalid page cursor")
+        if not isinstance(values, list) or len(values) != length:
+            raise ValueError("Invalid page cursor")
+        return values
 
     @staticmethod
-    def get_monitored_has_allotment_count() -> int:
-        return Hosts.objects.filter(is_monitored=1, downtime_allotment__gt=0).count()
-    
+    def keyset_after(fields: tuple, values: List[Any], descending: bool) -> Q:
+        """
+        Rows after the cursor values in (fields) order.
+
+        SQLite sorts NULL first, so NULL is the smallest value of a nullable
+        field: nothing is below it and everything not NULL is above it.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(fields, values):
+            if value is None:
+                after = Q(pk__in=[]) if descending else Q(**{f"{field}__isnull": False})
+                same = Q(**{f"{field}__isnull": True})
+            elif descending:
+                after = Q(**{f"{field}__lt": value}) | Q(**{f"{field}__isnull": True})
+                same = Q(**{field: value})
+            else:
+                after = Q(**{f"{field}__gt": value})
+                same = Q(**{field: value})
+            condition |= equal & after
+            equal &= same
+        return condition
+
     @staticmethod
-    def get_monitored_has_no_allotment_count() -> int:
-        return Hosts.objects.filter(is_monitored=1, downtime_allotment=0).count()
+    def get_hosts_page(
+        is_monitored: bool,
+        filters: Dict[str, str] | None = None,
+        sort: str = "status",
+        order: str = "asc",
+        after: str | None = None,
+        limit: int | None = None,
+    ) -> Dict[str, Any]:
+        """
+        One page of hosts in a stable order, continuing after a cursor.
+
+        Args:
+            is_monitored (bool): Monitored or unmonitored hosts
+            filters (dict): Optional region, account (account id), state (up or down)
+                and allotment (available or depleted)
+            sort (str): One of listing_sorts
+            order (str): asc or desc
+            after (str): Cursor from the previous page's next
+            limit (int): Page size, HOSTS_PAGE_SIZE by default and at most HOSTS_PAGE_MAX
+
+        Returns:
+            dict: hosts on the page and the next cursor, None on the last page
+
+        The page is found by seeking to the cursor in the sort's index and
+        reading only ids, the rows are then fetched by primary key. The cost
+        of a page does not grow with its depth or the fleet.
+        """
+        if sort not in HostService.listing_sorts:
+            raise ValueError(f"Invalid sort: {sort}, valid sorts are {', '.join(HostService.listing_sorts)}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Invalid order: {order}, valid orders are asc, desc")
+        limit = min(max(int(limit or settings.HOSTS_PAGE_SIZE), 1), settings.HOSTS_PAGE_MAX)
+        fields = HostService.listing_sorts[sort]
+        descending = order == "desc"
+        filters = filters or {}
+
+        # Booleans compare with IN, a bare "WHERE is_monitored" is not an index equality for SQLite
+        queryset = Hosts.objects.filter(is_monitored__in=[is_monitored])
+        if filters.get("region"):
+            queryset = queryset.filter(region=filters["region"])
+        if filters.get("account"):
+            queryset = queryset.filter(account_id=filters["account"])
+        if filters.get("state"):
+            if filters["state"] not in ("up", "down"):
+                raise ValueError(f"Invalid state: {filters['state']}, valid states are up, down")
+            queryset = queryset.filter(is_active__in=[filters["state"] == "up"])
+        if filters.get("allotment"):
+            if filters["allotment"] not in ("available", "depleted"):
+                raise ValueError(f"Invalid allotment: {filters['allotment']}, valid values are available, depleted")
+            if filters["allotment"] == "available":
+                queryset = queryset.filter(downtime_allotment__gt=0)
+            else:
+                queryset = queryset.filter(downtime_allotment=0)
+        if after:
+            values = HostService.decode_cursor(after, len(fields))
+            queryset = queryset.filter(HostService.keyset_after(fields, values, descending))
+            # The same bound on the first field alone lets SQLite seek instead of scanning up to the cursor
+            if values[0] is not None and not descending:
+                queryset = queryset.filter(**{f"{fields[0]}__gte": values[0]})
+            elif values[0] is not None and not Hosts._meta.get_field(fields[0]).null:
+                queryset = queryset.filter(**{f"{fields[0]}__lte": values[0]})
+
+        ordering = [f"-{field}" if descending else field for field in fields]
+        ids = list(queryset.order_by(*ordering).values_list("id", flat=True)[:limit + 1])
+        rows = Hosts.objects.in_bulk(ids[:limit])
+        hosts = [rows[pk] for pk in ids[:limit] if pk in rows]
+
+        next_cursor = None
+        if len(ids) > limit and hosts:
+            next_cursor = HostService.encode_cursor([getattr(hosts[-1], field) for field in fields])
+        return {"hosts": hosts, "next": next_cursor, "sort": sort, "order": order}
 
     @staticmethod
-    def get_unmonitored_hosts() -> List[Hosts]:
-        return Hosts.objects.filter(is_monitored=0).order_by("host_name")
-    
+    def host_listing_data(host: Hosts) -> Dict[str, Any]:
+        return {field: getattr(host, field) for field in HostService.listing_fields}
+
     @staticmethod
     def update_host_monitoring_status(uuid: str, is_monitored: bool) -> None:
         host = Hosts.objects.get(uuid=uuid)
         host.is_monitored = is_monitored
-        host.save()
+        # Stamp and save together so the monitor never sees the version before the row
+        with transaction.atomic():
+            host.change_version = HostService.next_change_version()
+            host.save()
         return host
 
     @staticmethod
@@ -53,19 +206,24 @@ class HostService:
         host = Hosts.objects.get(uuid=uuid)
         for key, value in host_data.items():
             setattr(host, key, value)
-        host.save()
+        with transaction.atomic():
+            host.change_version = HostService.next_change_version()
+            host.save()
         return host
     
     @staticmethod
     def delete_host(host_uuid: str) -> Hosts:
         host = Hosts.objects.get(uuid=host_uuid)
-        host.delete()
+        with transaction.atomic():
+            host.delete()
+            HostService.next_change_version()
         rrd = RRDService()
         rrd.destroy_rrd_file(host.uuid)
         return host
     
     @staticmethod
-    def create_host(host_data: Dict[str, str]) -> tuple[Hosts | None, str]:
+    def create_host(host_data: Dict[str, str], provision_rrd: bool = True) -> tuple[Hosts | None, str]:
+        """Create a host unless one with the same region and address exists, provision_rrd=False leaves its RRD file to the caller"""
         # Check if host already exists
         existing_host = Hosts.objects.filter(
             region=host_data['region'],
@@ -81,21 +239,407 @@ class HostService:
             default_allotment = int(settings.value) if settings else 0
             host_data['downtime_allotment'] = default_allotment
 
-        host = Hosts.objects.create(**host_data)
-        rrd = RRDService()
-        rrd.create_rrd_file(host.uuid)
+        with transaction.atomic():
+            host_data['change_version'] = HostService.next_change_version()
+            host = Hosts.objects.create(**host_data)
+        if provision_rrd:
+            RRDService().create_rrd_files([host.uuid])
         return host
     
+class ImportService:
+    """
+    CSV host imports.
+
+    Rows are streamed through the csv module, checked against the
+    (region, host_ip_address) pairs already present and inserted with
+    bulk_create in chunks of HOST_IMPORT_CHUNK. Each chunk is stamped with
+    one hosts change version and its RRD files are provisioned together.
+    Uploads larger than HOST_IMPORT_BACKGROUND_BYTES are copied to
+    HOST_IMPORT_DIR and imported by a background thread. The thread records
+    its progress in a job file that any web worker can read.
+    """
+
+    columns = [
+        "account_label", "account_id", "region", "host_id", "host_ip_address", "host_name",
+        "downtime_allotment", "monitor_type", "monitor_params",
+    ]
+    job_pattern = re.compile(r"[0-9a-f]{32}")
+
+    @staticmethod
+    def job_path(job_id: str, suffix: str = ".json") -> str:
+        if not ImportService.job_pattern.fullmatch(job_id or ""):
+            raise ValueError(f"Invalid import job: {job_id}")
+        return os.path.join(settings.HOST_IMPORT_DIR, f"{job_id}{suffix}")
+
+    @staticmethod
+    def save_job(job: Dict[str, Any]) -> None:
+        path = ImportService.job_path(job["id"])
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(job, file)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def get_job(job_id: str) -> Dict[str, Any]:
+        with open(ImportService.job_path(job_id)) as file:
+            return json.load(file)
+
+    @staticmethod
+    def parse_row(row: List[str], default_allotment: int) -> Dict[str, Any]:
+        """Host fields of one CSV row, raises ValueError when the row is unusable"""
+        if len(row) < 6:
+            raise ValueError(f"Expected at least 6 fields, got {len(row)}")
+        fields = dict(zip(ImportService.columns, (field.strip() for field in row)))
+        if not fields["host_ip_address"]:
+            raise ValueError("Missing host IP address")
+        allotment = fields.get("downtime_allotment") or ""
+        try:
+            fields["downtime_allotment"] = int(allotment) if allotment else default_allotment
+        except ValueError:
+            raise ValueError(f"Invalid downtime allotment: {allotment}")
+        fields["monitor_type"] = fields.get("monitor_type") or "icmp"
+        fields["monitor_params"] = fields.get("monitor_params") or ""
+        return fields
+
+    @staticmethod
+    def import_hosts(file: Any, job: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        """
+        Import hosts from a text stream of CSV, the first row is the header.
+
+        Args:
+            file: Text stream opened with newline=""
+            job (dict): Job record to update, saved after every chunk when it is a background job
+
+        Returns:
+            dict: The job with rows, created, duplicates and errors counts and the first
+                HOST_IMPORT_MAX_ERRORS errors as {"line", "error", "row"}
+        """
+        if job is None:
+            job = ImportService.new_job()
+        job.update(status="running", started=time.time())
+        existing = set(Hosts.objects.values_list("region", "host_ip_address").iterator(chunk_size=10000))
+        setting = GlobalSettings.objects.filter(key="default_downtime_allotment").first()
+        default_allotment = int(setting.value) if setting else 0
+        rrd = RRDService()
+
+        def flush(batch):
+            with transaction.atomic():
+                version = HostService.next_change_version()
+                for host in batch:
+                    host.change_version = version
+                Hosts.objects.bulk_create(batch, batch_size=500)
+            rrd.create_rrd_files([host.uuid for host in batch])
+            job["created"] += len(batch)
+            if job["background"]:
+                ImportService.save_job(job)
+
+        reader = csv.reader(file)
+        next(reader, None)
+        batch = []
+        for row in reader:
+            if not any(field.strip() for field in row):
+                continue
+            job["rows"] += 1
+            try:
+                fields = ImportService.parse_row(row, default_allotment)
+            except ValueError as e:
+                job["errors"] += 1
+                if len(job["error_rows"]) < settings.HOST_IMPORT_MAX_ERRORS:
+                    job["error_rows"].append({"line": reader.line_num, "error": str(e), "row": row})
+                continue
+
+            key = (fields["region"], fields["host_ip_address"])
+            if key in existing:
+                job["duplicates"] += 1
+                continue
+            existing.add(key)
+            batch.append(Hosts(**fields))
+            if len(batch) >= settings.HOST_IMPORT_CHUNK:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+        job.update(status="finished", finished=time.time())
+        logger.info(
+            f"Imported {job['created']} of {job['rows']} hosts in {job['finished'] - job['started']:.1f}s, "
+            f"{job['duplicates']} duplicates, {job['errors']} errors"
+        )
+        return job
+
+    @staticmethod
+    def new_job(name: str = "", background: bool = False) -> Dict[str, Any]:
+        return {
+            "id": uuid.uuid4().hex, "name": name, "background": background, "status": "queued", "started": None, "finished": None,
+            "rows": 0, "created": 0, "duplicates": 0, "errors": 0, "error_rows": [], "message": "",
+        }
+
+    @staticmethod
+    def import_upload(upload: Any) -> Dict[str, Any]:
+        """Import an uploaded file, in a background job when it is larger than HOST_IMPORT_BACKGROUND_BYTES"""
+        if upload.size <= settings.HOST_IMPORT_BACKGROUND_BYTES:
+            job = ImportService.new_job(upload.name)
+            return ImportService.import_hosts(io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline=""), job)
+
+        os.makedirs(settings.HOST_IMPORT_DIR, exist_ok=True)
+        job = ImportService.new_job(upload.name, background=True)
+        with open(ImportService.job_path(job["id"], ".csv"), "wb") as file:
+            for chunk in upload.chunks():
+                file.write(chunk)
+        ImportService.save_job(job)
+        threading.Thread(
+            target=ImportService.run_job, args=(dict(job),), name=f"host-import-{job['id'][:8]}", daemon=True
+        ).start()
+        return job
+
+    @staticmethod
+    def run_job(job: Dict[str, Any]) -> None:
+        path = ImportService.job_path(job["id"], ".csv")
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as file:
+                ImportService.import_hosts(file, job)
+        except Exception as e:
+            logger.error(f"Host import {job['id']} failed: {str(e)}")
+            job.update(status="failed", finished=time.time(), message=str(e))
+        finally:
+            ImportService.save_job(job)
+            os.remove(path)
+            connection.close()
+
+    @staticmethod
+    def write_error_report(job: Dict[str, Any], file: Any) -> None:
+        writer = csv.writer(file)
+        writer.writerow(["line", "error", *ImportService.columns])
+        for error in job["error_rows"]:
+            writer.writerow([error["line"], error["error"], *error["row"]])
+
+class MetricsService:
+    # Shared by all requests in a worker so concurrent batches cannot stack up fetch threads
+    executor = None
+    executor_lock = threading.Lock()
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        with cls.executor_lock:
+            if cls.executor is None:
+                cls.executor = ThreadPoolExecutor(
+                    max_workers=settings.METRICS_BATCH_WORKERS,
+                    thread_name_prefix="rrd-fetch"
+                )
+            return cls.executor
+
+    @staticmethod
+    def get_host_metrics(rrd: RRDService, host_uuid: str, time_range_resolution_code: int, max_points: int = 0) -> Any:
+        try:
+            # Only UUIDs name host RRD files, anything else could point outside RRD_DIR
+            uuid.UUID(host_uuid)
+        except (TypeError, ValueError):
+            return {"error": f"Invalid host UUID: {host_uuid}"}
+        try:
+            rrd_data = rrd.get_metrics(host_uuid, time_range_resolution_code)
+            if max_points and not isinstance(rrd_data, dict):
+                rrd_data = downsample(rrd_data, max_points)
+            return rrd_data
+        except Exception as e:
+            return {"error": f"Failed to fetch metrics for host {host_uuid}: {str(e)}"}
+
+    @staticmethod
+    def get_metrics_batch(host_uuids: List[str], time_range_resolution_code: int = 1, max_points: int = 0) -> Dict[str, Any]:
+        """
+        Fetch the series of many hosts concurrently, downsampled to max_points rows when given.
+
+        Hosts that fail are listed under errors instead of failing the batch.
+        """
+        rrd = RRDService()
+        executor = MetricsService.get_executor()
+        futures = {
+            host_uuid: executor.submit(
+                MetricsService.get_host_metrics, rrd, host_uuid, time_range_resolution_code, max_points
+            )
+            for host_uuid in dict.fromkeys(host_uuids)
+        }
+
+        series = {}
+        errors = {}
+        for host_uuid, future in futures.items():
+            rrd_data = future.result()
+            if isinstance(rrd_data, dict) and "error" in rrd_data:
+                errors[host_uuid] = rrd_data["error"]
+            else:
+                series[host_uuid] = rrd_data
+
+        return {
+            "time_range_resolution_code": time_range_resolution_code,
+            "series": series,
+            "errors": errors,
+        }
+
+    @staticmethod
+    def get_aggregate_groups(kind: str) -> List[Dict[str, Any]]:
+        """Monitored host groups of a kind with their aggregate RRD file and current counts"""
+        if kind not in AGGREGATE_GROUPS:
+            raise ValueError(f"Invalid aggregate kind: {kind}")
+        field = AGGREGATE_GROUPS[kind]
+
+        groups = {}
+        rows = Hosts.objects.filter(is_monitored=True).values(field).annotate(
+            hosts=Count("id"),
+            active=Count("id", filter=Q(is_active=True)),
+        )
+        for row in rows:
+            # The monitor files NULL and empty values under the same group
+            key = row[field] or ""
+            group = groups.setdefault(key, {
+                "key": key,
+                "rrd_file": group_rrd_file(kind, key),
+                "hosts": 0,
+                "active": 0,
+            })
+            group["hosts"] += row["hosts"]
+            group["active"] += row["active"]
+        return sorted(groups.values(), key=lambda group: group["key"])
+
+class ReportService:
+    # Host columns of a report row, followed by the computed columns
+    host_fields = ["uuid", "host_name", "host_ip_address", "account_id", "region", "downtime_allotment"]
+    metric_fields = [
+        "uptime", "coverage", "downtime_minutes", "allotment_minutes",
+        "allotment_used", "within_allotment", "latency_mean", "latency_max",
+    ]
+    # Hosts fetched per executor task, keeps the task overhead small for large fleets
+    fetch_chunk = 64
+
+    @staticmethod
+    def fetch_chunk_series(rrd: RRDService, host_uuids: List[str], start: int, end: int, resolution: int) -> List[Any]:
+        """Rows of each host's window on the report grid, or an error message in their place"""
+        count = (end - start) // resolution
+        results = []
+        for host_uuid in host_uuids:
+            try:
+                results.append(align_rows(rrd.fetch_window(host_uuid, start, end, resolution), start, count, resolution))
+            except Exception as e:
+                results.append({"error": f"Failed to fetch metrics for host {host_uuid}: {str(e)}"})
+        return results
+
+    @staticmethod
+    def get_sla_report(window: str = "30d", use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Uptime, downtime against each host's allotment and latency of every
+        monitored host over a report window.
+
+        All RRD files are read in parallel and summarised together with NumPy.
+        Reports are cached per window until the window's next RRA row or the
+        next host change.
+        """
+        if window not in REPORT_WINDOWS:
+            raise ValueError(f"Invalid report window: {window}, valid windows are {', '.join(REPORT_WINDOWS)}")
+
+        start, end, resolution = window_bounds(window, time.time())
+        version = HostRegistry.current_version()
+        setting = GlobalSettings.objects.filter(key="default_downtime_allotment").first()
+        default_allotment = int(setting.value) if setting else 0
+        cache_key = f"sla_report:{window}:{end}:{version}:{default_allotment}"
+        if use_cache:
+            cached = fetch_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        hosts = list(
+            Hosts.objects.filter(is_monitored=True).order_by("host_name", "id").values(*ReportService.host_fields)
+        )
+        host_uuids = [str(host["uuid"]) for host in hosts]
+
+        rrd = RRDService()
+        executor = MetricsService.get_executor()
+        chunks = [host_uuids[i:i + ReportService.fetch_chunk] for i in range(0, len(host_uuids), ReportService.fetch_chunk)]
+        futures = [
+            executor.submit(ReportService.fetch_chunk_series, rrd, chunk, start, end, resolution)
+            for chunk in chunks
+        ]
+        fetched = [series for future in futures for series in future.result()]
+
+        window_seconds = REPORT_WINDOWS[window][0]
+        errors = {}
+        stacked = np.full((len(hosts), window_seconds // resolution, 2), np.nan)
+        for index, (host_uuid, rows) in enumerate(zip(host_uuids, fetched)):
+            if isinstance(rows, dict):
+                errors[host_uuid] = rows["error"]
+            else:
+                stacked[index] = rows
+
+        # downtime_allotment is the budget left this period, a host given more than the default keeps its larger budget
+        metrics = summarize(
+            stacked,
+            resolution,
+            window_seconds,
+            [max(host["downtime_allotment"] or 0, default_allotment) for host in hosts],
+        )
+        columns = {
+            name: [None if math.isnan(value) else value for value in values.round(4).tolist()]
+            for name, values in metrics.items()
+        }
+        columns["within_allotment"] = [
+            None if used is None else used <= 100 for used in columns["allotment_used"]
+        ]
+
+        rows = []
+        for index, host in enumerate(hosts):
+            row = {**host, "uuid": host_uuids[index]}
+            for name in ReportService.metric_fields:
+                row[name] = columns[name][index]
+            rows.append(row)
+
+        uptimes = [row["uptime"] for row in rows if row["uptime"] is not None]
+        report = {
+            "window": window,
+            "start": start,
+            "end": end,
+            "step": resolution,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "fleet": {
+                "hosts": len(rows),
+                "uptime": round(sum(uptimes) / len(uptimes), 4) if uptimes else None,
+                "within_allotment": columns["within_allotment"].count(True),
+                "over_allotment": columns["within_allotment"].count(False),
+            },
+            "hosts": rows,
+            "errors": errors,
+        }
+
+        if use_cache:
+            fetch_cache.set(cache_key, report, end + resolution)
+        return report
+
+    @staticmethod
+    def write_sla_report_csv(report: Dict[str, Any], file: Any) -> None:
+        """One CSV row per host with the host and metric columns of a report"""
+        writer = csv.DictWriter(file, fieldnames=ReportService.host_fields + ReportService.metric_fields)
+        writer.writeheader()
+        writer.writerows(report["hosts"])
+
 class MonitorService:
     @staticmethod
-    def get_monitor_status(monitor_type: str) -> Dict[str, Any]:
-        status = MonitorStatus.objects.get(monitor_type=monitor_type)
+    def get_monitor_status(monitor_type: str, shard: int = 0, time_range_resolution_code: int = 1) -> Dict[str, Any]:
+        status = MonitorStatus.objects.get(monitor_type=monitor_type, shard=shard)
         current_time = datetime.now(timezone.utc)
         
         return {
             **model_to_dict(status),
             'uptime': (current_time - status.last_active).total_seconds(),
-            'last_active': status.last_active.isoformat()
+            'last_active': status.last_active.isoformat(),
+            # Last cycle's phase timings and counters plus their trend from the self-metrics RRD
+            'cycle': status.metrics.get('cycle'),
+            'cycle_history': RRDService().get_metrics(self_metrics_file(shard), time_range_resolution_code),
+            'shards': [
+                {
+                    'shard': row.shard,
+                    'status': row.status,
+                    'hostname': row.hostname,
+                    'pid': row.pid,
+                    'last_active': row.last_active.isoformat(),
+                }
+                for row in MonitorStatus.objects.filter(monitor_type=monitor_type).order_by('shard')
+            ],
         }
 
     @staticmethod
@@ -114,24 +658,123 @@ class MonitorService:
             raise ValueError(f"Invalid action: {action}")
 
 class LogService:
+    log_types = ("monitors", "rrd")
+    block_size = 64 * 1024
+
+    @staticmethod
+    def log_path(log_type: str) -> str:
+        if log_type not in LogService.log_types:
+            raise ValueError(f"Invalid log type: {log_type}, valid types are {', '.join(LogService.log_types)}")
+        return f"{settings.APP_LOG_DIR}/{log_type}.log"
+
+    @staticmethod
+    def tail_start(file: Any, end: int, lines: int) -> int:
+        """Offset of the last lines complete lines before end, found by reading backwards in blocks"""
+        if lines <= 0:
+            return end
+        position = end
+        newlines = 0
+        while position > 0:
+            size = min(LogService.block_size, position)
+            position -= size
+            file.seek(position)
+            block = file.read(size)
+            # Skip the newline ending the last line and any line still being written after it
+            if position + size == end:
+                block = block[:max(block.rfind(b"\n"), 0)]
+            index = len(block)
+            while newlines < lines:
+                index = block.rfind(b"\n", 0, index)
+                if index < 0:
+                    break
+                newlines += 1
+            if newlines == lines:
+                return position + index + 1
+        return 0
+
+    @staticmethod
+    def complete_lines(data: bytes) -> bytes:
+        """Data up to its last newline, a line still being written waits for the next read"""
+        return data[:data.rfind(b"\n") + 1]
+
     @staticmethod
     def get_log_content(log_type: str, log_tail: int) -> str:
-        log_file = f"{settings.APP_LOG_DIR}/{log_type}.log"
-        
+        """The last log_tail lines of a log"""
+        return LogService.get_log_update(log_type, log_tail)["log_content"]
+
+    @staticmethod
+    def get_log_update(log_type: str, log_tail: int, offset: int | None = None, inode: int | None = None) -> Dict[str, Any]:
+        """
+        New log lines since a previous read, or the last log_tail lines.
+
+        A read returns the offset and inode to pass to the next one, which
+        then only reads what was appended. When the log was rotated since,
+        the rest of the rotated file (log.1) is returned before the new one.
+        A truncated or unknown file restarts from the tail, with reset set so
+        the client replaces what it shows. At most LOG_READ_MAX_BYTES are
+        returned per read, older new lines beyond that are skipped.
+        """
+        log_file = LogService.log_path(log_type)
         if not os.path.exists(log_file):
             raise FileNotFoundError("Log file not found")
-            
-        with open(log_file, "r") as file:
-            return ''.join(line for line in deque(file, maxlen=log_tail))
+
+        with open(log_file, "rb") as file:
+            stat = os.fstat(file.fileno())
+            end = stat.st_size
+            chunks = []
+            reset = False
+
+            if offset is None or inode is None:
+                reset = True
+            elif inode != stat.st_ino:
+                # Rotated, finish the previous file if it is still the first backup
+                try:
+                    with open(f"{log_file}.1", "rb") as rotated:
+                        if os.fstat(rotated.fileno()).st_ino == inode:
+                            rotated.seek(offset)
+                            chunks.append(LogService.complete_lines(rotated.read(settings.LOG_READ_MAX_BYTES)))
+                        else:
+                            reset = True
+                except FileNotFoundError:
+                    reset = True
+                offset = 0
+            elif offset > end:
+                # Truncated in place
+                reset = True
+
+            if reset:
+                chunks = []
+                offset = LogService.tail_start(file, end, log_tail)
+            if offset < end - settings.LOG_READ_MAX_BYTES:
+                # Too far behind, start at the first line beginning inside the last LOG_READ_MAX_BYTES
+                file.seek(end - settings.LOG_READ_MAX_BYTES - 1)
+                file.readline()
+                offset = file.tell()
+            file.seek(offset)
+            data = LogService.complete_lines(file.read(end - offset))
+            chunks.append(data)
+
+        content = b"".join(chunks)
+        if len(content) > settings.LOG_READ_MAX_BYTES:
+            # Drop what is left of the rotated file from a line boundary, not mid-line
+            cut = content.find(b"\n", len(content) - settings.LOG_READ_MAX_BYTES - 1)
+            content = content[cut + 1:] if cut >= 0 else b""
+        return {
+            "log_content": content.decode("utf-8", errors="replace"),
+            "offset": offset + len(data),
+            "inode": stat.st_ino,
+            "reset": reset,
+        }
 
 class SystemService:
     @staticmethod
     def get_system_info() -> Dict[str, Any]:
         current_time = datetime.now(timezone.utc)
+        counts = HostService.get_host_counts()
         return {
-            'monitored_hosts': Hosts.objects.filter(is_monitored=True).count(),
-            'unmonitored_hosts': Hosts.objects.filter(is_monitored=False).count(),
-            'total_hosts': Hosts.objects.count(),
+            'monitored_hosts': counts['monitored_count'],
+            'unmonitored_hosts': counts['unmonitored_count'],
+            'total_hosts': counts['host_count'],
             'server_time': current_time.strftime('%Y-%m-%d %H:%M:%S'),
             'server_uptime': (current_time - datetime.fromtimestamp(psutil.boot_time(), timezone.utc)).total_seconds(),
         }
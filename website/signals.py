@@ -1,4 +1,6 @@
 # myapp/signals.py
+from django.conf import settings
+from django.db.backends.signals import connection_created
 from django.db.models.signals import post_migrate
 from django.dispatch import receiver
 from .models import GlobalSettings
@@ -21,4 +23,23 @@ def add_auto_start_setting(sender, **kwargs):
             'value': 0,
             'description': 'Automatically start monitor daemons on server startup'
         }
-    )
\ No newline at end of file
+    )
+
+@receiver(post_migrate)
+def add_hosts_change_version_setting(sender, **kwargs):
+    GlobalSettings.objects.get_or_create(
+        key='hosts_change_version',
+        defaults={
+            'value': 0,
+            'description': 'Incremented on every host change so monitors can refresh incrementally'
+        }
+    )
+
+@receiver(connection_created)
+def apply_sqlite_profile(sender, connection, **kwargs):
+    """Run SQLITE_PRAGMAS on each new SQLite connection when SQLITE_PROFILE is on"""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PROFILE:
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
\ No newline at end of file
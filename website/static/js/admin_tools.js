@@ -30,9 +30,78 @@ const monitor = new function() {
                     }
                     document.querySelector(`#monitorCard .card-body span[name="${element}"]`).textContent = value;
                 });
+
+                self.renderCycle(data.cycle);
+                self.renderCycleChart(data.cycle_history, data.cycle ? data.cycle.budget : 30);
             });
     }
 
+    self.renderCycle = function(cycle) {
+        const field = (name) => document.querySelector(`#monitorCard .card-body span[name="${name}"]`);
+        if (!cycle) {
+            ['cycle_time', 'cycle_phases', 'cycle_counts'].forEach(name => field(name).textContent = 'No cycle recorded');
+            return;
+        }
+
+        const percent = ((cycle.cycle_time / cycle.budget) * 100).toFixed(1);
+        field('cycle_time').textContent = `${cycle.cycle_time.toFixed(2)}s of ${cycle.budget}s budget (${percent}%)`;
+        field('cycle_phases').textContent = `registry ${cycle.registry_time.toFixed(2)}s, probe ${cycle.probe_time.toFixed(2)}s, ` +
+            `status ${cycle.status_time.toFixed(2)}s, db ${cycle.db_time.toFixed(2)}s, rrd ${cycle.rrd_time.toFixed(2)}s`;
+        field('cycle_counts').textContent = `${cycle.probes} probes, ${cycle.timeouts} timed out, ` +
+            `${cycle.db_rows} rows written, ${cycle.rrd_updates} RRD updates, ${cycle.overruns} overruns`;
+    }
+
+    self.renderCycleChart = function(rrdData, budget) {
+        const canvas = document.querySelector('#monitorCard canvas[name="cycleChart"]');
+        const existing = Chart.getChart(canvas);
+        if (existing) {
+            existing.destroy();
+        }
+        if (!rrdData || rrdData.error) {
+            return;
+        }
+
+        const [epochStart, epochEnd, epochStep] = rrdData[0];
+        const names = rrdData[1];
+        const colors = utils.colors();
+        const series = ['cycle_time', 'probe_time', 'db_time', 'rrd_time'];
+        const datasets = series.map(name => {
+            const index = names.indexOf(name);
+            return {
+                label: name,
+                data: rrdData[2].map((row, i) => ({ x: epochStart + (i * epochStep), y: row[index] }))
+                    .filter(point => point.y !== null),
+                pointRadius: 0,
+                tension: 0.1
+            };
+        });
+        datasets.push({
+            label: 'budget',
+            data: [{ x: epochStart, y: budget }, { x: epochEnd, y: budget }],
+            borderColor: colors.danger,
+            borderDash: [6, 4],
+            pointRadius: 0
+        });
+
+        new Chart(canvas.getContext('2d'), {
+            type: 'line',
+            data: { datasets: datasets },
+            options: {
+                scales: {
+                    x: {
+                        type: 'linear',
+                        ticks: {
+                            color: colors.bodyColor,
+                            callback: value => new Date(value * 1000).toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit', hour12: false })
+                        }
+                    },
+                    y: { beginAtZero: true, ticks: { color: colors.bodyColor } }
+                },
+                plugins: { legend: { labels: { color: colors.bodyColor } } }
+            }
+        });
+    }
+
     self.stop = function(element) {
         window.location.href = `/admin_tools/monitor_control?action=stop&monitor_type=${self.monitor_type.value}`;
     }
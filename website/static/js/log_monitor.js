@@ -3,14 +3,28 @@ const log_monitor = new function() {
     
     self.fetchLogData = async function() {
         try {
-            const response = await fetch(`/log_monitor/fetch?log_type=${self.logType.value}&log_tail=${self.logTailSelect.value}`);
+            // After the first read only the lines added since the last offset are fetched
+            const position = self.position ? `&offset=${self.position.offset}&inode=${self.position.inode}` : '';
+            const response = await fetch(`/log_monitor/fetch?log_type=${self.logType.value}&log_tail=${self.logTailSelect.value}${position}`);
             
             if (!response.ok) {
                 throw new Error(`HTTP error! Status: ${response.status}`);
             }
 
             const data = await response.json();
-            self.logContent.textContent = data.log_content;
+            if (data.error) {
+                self.position = null;
+                self.logContent.textContent = data.log_content;
+                return;
+            }
+            self.position = { "offset": data.offset, "inode": data.inode };
+            if (data.reset) {
+                self.logContent.textContent = data.log_content;
+            } else if (data.log_content) {
+                // Keep showing only the selected number of lines
+                const lines = (self.logContent.textContent + data.log_content).split('\n');
+                self.logContent.textContent = lines.slice(-self.logTailSelect.value - 1).join('\n');
+            }
             self.logRefreshTimestamp.textContent = data.server_timestamp;
             // Scroll to bottom
             self.logContent.parentElement.scrollTop = self.logContent.parentElement.scrollHeight;
@@ -20,6 +34,12 @@ const log_monitor = new function() {
         }
     }
     
+    self.reload = function() {
+        // A different log or tail length starts again from the tail
+        self.position = null;
+        self.fetchLogData();
+    }
+    
     self.init = function() {
         self.logType = document.getElementById('logTypeForm');
         self.logContent = document.getElementById('logContent');
@@ -30,8 +50,8 @@ const log_monitor = new function() {
         
         self.refreshLogBtn.addEventListener('click', self.fetchLogData);
         
-        self.logTailSelect.addEventListener('change', self.fetchLogData);
-        self.logType.addEventListener('change', self.fetchLogData);
+        self.logTailSelect.addEventListener('change', self.reload);
+        self.logType.addEventListener('change', self.reload);
         
         self.autoRefreshSelect.addEventListener('change', function() {
             if (self.autoRefreshSelect.value == -1) {
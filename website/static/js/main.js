@@ -160,6 +160,85 @@ var utils = {
         return `${hours}h ${minutes}m ${seconds}s`;
     },
     
+    "onCycle": function(callback) {
+        // One EventSource per page for /events/cycles, callback gets each completed monitor cycle
+        if (!utils.cycleEvents) {
+            utils.cycleEvents = new EventSource('/events/cycles');
+        }
+        utils.cycleEvents.addEventListener('cycle', (event) => callback(JSON.parse(event.data)));
+    },
+
+    "decodeColumnar": function(buffer) {
+        // RUC1 metrics payload (see rrd/encoding.py) into typed arrays, nulls become NaN
+        const view = new DataView(buffer);
+        const headerLength = view.getUint32(4, true);
+        const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+        const payload = 8 + headerLength;
+        const columns = {};
+
+        header.columns.forEach(column => {
+            const bitmap = new Uint8Array(buffer, payload + column.bitmap[0], column.bitmap[1]);
+            const data = new Uint8Array(buffer, payload + column.data[0], column.data[1]);
+            const present = column.present;
+            let decoded;
+
+            if (column.type === 'uint8') {
+                decoded = new Float32Array(present);
+                let previous = 0;
+                for (let i = 0; i < present; i++) {
+                    previous = (previous + data[i]) & 0xFF;
+                    decoded[i] = previous;
+                }
+            } else {
+                const words = new Uint32Array(present);
+                let previous = 0;
+                for (let i = 0; i < present; i++) {
+                    const word = (data[i] | (data[present + i] << 8) | (data[2 * present + i] << 16) | (data[3 * present + i] << 24)) >>> 0;
+                    previous = (previous ^ word) >>> 0;
+                    words[i] = previous;
+                }
+                decoded = new Float32Array(words.buffer);
+            }
+
+            const values = new Float32Array(header.count);
+            let next = 0;
+            for (let i = 0; i < header.count; i++) {
+                values[i] = (bitmap[i >> 3] >> (i & 7)) & 1 ? NaN : decoded[next++];
+            }
+            columns[column.name] = values;
+        });
+
+        // Downsampled series carry their row timestamps as step indices since start
+        let timestamps = null;
+        if (header.timestamps) {
+            const data = new Uint8Array(buffer, payload + header.timestamps[0], header.timestamps[1]);
+            const count = header.count;
+            timestamps = new Float64Array(count);
+            let index = 0;
+            for (let i = 0; i < count; i++) {
+                index += (data[i] | (data[count + i] << 8) | (data[2 * count + i] << 16) | (data[3 * count + i] << 24)) >>> 0;
+                timestamps[i] = header.start + index * header.step;
+            }
+        }
+
+        return { header: header, columns: columns, timestamps: timestamps };
+    },
+
+    "columnarToRrd": function(decoded) {
+        // Same shape as the JSON rrd_data tuple: [[start, end, step], names, rows]
+        const header = decoded.header;
+        const columns = header.names.map(name => decoded.columns[name]);
+        const rows = [];
+        for (let i = 0; i < header.count; i++) {
+            rows.push(columns.map(column => Number.isNaN(column[i]) ? null : column[i]));
+        }
+        const rrdData = [[header.start, header.end, header.step], header.names, rows];
+        if (decoded.timestamps) {
+            rrdData.push(Array.from(decoded.timestamps));
+        }
+        return rrdData;
+    },
+
     "colors": function() {
         return {
             danger: getComputedStyle(document.body).getPropertyValue('--bs-danger'),
@@ -206,13 +285,16 @@ var metricsChart = new function() {
             "latency": self.colors.danger
         }
         
-        // Generate timestamps for each data point
-        const timestamps = [];
-        for (let t = epochStart; t <= epochEnd; t += epochStep) {
-            timestamps.push(t);
+        // Downsampled series list their timestamps, full series are evenly spaced
+        let timestamps = rrdData[3];
+        if (!timestamps) {
+            timestamps = [];
+            for (let t = epochStart; t <= epochEnd; t += epochStep) {
+                timestamps.push(t);
+            }
         }
         
-        // Create datasets for each metric
+        // Create datasets for each charted metric, aggregate files also carry host counts
         const datasets = metricNames.map((metricName, metricIndex) => {
             return {
                 label: metricName.charAt(0).toUpperCase() + metricName.slice(1),
@@ -224,7 +306,7 @@ var metricsChart = new function() {
                 backgroundColor: metricToColorMap[metricName],
                 tension: 0.1
             };
-        });
+        }).filter((dataset, metricIndex) => metricNames[metricIndex] in metricToColorMap);
         
         return {
             datasets: datasets
@@ -492,9 +574,12 @@ var metricsChart = new function() {
             return true;
         }
         
-        self.renderAverages = function(chartData) {
-            const avgUptime = chartData.datasets[0].data.reduce((acc, point) => acc + point.y, 0) / chartData.datasets[0].data.length;
-            const avgLatency = chartData.datasets[1].data.reduce((acc, point) => acc + point.y, 0) / chartData.datasets[1].data.length;
+        self.renderAverages = function(chartData, averages) {
+            // Prefer the server's averages, a downsampled series over-represents extremes
+            const avgUptime = averages && averages.uptime != null ? averages.uptime :
+                chartData.datasets[0].data.reduce((acc, point) => acc + point.y, 0) / chartData.datasets[0].data.length;
+            const avgLatency = averages && averages.latency != null ? averages.latency :
+                chartData.datasets[1].data.reduce((acc, point) => acc + point.y, 0) / chartData.datasets[1].data.length;
             self.params.container.querySelector('[name="avgUptime"]').textContent = avgUptime.toFixed(2) + '%';
             self.params.container.querySelector('[name="avgLatency"]').textContent = avgLatency.toFixed(2) + 'ms';
         }
@@ -506,12 +591,26 @@ var metricsChart = new function() {
             }
             self.colors = utils.colors();
 
-            fetch(`/monitored_hosts/metrics?host_uuid=${self.params.rrdFile}&time_range_resolution_code=${self.trrc.value}`)
-            .then(response => response.json())
-            .then(data => {
-                const chartData = self.rrdToChartData(data.rrd_data);
+            // No more points than the chart has pixels
+            const maxPoints = Math.round(self.params.container.querySelector('canvas').clientWidth || 0);
+
+            // Host series by default, aggregates pass their own endpoint
+            const url = self.params.metricsUrl || `/monitored_hosts/metrics?host_uuid=${self.params.rrdFile}`;
+            fetch(`${url}&time_range_resolution_code=${self.trrc.value}&format=columnar&max_points=${maxPoints}`)
+            .then(response => {
+                // Errors come back as JSON, series as a columnar payload
+                if (response.headers.get('Content-Type').startsWith('application/json')) {
+                    return response.json().then(data => ({ rrdData: data.rrd_data, averages: data.averages }));
+                }
+                return response.arrayBuffer().then(buffer => {
+                    const decoded = utils.decodeColumnar(buffer);
+                    return { rrdData: utils.columnarToRrd(decoded), averages: decoded.header.averages };
+                });
+            })
+            .then(result => {
+                const chartData = self.rrdToChartData(result.rrdData);
                 self.renderChart(chartData);
-                self.renderAverages(chartData);
+                self.renderAverages(chartData, result.averages);
             })
             .catch(error => {
                 console.error('Error fetching metrics:', error);
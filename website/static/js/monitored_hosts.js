@@ -50,3 +50,72 @@ function unmonitorHost(element) {
 function updateHost(element) {
     window.location.href = `/monitored_hosts/update?host_uuid=${element.dataset.hostUuid}`;
 }
+
+function applyHostChanges(cycle) {
+    // Update the rows of hosts whose state changed in a monitor cycle
+    const changes = new Map(cycle.changed.map(host => [host.uuid, host]));
+    if (changes.size == 0) {
+        return;
+    }
+    document.querySelectorAll('tr[data-host]').forEach(row => {
+        const host = JSON.parse(row.dataset.host);
+        const change = changes.get(host.uuid);
+        if (!change) {
+            return;
+        }
+        Object.assign(host, change);
+        row.dataset.host = JSON.stringify(host);
+        const cells = row.querySelectorAll('td');
+        cells[3].replaceChildren(utils.statusBadge(host.is_active));
+        cells[4].textContent = host.downtime_allotment;
+        cells[5].textContent = utils.milspecDate(host.last_check);
+    });
+}
+
+var importProgress = new function() {
+    const self = this;
+
+    self.init = function() {
+        self.card = document.getElementById('importProgress');
+        if (self.card) {
+            self.poll();
+        }
+    }
+
+    self.poll = function() {
+        fetch(`/monitored_hosts/import/status?job=${self.card.dataset.job}`)
+        .then(response => response.json())
+        .then(job => {
+            self.render(job);
+            if (job.status == 'queued' || job.status == 'running') {
+                setTimeout(self.poll, 2000);
+            }
+        });
+    }
+
+    self.render = function(job) {
+        const status = self.card.querySelector('[name="status"]');
+        const bar = self.card.querySelector('.progress-bar');
+        const counts = `${job.rows} rows read, ${job.created} hosts imported, ${job.duplicates} duplicates, ${job.errors} errors`;
+        if (job.error) {
+            status.textContent = job.error;
+            bar.classList.add('bg-danger');
+        } else if (job.status == 'finished') {
+            status.textContent = `Import of ${job.name} finished: ${counts}`;
+        } else if (job.status == 'failed') {
+            status.textContent = `Import of ${job.name} failed after ${counts}: ${job.message}`;
+            bar.classList.add('bg-danger');
+        } else {
+            status.textContent = `Importing ${job.name}: ${counts}`;
+        }
+        if (job.error || job.status == 'finished' || job.status == 'failed') {
+            bar.classList.remove('progress-bar-animated', 'progress-bar-striped');
+        }
+        self.card.querySelector('[name="errors"]').classList.toggle('d-none', !job.errors);
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    utils.onCycle(applyHostChanges);
+    importProgress.init();
+});
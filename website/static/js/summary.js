@@ -10,6 +10,7 @@ const summary = new function() {
         }
 
         const monitorType = card.querySelector('select[name="monitorType"]').value;
+        const group = card.querySelector('select[name="aggregateGroup"]').selectedOptions[0];
         const cardTitle = card.querySelector('.card-header [name="title"]');
         const cardBody = card.querySelector('.card-body [name="graph"]');
         
@@ -21,12 +22,47 @@ const summary = new function() {
             default:
             rrdFile = 'monitors_aggregate_icmp';
         }
+
+        // A region or account aggregate replaces the fleet-wide one
+        let metricsUrl = null;
+        if (group && group.value) {
+            rrdFile = group.value;
+            title = `${title} - ${group.textContent}`;
+            metricsUrl = `/aggregates/metrics?kind=${group.dataset.kind}&key=${encodeURIComponent(group.dataset.key)}`;
+        }
         
         cardTitle.textContent = title;
-        const params = { "rrdFile": rrdFile, "container": cardBody, "refreshEnabled": false };
+        const params = { "rrdFile": rrdFile, "metricsUrl": metricsUrl, "container": cardBody, "refreshEnabled": false };
         metricsChart.populate(params);
     }
     
+    self.loadGroups = function() {
+        const select = document.querySelector('#aggregateUptimeCard select[name="aggregateGroup"]');
+        if (select == null) {
+            return;
+        }
+
+        [['region', 'Regions'], ['account', 'Accounts']].forEach(([kind, label]) => {
+            fetch(`/aggregates?kind=${kind}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.groups || data.groups.length == 0) {
+                    return;
+                }
+                const optgroup = document.createElement('optgroup');
+                optgroup.label = label;
+                data.groups.forEach(group => {
+                    const name = group.key || 'Unassigned';
+                    const option = utils.html.option(`${name} (${group.active}/${group.hosts} up)`, group.rrd_file);
+                    option.dataset.kind = kind;
+                    option.dataset.key = group.key;
+                    optgroup.append(option);
+                });
+                select.append(optgroup);
+            });
+        });
+    }
+    
     self.pieGraph = function(params) {
         const colors = utils.colors();
         // Create pie chart data
@@ -73,42 +109,40 @@ const summary = new function() {
     }
     
     self.refreshStatus = function() {
-        const monitoredUpVsDown = document.querySelector('#monitoredHostsCard .card-body canvas[name="monitoredUpVsDown"]');
-        const downtimeAllotment = document.querySelector('#monitoredHostsCard .card-body canvas[name="downtimeAllotment"]');
-        
         fetch('/summary/host_info')
         .then(response => response.json())
-        .then(data => {
-            const dataDetect = Object.values(data).reduce((total, value) => total + value, 0);
-
-            if (dataDetect == 0) {
-                return;
-            }
+        .then(data => self.renderStatus(data));
+    }
+    
+    self.renderStatus = function(data) {
+        const monitoredUpVsDown = document.querySelector('#monitoredHostsCard .card-body canvas[name="monitoredUpVsDown"]');
+        const downtimeAllotment = document.querySelector('#monitoredHostsCard .card-body canvas[name="downtimeAllotment"]');
+        const totalMonitored = data.monitored_active_count + data.monitored_inactive_count;
+        if (totalMonitored == 0) {
+            return;
+        }
 
-            const totalMonitored = data.monitored_active_count + data.monitored_inactive_count;
-            const percentageMonitoredUp = Math.floor((data.monitored_active_count / totalMonitored) * 100);
-            const percentageMonitoredDown = Math.floor((data.monitored_inactive_count / totalMonitored) * 100);
-            self.pieGraph({
-                name: 'monitoredUpVsDown',
-                labels: [`Up ${data.monitored_active_count} (${percentageMonitoredUp}%)`,
-                    `Down ${data.monitored_inactive_count} (${percentageMonitoredDown}%)`],
-                    data: [data.monitored_active_count, data.monitored_inactive_count],
-                    target: monitoredUpVsDown
-                });
-                
-                const totalAllotmentMonitored = data.monitored_has_allotment_count + data.monitored_has_no_allotment_count;
-                const percentageAllotmentMonitoredUp = Math.floor((data.monitored_has_allotment_count / totalAllotmentMonitored) * 100);
-                const percentageAllotmentMonitoredDown = Math.floor((data.monitored_has_no_allotment_count / totalAllotmentMonitored) * 100);
-                self.pieGraph({
-                    name: 'downtimeAllotment',
-                    labels: [`Hosts With Allotment Available ${data.monitored_has_allotment_count} (${percentageAllotmentMonitoredUp}%)`,
-                        `Hosts With Allotment Depleted ${data.monitored_has_no_allotment_count} (${percentageAllotmentMonitoredDown}%)`],
-                        data: [data.monitored_has_allotment_count, data.monitored_has_no_allotment_count],
-                        target: downtimeAllotment
-                    });
-                    
-                });
-            }
+        const percentageMonitoredUp = Math.floor((data.monitored_active_count / totalMonitored) * 100);
+        const percentageMonitoredDown = Math.floor((data.monitored_inactive_count / totalMonitored) * 100);
+        self.pieGraph({
+            name: 'monitoredUpVsDown',
+            labels: [`Up ${data.monitored_active_count} (${percentageMonitoredUp}%)`,
+                `Down ${data.monitored_inactive_count} (${percentageMonitoredDown}%)`],
+            data: [data.monitored_active_count, data.monitored_inactive_count],
+            target: monitoredUpVsDown
+        });
+        
+        const totalAllotmentMonitored = data.monitored_has_allotment_count + data.monitored_has_no_allotment_count;
+        const percentageAllotmentMonitoredUp = Math.floor((data.monitored_has_allotment_count / totalAllotmentMonitored) * 100);
+        const percentageAllotmentMonitoredDown = Math.floor((data.monitored_has_no_allotment_count / totalAllotmentMonitored) * 100);
+        self.pieGraph({
+            name: 'downtimeAllotment',
+            labels: [`Hosts With Allotment Available ${data.monitored_has_allotment_count} (${percentageAllotmentMonitoredUp}%)`,
+                `Hosts With Allotment Depleted ${data.monitored_has_no_allotment_count} (${percentageAllotmentMonitoredDown}%)`],
+            data: [data.monitored_has_allotment_count, data.monitored_has_no_allotment_count],
+            target: downtimeAllotment
+        });
+    }
             
             self.refresh = function() {
                 self.refreshGraph();
@@ -139,7 +173,13 @@ const summary = new function() {
                     document.querySelector('select[name="summaryRefreshInterval"]').value = localStorage.getItem('summaryRefreshInterval');
                 }
                 self.themeObserver.observe(document.body, { attributes: true });
+                self.loadGroups();
                 self.refresh();
+                // Each completed monitor cycle brings fresh counts, the graph gains a point
+                utils.onCycle((cycle) => {
+                    self.renderStatus(cycle.summary);
+                    self.refreshGraph();
+                });
             }
         }
         
@@ -1,3 +1,543 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from rrd.cache import FetchCache, fetch_cache
+from rrd.downsample import column_means, downsample
+from rrd.encoding import decode_columnar, encode_columnar
+from rrd.reports import ALLOTMENT_PERIOD, align_rows, stack_series, summarize
+from rrd.services import RRDService
+from rrd.writer import RRDUpdateQueue
+from rrd.store import ColumnarStore
+from website.models import GlobalSettings, Hosts
+from monitors import events
+from monitors.events import fleet_summary, publish_cycle_event
+from monitors.registry import HostRegistry
+from website.services import HostService, ImportService, LogService, ReportService
+from website.views import monitored_hosts_import_status
+
+
+class ColumnarEncodingTests(SimpleTestCase):
+    def fetch_result(self, rows):
+        return (1700000000, 1700000000 + 30 * len(rows), 30), ('uptime', 'latency'), rows
+
+    def assertSeriesEqual(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for expected_row, actual_row in zip(expected, actual):
+            for value, decoded in zip(expected_row, actual_row):
+                if value is None or math.isnan(value):
+                    self.assertIsNone(decoded)
+                else:
+                    self.assertAlmostEqual(value, decoded, places=3)
+
+    def test_round_trip_with_gaps(self):
+        rng = random.Random(7)
+        rows = [
+            (None, None) if rng.random() < 0.1 else (rng.choice([100.0, 100.0, 0.0]), rng.uniform(1, 200))
+            for _ in range(500)
+        ]
+        rows[3] = (100.0, math.nan)
+
+        timing, names, decoded = decode_columnar(encode_columnar(self.fetch_result(rows)))
+
+        self.assertEqual(timing, self.fetch_result(rows)[0])
+        self.assertEqual(names, ('uptime', 'latency'))
+        self.assertSeriesEqual(rows, decoded)
+
+    def test_averaged_uptime_falls_back_to_float32(self):
+        rows = [(99.5, 10.0), (97.25, 11.0)]
+        body = encode_columnar(self.fetch_result(rows))
+
+        self.assertSeriesEqual(rows, decode_columnar(body)[2])
+
+    def test_much_smaller_than_json(self):
+        rng = random.Random(1)
+        # rrdtool returns full precision doubles, consolidation rarely leaves round numbers
+        rows = [(100.0, rng.uniform(5, 40)) for _ in range(2880)]
+        json_size = len(json.dumps({'rrd_data': self.fetch_result(rows)}))
+        columnar_size = len(gzip.compress(encode_columnar(self.fetch_result(rows))))
+
+        self.assertGreater(json_size / columnar_size, 5)
+
+
+class DownsampleTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.rows = [(100.0, rng.uniform(10, 20)) for _ in range(2880)]
+        self.rows[700] = (0.0, None)
+        self.rows[2100] = (100.0, 1500.0)
+        self.rrd_data = ((0, 2880 * 30, 30), ('uptime', 'latency'), self.rows)
+
+    def test_keeps_ends_dips_and_spikes(self):
+        timing, names, rows, timestamps = downsample(self.rrd_data, 300)
+
+        self.assertEqual(len(rows), 300)
+        self.assertEqual(timestamps[0], 0)
+        self.assertEqual(timestamps[-1], 2879 * 30)
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertIn(self.rows[700], rows)
+        self.assertIn(self.rows[2100], rows)
+        self.assertEqual(rows[timestamps.index(2100 * 30)], self.rows[2100])
+
+    def test_short_series_unchanged(self):
+        self.assertIs(downsample(self.rrd_data, 5000), self.rrd_data)
+
+    def test_round_trips_through_columnar(self):
+        downsampled = downsample(self.rrd_data, 100)
+
+        self.assertEqual(decode_columnar(encode_columnar(downsampled))[3], downsampled[3])
+
+    def test_column_means_skip_nulls(self):
+        means = column_means(((0, 90, 30), ('uptime', 'latency'), [(100.0, 10.0), (0.0, None), (None, 20.0)]))
+
+        self.assertEqual(means, {'uptime': 50.0, 'latency': 15.0})
+
+
+class SLAReportTests(SimpleTestCase):
+    def test_summarize_hosts_together(self):
+        series = [
+            # 1 of 4 hours down, one hour without data
+            [(100.0, 10.0), (0.0, None), (100.0, 30.0), (None, None), (100.0, 20.0)],
+            # Never answered
+            [(0.0, None)] * 5,
+            # No RRD file
+            [],
+        ]
+        metrics = summarize(stack_series(series, 5), 3600, 5 * 3600, [120, 0, 30])
+
+        self.assertEqual(metrics['uptime'][0], 75.0)
+        self.assertEqual(metrics['coverage'][0], 80.0)
+        self.assertEqual(metrics['downtime_minutes'][0], 60.0)
+        self.assertEqual(metrics['latency_mean'][0], 20.0)
+        self.assertEqual(metrics['latency_max'][0], 30.0)
+        # 120 seconds per 14 days over 5 hours
+        self.assertAlmostEqual(metrics['allotment_minutes'][0], 2 * 5 * 3600 / ALLOTMENT_PERIOD)
+        self.assertGreater(metrics['allotment_used'][0], 100)
+
+        self.assertEqual(metrics['uptime'][1], 0.0)
+        self.assertTrue(math.isnan(metrics['latency_max'][1]))
+        self.assertTrue(math.isnan(metrics['allotment_used'][1]))
+
+        self.assertTrue(math.isnan(metrics['uptime'][2]))
+        self.assertEqual(metrics['coverage'][2], 0.0)
+
+
+    def test_align_rows_resamples_other_steps(self):
+        # A coarser RRA repeats each row over the grid rows it covers
+        coarse = ((0, 7200, 3600), ('uptime', 'latency'), [(100.0, 10.0), (0.0, None)])
+        aligned = align_rows(coarse, 1800, 4, 900)
+        self.assertEqual(aligned[:, 0].tolist(), [100.0, 100.0, 0.0, 0.0])
+
+        # A finer one is averaged, unknown rows stay out, rows before start are dropped
+        fine = ((-300, 900, 300), ('uptime', 'latency'), [(0.0, 1.0), (100.0, 10.0), (None, None), (50.0, 20.0)])
+        aligned = align_rows(fine, 0, 2, 600)
+        self.assertEqual(aligned[0].tolist(), [100.0, 10.0])
+        self.assertEqual(aligned[1].tolist(), [50.0, 20.0])
+
+
+class SLAReportDatabaseTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(RRD_BACKEND='columnar', RRD_DIR=Path(directory.name)))
+        GlobalSettings.objects.update_or_create(key='default_downtime_allotment', defaults={'value': 30})
+
+    def test_allotments_the_monitor_writes(self):
+        # What the monitor leaves behind: one failed check used up the default 30 seconds, an untouched
+        # default, and a host imported with an hour that one failed check took 30 seconds from
+        hosts = {
+            'depleted': Hosts.objects.create(host_name='depleted', downtime_allotment=0),
+            'untouched': Hosts.objects.create(host_name='untouched', downtime_allotment=30),
+            'custom': Hosts.objects.create(host_name='custom', downtime_allotment=3570),
+        }
+        rrd = RRDService()
+        end = int(time.time()) // 300 * 300
+        for name, host in hosts.items():
+            rrd.create_rrd_file(str(host.uuid))
+            # One 5 minute row down for the hosts that failed a check
+            rrd.write_update(str(host.uuid), end - 270, 100.0 if name == 'untouched' else 0.0, 5.0)
+
+        report = ReportService.get_sla_report('7d', use_cache=False)
+        rows = {row['host_name']: row for row in report['hosts']}
+
+        # 30 seconds per 14 days is a quarter of a minute over 7 days
+        self.assertAlmostEqual(rows['depleted']['allotment_minutes'], 0.25)
+        self.assertEqual(rows['depleted']['downtime_minutes'], 5.0)
+        self.assertFalse(rows['depleted']['within_allotment'])
+        self.assertAlmostEqual(rows['untouched']['allotment_minutes'], 0.25)
+        self.assertTrue(rows['untouched']['within_allotment'])
+        self.assertAlmostEqual(rows['custom']['allotment_minutes'], 3570 / 60 / 2)
+        self.assertTrue(rows['custom']['within_allotment'])
+        self.assertEqual(report['errors'], {})
+
+
+class HostCountTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(MONITOR_EVENTS_DIR=directory.name, MONITOR_COUNTS_MAX_AGE=60))
+        # Each process remembers the last event it read, start every test without one
+        for cache in (events.latest_events, events.latest_mtimes):
+            cache.clear()
+            self.addCleanup(cache.clear)
+
+        states = [(True, True, 30), (True, True, 0), (True, False, 0), (True, False, 30), (False, True, 30), (False, False, 0)]
+        Hosts.objects.bulk_create([
+            Hosts(host_name=f"host-{index}", is_monitored=monitored, is_active=active, downtime_allotment=allotment)
+            for index, (monitored, active, allotment) in enumerate(states * 3)
+        ])
+
+    def per_status_counts(self):
+        """The counters as the pages used to count them, one query each"""
+        return {
+            'host_count': Hosts.objects.count(),
+            'monitored_count': Hosts.objects.filter(is_monitored=1).count(),
+            'unmonitored_count': Hosts.objects.filter(is_monitored=0).count(),
+            'monitored_active_count': Hosts.objects.filter(is_monitored=1, is_active=1).count(),
+            'monitored_inactive_count': Hosts.objects.filter(is_monitored=1, is_active=0).count(),
+            'monitored_has_allotment_count': Hosts.objects.filter(is_monitored=1, downtime_allotment__gt=0).count(),
+            'monitored_has_no_allotment_count': Hosts.objects.filter(is_monitored=1, downtime_allotment=0).count(),
+        }
+
+    def test_one_query_matches_per_status_counts(self):
+        with self.assertNumQueries(1):
+            counts = fleet_summary()
+        self.assertEqual(counts, self.per_status_counts())
+        self.assertEqual(counts['monitored_active_count'], 6)
+
+    def test_fresh_snapshot_is_served(self):
+        summary = {**fleet_summary(), 'host_count': 1000}
+        publish_cycle_event(0, 0, summary, [], HostRegistry.current_version())
+
+        self.assertEqual(HostService.get_host_counts(), summary)
+        self.assertEqual(HostService.get_host_counts(use_snapshot=False), self.per_status_counts())
+
+    def test_falls_back_to_the_database(self):
+        # No event yet
+        self.assertEqual(HostService.get_host_counts(), self.per_status_counts())
+
+        # Hosts changed after the snapshot was taken
+        publish_cycle_event(0, 0, {**fleet_summary(), 'host_count': 1000}, [], HostRegistry.current_version())
+        HostService.next_change_version()
+        Hosts.objects.create(host_name='new')
+        self.assertEqual(HostService.get_host_counts(), self.per_status_counts())
+
+        # Snapshot older than MONITOR_COUNTS_MAX_AGE
+        publish_cycle_event(0, 30, {**fleet_summary(), 'host_count': 1000}, [], HostRegistry.current_version())
+        with override_settings(MONITOR_COUNTS_MAX_AGE=-1):
+            self.assertEqual(HostService.get_host_counts(), self.per_status_counts())
+
+
+class HostPageTests(TestCase):
+    def setUp(self):
+        # Few distinct values so every sort key has long runs of duplicates, and NULLs in the nullable ones
+        rng = random.Random(7)
+        Hosts.objects.bulk_create([
+            Hosts(
+                host_name=rng.choice(['alpha', 'beta', 'gamma', None]),
+                region=rng.choice(['eu', 'us', None]),
+                account_id=rng.choice(['a1', 'a2', None]),
+                is_active=rng.random() < 0.6,
+                downtime_allotment=rng.choice([0, 30]),
+                is_monitored=index % 10 != 0,
+            )
+            for index in range(60)
+        ])
+
+    def expected(self, sort, order, **filters):
+        """Ids in listing order, sorted in Python the way SQLite sorts them: NULL below every value"""
+        hosts = Hosts.objects.filter(is_monitored=True, **filters)
+        fields = HostService.listing_sorts[sort]
+        key = lambda host: tuple((getattr(host, field) is not None, getattr(host, field)) for field in fields)
+        return [host.pk for host in sorted(hosts, key=key, reverse=order == 'desc')]
+
+    def walk(self, sort, order, limit, filters=None):
+        """Ids of every page followed by the sizes of the pages"""
+        ids, sizes, after = [], [], None
+        while True:
+            page = HostService.get_hosts_page(True, filters, sort, order, after, limit)
+            ids += [host.pk for host in page['hosts']]
+            sizes.append(len(page['hosts']))
+            after = page['next']
+            if after is None:
+                return ids, sizes
+
+    def test_every_sort_and_order_pages_through_duplicates(self):
+        for sort in HostService.listing_sorts:
+            for order in ('asc', 'desc'):
+                with self.subTest(sort=sort, order=order):
+                    ids, sizes = self.walk(sort, order, 7)
+                    self.assertEqual(ids, self.expected(sort, order))
+                    self.assertTrue(all(size == 7 for size in sizes[:-1]))
+
+    def test_last_page_has_no_cursor(self):
+        total = Hosts.objects.filter(is_monitored=True).count()
+        page = HostService.get_hosts_page(True, limit=total)
+        self.assertEqual(len(page['hosts']), total)
+        self.assertIsNone(page['next'])
+
+        # 54 hosts in pages of 9 must not leave an empty page behind
+        self.assertEqual(total, 54)
+        ids, sizes = self.walk('host_name', 'asc', 9)
+        self.assertEqual(sizes, [9] * 6)
+
+    def test_filters_hold_across_pages(self):
+        filters = {'region': 'eu', 'state': 'down', 'allotment': 'available'}
+        for order in ('asc', 'desc'):
+            with self.subTest(order=order):
+                ids, _ = self.walk('account', order, 2, filters)
+                expected = self.expected('account', order, region='eu', is_active=False, downtime_allotment__gt=0)
+                self.assertEqual(ids, expected)
+                self.assertTrue(expected)
+
+    def test_rejects_bad_cursors(self):
+        with self.assertRaises(ValueError):
+            HostService.get_hosts_page(True, sort='region', after='not-a-cursor')
+        with self.assertRaises(ValueError):
+            HostService.get_hosts_page(True, sort='region', after=HostService.encode_cursor(['eu']))
+
+
+IMPORT_CSV = """account_label,account_id,region,host_id,host_ip_address,host_name,downtime_allotment,monitor_type,monitor_params
+"Acme, Inc",a1,eu,h1,10.0.0.1,"web, primary",60,,
+Acme,a1,eu,h2,10.0.0.2,web2,,,
+Acme,a1,eu,h3,10.0.0.1,again,,,
+Acme,a1,us,h4,10.9.9.9,existing,,,
+Acme,a1,eu,h5,,no-address,,,
+Acme,a1,eu,h6,10.0.0.6,bad-allotment,soon,,
+short,row
+
+Acme,a1,eu,h9,10.0.0.9,web9,,,
+"""
+
+
+# The background import writes from its own thread, which needs committed rows rather than a test transaction
+class HostImportTests(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(
+            RRD_BACKEND='columnar',
+            RRD_DIR=Path(directory.name) / 'rrd',
+            HOST_IMPORT_DIR=Path(directory.name) / 'imports',
+            HOST_IMPORT_CHUNK=2,
+        ))
+        GlobalSettings.objects.update_or_create(key='default_downtime_allotment', defaults={'value': 30})
+        GlobalSettings.objects.update_or_create(key='hosts_change_version', defaults={'value': 0})
+        Hosts.objects.create(host_name='existing', region='us', host_ip_address='10.9.9.9')
+
+    def assertImported(self, job):
+        self.assertEqual(job['status'], 'finished')
+        self.assertEqual((job['rows'], job['created'], job['duplicates'], job['errors']), (8, 3, 2, 3))
+        self.assertEqual(
+            [(error['line'], error['error']) for error in job['error_rows']],
+            [
+                (6, 'Missing host IP address'),
+                (7, 'Invalid downtime allotment: soon'),
+                (8, 'Expected at least 6 fields, got 2'),
+            ],
+        )
+
+        hosts = {host.host_name: host for host in Hosts.objects.exclude(host_name='existing')}
+        self.assertEqual(sorted(hosts), ['web, primary', 'web2', 'web9'])
+        self.assertEqual(hosts['web, primary'].account_label, 'Acme, Inc')
+        self.assertEqual(hosts['web, primary'].downtime_allotment, 60)
+        self.assertEqual(hosts['web2'].downtime_allotment, 30)
+        self.assertEqual(hosts['web2'].monitor_type, 'icmp')
+        # Chunks of 2, each stamped with its own change version and provisioned
+        self.assertEqual(hosts['web, primary'].change_version, hosts['web2'].change_version)
+        self.assertGreater(hosts['web9'].change_version, hosts['web2'].change_version)
+        rrd = RRDService()
+        self.assertTrue(all(rrd.rrd_exists(str(host.uuid)) for host in hosts.values()))
+
+    def test_import_from_stream(self):
+        self.assertImported(ImportService.import_hosts(io.StringIO(IMPORT_CSV, newline='')))
+
+    def test_background_job_reports_progress_as_json(self):
+        upload = SimpleUploadedFile('hosts.csv', IMPORT_CSV.encode(), content_type='text/csv')
+        with override_settings(HOST_IMPORT_BACKGROUND_BYTES=10):
+            job = ImportService.import_upload(upload)
+        self.assertTrue(job['background'])
+        for thread in threading.enumerate():
+            if thread.name == f"host-import-{job['id'][:8]}":
+                thread.join(10)
+
+        response = monitored_hosts_import_status(RequestFactory().get('/', {'job': job['id']}))
+        self.assertEqual(response.status_code, 200)
+        status = json.loads(response.content)
+        self.assertImported(status)
+        self.assertFalse(os.path.exists(ImportService.job_path(job['id'], '.csv')))
+
+        report = monitored_hosts_import_status(RequestFactory().get('/', {'job': job['id'], 'format': 'csv'}))
+        self.assertEqual(report.content.decode().splitlines()[1].split(',')[:2], ['6', 'Missing host IP address'])
+
+        missing = monitored_hosts_import_status(RequestFactory().get('/', {'job': '0' * 32}))
+        self.assertEqual(missing.status_code, 404)
+
+
+class ColumnarStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = ColumnarStore(directory.name)
+        self.store.create_many(['a', 'b'])
+        self.start = 1700000000 // 3600 * 3600
+
+    def test_write_and_consolidate(self):
+        for index in range(120):
+            timestamp = self.start + index * 30
+            self.store.write(['a', 'b'], [timestamp] * 2, [(100.0 if index % 5 else 0.0, 10.0), (100.0, None)])
+
+        timing, names, rows = self.store.fetch('a', self.start, self.start + 3600, 300)
+        self.assertEqual(timing[2], 300)
+        self.assertEqual(names, ('uptime', 'latency'))
+        self.assertEqual(rows[0], (80.0, 10.0))
+        self.assertEqual(self.store.fetch('b', self.start, self.start + 3600, 300)[2][0], (100.0, None))
+        self.assertEqual(self.store.last_update('a'), self.start + 119 * 30)
+
+    def test_old_and_missing_samples_read_as_unknown(self):
+        self.store.write(['a'], [self.start], [(100.0, 5.0)])
+        # Older samples are skipped, unknown hosts too
+        self.assertEqual(self.store.write(['a', 'c'], [self.start] * 2, [(0.0, 1.0)] * 2), (0, 2))
+        # Exactly one ring later the slot is reused, the first sample must not show through the gap
+        self.store.write(['a'], [self.start + 2880 * 30], [(0.0, 1.0)])
+
+        rows = self.store.fetch('a', self.start, self.start + 600, 30)[2]
+        self.assertEqual(rows[0], (None, None))
+
+    def test_destroyed_rows_are_reused_empty(self):
+        self.store.write(['a'], [self.start], [(100.0, 5.0)])
+        self.assertTrue(self.store.destroy('a'))
+        self.store.create_many(['c'])
+
+        self.assertEqual(self.store.row('c'), 0)
+        self.assertEqual(self.store.last_update('c'), 0)
+        self.assertFalse(self.store.contains('a'))
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'rrd_fetch': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fetch-cache-tests'},
+})
+class FetchCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['rrd_fetch'].clear()
+        fetch_cache.clear()
+        self.addCleanup(fetch_cache.clear)
+
+    def test_shared_hits_are_kept_locally(self):
+        FetchCache().set('key', [1, 2], time.time() + 60)
+        other = FetchCache()
+
+        self.assertEqual(other.get('key'), [1, 2])
+        self.assertEqual(other.get('key'), [1, 2])
+        self.assertEqual(other.stats()['shared_hits'], 1)
+        self.assertEqual(other.stats()['local_hits'], 1)
+
+    def test_update_within_a_step_is_not_served_from_cache(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(RRD_BACKEND='columnar', RRD_DIR=Path(directory.name)):
+            rrd = RRDService()
+            rrd.create_rrd_file('host')
+            end = rrd.current_step()
+            rrd.write_update('host', end - 60, 100.0, 5.0)
+            first = rrd.get_metrics('host', 0)
+            rrd.write_update('host', end - 30, 0.0, 7.0)
+            second = rrd.get_metrics('host', 0)
+
+        # The row of the second sample, the last row is the step still in progress
+        self.assertEqual(first[2][-2], (None, None))
+        self.assertEqual(second[2][-2], (0.0, 7.0))
+
+
+class RRDWriterTests(SimpleTestCase):
+    def test_legacy_flat_file_is_looked_up_once(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(RRD_BACKEND='rrdtool', RRD_DIR=Path(directory.name), RRD_DIR_FANOUT=[2, 2]):
+            rrd = RRDService()
+            writer = RRDUpdateQueue(rrd)
+            self.addCleanup(writer.close)
+            # A file from before the fan-out layout, still directly in RRD_DIR
+            rrd.create_rrd_file('legacy')
+            rrd.layout_path('legacy').rename(rrd.flat_path('legacy'))
+            start = rrd.aligned_time(time.time())
+
+            writer.write('legacy', start, (100, 5))
+            with mock.patch.object(rrd, 'get_rrd_path', wraps=rrd.get_rrd_path) as get_rrd_path:
+                for step in range(1, 4):
+                    writer.write('legacy', start + step * 30, (100, 5))
+
+        get_rrd_path.assert_not_called()
+        self.assertEqual(writer.paths['legacy'], rrd.flat_path('legacy'))
+        self.assertEqual(writer.stats()['written'], 4)
+
+
+class LogTailTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(APP_LOG_DIR=directory.name))
+        self.path = os.path.join(directory.name, 'monitors.log')
+        self.write(''.join(f'line {index}\n' for index in range(20000)))
+
+    def write(self, text, mode='a'):
+        with open(self.path, mode) as file:
+            file.write(text)
+
+    def test_tail_then_only_new_lines(self):
+        first = LogService.get_log_update('monitors', 3)
+        self.assertEqual(first['log_content'], 'line 19997\nline 19998\nline 19999\n')
+        self.assertTrue(first['reset'])
+
+        self.write('new 1\npartial')
+        update = LogService.get_log_update('monitors', 3, first['offset'], first['inode'])
+        self.assertEqual(update['log_content'], 'new 1\n')
+        self.assertFalse(update['reset'])
+
+        self.write(' done\n')
+        update = LogService.get_log_update('monitors', 3, update['offset'], update['inode'])
+        self.assertEqual(update['log_content'], 'partial done\n')
+
+    def test_rotation_and_truncation(self):
+        first = LogService.get_log_update('monitors', 1)
+        self.write('before rotation\n')
+        os.rename(self.path, f'{self.path}.1')
+        self.write('after rotation\n', 'w')
+        update = LogService.get_log_update('monitors', 1, first['offset'], first['inode'])
+        self.assertEqual(update['log_content'], 'before rotation\nafter rotation\n')
+        self.assertFalse(update['reset'])
+
+        self.write('short\n', 'w')
+        update = LogService.get_log_update('monitors', 5, update['offset'] + 100, update['inode'])
+        self.assertTrue(update['reset'])
+        self.assertEqual(update['log_content'], 'short\n')
+
+    @override_settings(LOG_READ_MAX_BYTES=40)
+    def test_read_limit_starts_at_a_line(self):
+        # 'line 19997\n' starts 33 bytes before the end, the 40 byte window begins inside 'line 19996'
+        first = LogService.get_log_update('monitors', 1000)
+        self.assertEqual(first['log_content'], 'line 19997\nline 19998\nline 19999\n')
+
+        self.write('before rotation\n')
+        os.rename(self.path, f'{self.path}.1')
+        self.write('after rotation, a longer line\n', 'w')
+        update = LogService.get_log_update('monitors', 1, first['offset'] - 11, first['inode'])
+        self.assertEqual(update['log_content'], 'after rotation, a longer line\n')
+        self.assertFalse(update['reset'])
+
+    def test_rejects_unknown_logs(self):
+        with self.assertRaises(ValueError):
+            LogService.get_log_update('../secrets', 10)
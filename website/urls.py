@@ -6,15 +6,29 @@ urlpatterns = [
     path("summary", views.summary, name="summary"),
     path("summary/host_info", views.summary_host_info, name="summary_host_info"),
 
+    # Live monitor cycle events
+    path("events/cycles", views.monitor_events, name="monitor_events"),
+
     # Monitored Hosts
     path("monitored_hosts", views.monitored_hosts, name="monitored_hosts"),
+    path("monitored_hosts/list", views.monitored_hosts_list, name="monitored_hosts_list"),
     path("monitored_hosts/add", views.monitored_hosts_add, name="monitored_hosts_add"),
     path("monitored_hosts/settings", views.monitored_hosts_settings, name="monitored_hosts_settings"),
     path("monitored_hosts/metrics", views.monitored_hosts_metrics, name="monitored_hosts_metrics"),
+    path("monitored_hosts/metrics/batch", views.monitored_hosts_metrics_batch, name="monitored_hosts_metrics_batch"),
     path("monitored_hosts/import", views.monitored_hosts_import, name="monitored_hosts_import"),
+    path("monitored_hosts/import/status", views.monitored_hosts_import_status, name="monitored_hosts_import_status"),
+
+    # Region and account aggregates
+    path("aggregates", views.aggregates, name="aggregates"),
+    path("aggregates/metrics", views.aggregates_metrics, name="aggregates_metrics"),
+
+    # Reports
+    path("reports/sla", views.reports_sla, name="reports_sla"),
 
     # Unmonitored Hosts
     path("unmonitored_hosts", views.unmonitored_hosts, name="unmonitored_hosts"),
+    path("unmonitored_hosts/list", views.unmonitored_hosts_list, name="unmonitored_hosts_list"),
     path("unmonitored_hosts/remonitor", views.unmonitored_hosts_remonitor, name="unmonitored_hosts_remonitor"),
     path("unmonitored_hosts/delete", views.unmonitored_hosts_delete, name="unmonitored_hosts_delete"),
 
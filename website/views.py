@@ -1,30 +1,124 @@
 from typing import Dict, Any
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import json
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpRequest
+from django.urls import reverse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from django.views.decorators.http import condition
 from django.contrib import messages
 from rrd.services import RRDService
+from rrd.encoding import encode_columnar
+from rrd.downsample import downsample, column_means
+from monitors.models import MonitorStatus
+from monitors.icmp import AGGREGATE_GROUPS, group_rrd_file
+from monitors.events import read_cycle_events
+from website.events import broadcaster, format_event
 
 from website.services import (
     HostService, MonitorService, LogService, 
-    SystemService, SettingsService
+    SystemService, SettingsService, MetricsService, ReportService, ImportService
 )
 
 def summary(request: HttpRequest) -> Any:
-    host_count = HostService.get_host_count()
+    host_count = HostService.get_host_counts()["host_count"]
     return render(request, "summary.html", {"host_count": host_count})
 
 
 def summary_host_info(request: HttpRequest) -> JsonResponse:
+    counts = HostService.get_host_counts()
     return JsonResponse({
-        "monitored_active_count": HostService.get_monitored_active_count(),
-        "monitored_inactive_count": HostService.get_monitored_inactive_count(),
-        "monitored_has_allotment_count": HostService.get_monitored_has_allotment_count(),
-        "monitored_has_no_allotment_count": HostService.get_monitored_has_no_allotment_count()
+        "monitored_active_count": counts["monitored_active_count"],
+        "monitored_inactive_count": counts["monitored_inactive_count"],
+        "monitored_has_allotment_count": counts["monitored_has_allotment_count"],
+        "monitored_has_no_allotment_count": counts["monitored_has_no_allotment_count"]
+    })
+
+async def monitor_events(request: HttpRequest) -> StreamingHttpResponse:
+    """
+    Server-Sent Events stream with one event per completed monitor cycle,
+    carrying the summary counts and the hosts whose state changed.
+
+    Streams need an ASGI server. Under WSGI each worker thread would be held
+    by one client, so the latest events are sent once and the browser told
+    to reconnect later, which degrades to polling.
+    """
+    if isinstance(request, ASGIRequest):
+        stream = broadcaster.stream(request.headers.get("Last-Event-ID"))
+    else:
+        events = await asyncio.to_thread(read_cycle_events)
+        stream = [f"retry: {settings.MONITOR_INTERVAL * 1000}\n\n", *(format_event(event) for event in events)]
+
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+def hosts_page_options(request: HttpRequest, default_sort: str) -> Dict[str, Any]:
+    """Listing filters, sort and cursor from the query string"""
+    limit = request.GET.get("limit")
+    return {
+        "filters": {field: request.GET.get(field, "") for field in ("region", "account", "state", "allotment")},
+        "sort": request.GET.get("sort") or default_sort,
+        "order": request.GET.get("order") or "asc",
+        "after": request.GET.get("after") or None,
+        "limit": int(limit) if limit else None,
+    }
+
+def render_hosts_page(request: HttpRequest, template: str, is_monitored: bool, default_sort: str) -> Any:
+    """Render one page of a host listing, an invalid query string falls back to the first page"""
+    try:
+        options = hosts_page_options(request, default_sort)
+        page = HostService.get_hosts_page(is_monitored, **options)
+    except ValueError as e:
+        messages.error(request, str(e))
+        options = {"filters": {}, "sort": default_sort, "order": "asc"}
+        page = HostService.get_hosts_page(is_monitored, sort=default_sort)
+
+    next_query = None
+    if page["next"]:
+        query = request.GET.copy()
+        query["after"] = page["next"]
+        query.pop("import_job", None)
+        next_query = query.urlencode()
+    first_query = request.GET.copy()
+    first_query.pop("after", None)
+    first_query.pop("import_job", None)
+    return render(request, template, {
+        "host_list": page["hosts"],
+        "filters": options["filters"],
+        "sort": page["sort"],
+        "order": page["order"],
+        "is_first_page": not request.GET.get("after"),
+        "first_query": first_query.urlencode(),
+        "next_query": next_query,
+        "import_job": request.GET.get("import_job"),
+    })
+
+def hosts_list(request: HttpRequest, is_monitored: bool, default_sort: str) -> JsonResponse:
+    """One page of hosts as JSON, follow next as the after parameter for the following page"""
+    try:
+        page = HostService.get_hosts_page(is_monitored, **hosts_page_options(request, default_sort))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({
+        "hosts": [HostService.host_listing_data(host) for host in page["hosts"]],
+        "next": page["next"],
+        "sort": page["sort"],
+        "order": page["order"],
     })
 
 def monitored_hosts(request: HttpRequest) -> Any:
-    host_list = HostService.get_monitored_hosts()
-    return render(request, "monitored_hosts.html", {"host_list": host_list})
+    return render_hosts_page(request, "monitored_hosts.html", True, "status")
+
+def monitored_hosts_list(request: HttpRequest) -> JsonResponse:
+    return hosts_list(request, True, "status")
 
 def monitored_hosts_settings(request: HttpRequest) -> Any:
     try:
@@ -77,74 +171,178 @@ def monitored_hosts_import(request: HttpRequest) -> Any:
             messages.error(request, "File must be a CSV")
             return redirect('monitored_hosts')
 
-        # Read and decode CSV content
-        file_data = csv_file.read().decode('utf-8')
-        lines = file_data.split('\n')
-        
-        # Skip header row and empty lines
-        data_lines = [line for line in lines[1:] if line.strip()]
-        
-        success_count = 0
-        duplicate_count = 0
-        error_count = 0
-        
-        for line in data_lines:
-            try:
-                # Split CSV line and remove quotes
-                fields = [field.strip('"') for field in line.split(',')]
-                
-                if len(fields) < 6:  # Minimum required fields
-                    continue
-                    
-                host_data = {
-                    "account_label": fields[0],
-                    "account_id": fields[1],
-                    "region": fields[2], 
-                    "host_id": fields[3],
-                    "host_ip_address": fields[4],
-                    "host_name": fields[5],
-                    "downtime_allotment": fields[6] if len(fields) > 6 and fields[6] else "",
-                    "monitor_type": fields[7] if len(fields) > 7 and fields[7] else "icmp",
-                    "monitor_params": fields[8] if len(fields) > 8 and fields[8] else ""
-                }
-                
-                host = HostService.create_host(host_data)
-                if host == None:
-                    duplicate_count += 1
-                else:
-                    success_count += 1
-                
-            except Exception as e:
-                error_count += 1
-                continue
-
-        if success_count > 0:
-            messages.success(request, f"Successfully imported {success_count} hosts")
-        elif duplicate_count > 0:
-            messages.warning(request, f"Skipped {duplicate_count} duplicate hosts")
-        elif error_count > 0:
-            messages.warning(request, f"Failed to import {error_count} hosts")
-            
+        job = ImportService.import_upload(csv_file)
+        if job["background"]:
+            messages.info(request, f"Importing {csv_file.name} in the background")
+            return redirect(f"{reverse('monitored_hosts')}?import_job={job['id']}")
+
+        if job["created"] > 0:
+            messages.success(request, f"Successfully imported {job['created']} hosts")
+        if job["duplicates"] > 0:
+            messages.warning(request, f"Skipped {job['duplicates']} duplicate hosts")
+        if job["errors"] > 0:
+            lines = ", ".join(str(error["line"]) for error in job["error_rows"][:10])
+            messages.warning(request, f"Failed to import {job['errors']} hosts (lines {lines}{', ...' if job['errors'] > 10 else ''})")
+
     except Exception as e:
         messages.error(request, f"Error processing CSV file: {str(e)}")
-        
+
     return redirect('monitored_hosts')
 
-def monitored_hosts_metrics(request: HttpRequest) -> JsonResponse:
-    host_uuid = request.GET.get("host_uuid")
+def monitored_hosts_import_status(request: HttpRequest) -> Any:
+    """Progress of a background import, format=csv returns its error report"""
+    try:
+        job = ImportService.get_job(request.GET.get("job", ""))
+    except (ValueError, FileNotFoundError) as e:
+        return JsonResponse({"error": str(e)}, status=404)
+
+    if request.GET.get("format") == "csv":
+        response = HttpResponse(content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="import-errors-{job["id"]}.csv"'
+        ImportService.write_error_report(job, response)
+        return response
+    return JsonResponse(job)
+
+def accepts_gzip(request: HttpRequest) -> bool:
+    return "gzip" in request.headers.get("Accept-Encoding", "")
+
+def host_metrics_file(request: HttpRequest) -> str:
+    return request.GET.get("host_uuid")
+
+def aggregate_metrics_file(request: HttpRequest) -> str:
+    return group_rrd_file(request.GET.get("kind", "region"), request.GET.get("key", ""))
+
+def metrics_last_update(rrd_file: str) -> int:
+    """Last update of an RRD file, 0 when it is missing or unreadable"""
+    rrd = RRDService()
+    try:
+        return int(rrd.last_update(rrd_file)) if rrd_file and rrd.rrd_exists(rrd_file) else 0
+    except Exception:
+        return 0
+
+def metrics_condition(rrd_file_func):
+    """
+    ETag and Last-Modified of a metrics view whose RRD file rrd_file_func picks from the request.
+
+    Metrics change when a new RRD step starts or the file takes an update, so
+    the step, the last update and the query identify the response.
+    """
+    def etag(request: HttpRequest) -> str:
+        query = hashlib.blake2b(request.GET.urlencode().encode(), digest_size=8).hexdigest()
+        # Gzipped and plain columnar bodies differ, give each its own tag
+        encoding = "-gz" if request.GET.get("format") == "columnar" and accepts_gzip(request) else ""
+        return f"{RRDService().current_step()}-{metrics_last_update(rrd_file_func(request))}-{query}{encoding}"
+
+    def last_modified(request: HttpRequest) -> datetime:
+        changed = max(RRDService().current_step(), metrics_last_update(rrd_file_func(request)))
+        return datetime.fromtimestamp(changed, tz=timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+def metrics_response(request: HttpRequest, rrd_file: str) -> HttpResponse:
+    """Series of one RRD file as JSON or columnar, honouring time_range_resolution_code, max_points and format"""
     time_range_resolution_code = int(request.GET.get("time_range_resolution_code", 1))
+    max_points = int(request.GET.get("max_points", 0))
     rrd = RRDService()
-    rrd_data = rrd.get_metrics(host_uuid, time_range_resolution_code)
+    rrd_data = rrd.get_metrics(rrd_file, time_range_resolution_code)
+
+    # Averages come from every row, downsampling keeps the extremes and would skew them
+    averages = None
+    if max_points and not isinstance(rrd_data, dict):
+        averages = column_means(rrd_data)
+        rrd_data = downsample(rrd_data, max_points)
+
+    # Typed columns instead of a JSON list of pairs, errors stay JSON
+    if request.GET.get("format") == "columnar" and not isinstance(rrd_data, dict):
+        body = encode_columnar(
+            rrd_data,
+            rrd_file=rrd_file,
+            time_range_resolution_code=time_range_resolution_code,
+            averages=averages,
+        )
+        response = HttpResponse(content_type="application/octet-stream")
+        if accepts_gzip(request):
+            body = compress_string(body)
+            response["Content-Encoding"] = "gzip"
+        response.content = body
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
     
     return JsonResponse({
         "time_range_resolution_code": time_range_resolution_code,
-        "rrd_file": host_uuid,
+        "rrd_file": rrd_file,
         "rrd_data": rrd_data,
+        "averages": averages,
     }, safe=False)
+
+@metrics_condition(host_metrics_file)
+def monitored_hosts_metrics(request: HttpRequest) -> HttpResponse:
+    return metrics_response(request, host_metrics_file(request))
+
+def monitored_hosts_metrics_batch(request: HttpRequest) -> JsonResponse:
+    """
+    Series for many hosts in one request.
+
+    GET takes repeated host_uuid parameters, POST a JSON body with host_uuids
+    for lists too long for a URL. Both take time_range_resolution_code and
+    max_points.
+    """
+    try:
+        if request.method == "POST":
+            body = json.loads(request.body or "{}")
+            host_uuids = body.get("host_uuids", [])
+            time_range_resolution_code = int(body.get("time_range_resolution_code", 1))
+            max_points = int(body.get("max_points") or 0)
+        else:
+            host_uuids = request.GET.getlist("host_uuid")
+            time_range_resolution_code = int(request.GET.get("time_range_resolution_code", 1))
+            max_points = int(request.GET.get("max_points", 0))
+    except (ValueError, TypeError, AttributeError) as e:
+        return JsonResponse({"error": f"Invalid batch request: {str(e)}"}, status=400)
+
+    if not isinstance(host_uuids, list) or not host_uuids:
+        return JsonResponse({"error": "host_uuids must be a non-empty list"}, status=400)
+    if len(host_uuids) > settings.METRICS_BATCH_MAX_HOSTS:
+        return JsonResponse({
+            "error": f"Too many hosts in one batch: {len(host_uuids)}, the limit is {settings.METRICS_BATCH_MAX_HOSTS}"
+        }, status=400)
+
+    return JsonResponse(MetricsService.get_metrics_batch(host_uuids, time_range_resolution_code, max_points))
         
+def aggregates(request: HttpRequest) -> JsonResponse:
+    kind = request.GET.get("kind", "region")
+    try:
+        return JsonResponse({"kind": kind, "groups": MetricsService.get_aggregate_groups(kind)})
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+@metrics_condition(aggregate_metrics_file)
+def aggregates_metrics(request: HttpRequest) -> HttpResponse:
+    kind = request.GET.get("kind", "region")
+    if kind not in AGGREGATE_GROUPS:
+        return JsonResponse({"error": f"Invalid aggregate kind: {kind}"}, status=400)
+    return metrics_response(request, aggregate_metrics_file(request))
+
+def reports_sla(request: HttpRequest) -> HttpResponse:
+    """Fleet uptime report for a window as JSON, or CSV with format=csv"""
+    window = request.GET.get("window", "30d")
+    try:
+        report = ReportService.get_sla_report(window)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if request.GET.get("format") == "csv":
+        response = HttpResponse(content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="sla-report-{window}-{report["end"]}.csv"'
+        ReportService.write_sla_report_csv(report, response)
+        return response
+    return JsonResponse(report)
+
 def unmonitored_hosts(request: HttpRequest) -> Any:
-    host_list = HostService.get_unmonitored_hosts()
-    return render(request, "unmonitored_hosts.html", {"host_list": host_list})
+    return render_hosts_page(request, "unmonitored_hosts.html", False, "host_name")
+
+def unmonitored_hosts_list(request: HttpRequest) -> JsonResponse:
+    return hosts_list(request, False, "host_name")
 
 def unmonitored_hosts_remonitor(request: HttpRequest) -> Any:
     try:
@@ -170,14 +368,21 @@ def log_monitor(request: HttpRequest) -> Any:
     return render(request, "log_monitor.html")
 
 def log_monitor_fetch(request: HttpRequest) -> JsonResponse:
+    """
+    Tail of a log. Pass the returned offset and inode back to receive only
+    the lines added since, reset in the response means start over.
+    """
     try:
         log_type = request.GET.get("log_type", "monitors")
         log_tail = int(request.GET.get("log_tail", 50))
-        from datetime import datetime
+        offset = request.GET.get("offset")
+        inode = request.GET.get("inode")
         server_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        log_content = LogService.get_log_content(log_type, log_tail)
-        return JsonResponse({"log_content": log_content, "server_timestamp": server_timestamp}, safe=False)
+
+        update = LogService.get_log_update(
+            log_type, log_tail, int(offset) if offset else None, int(inode) if inode else None
+        )
+        return JsonResponse({**update, "server_timestamp": server_timestamp}, safe=False)
     except Exception as e:
         return JsonResponse({
             "error": str(e),
@@ -194,7 +399,9 @@ def admin_tools(request: HttpRequest) -> Any:
 def admin_tools_monitor_status(request: HttpRequest) -> JsonResponse:
     try:
         monitor_type = request.GET.get('monitor_type', 'icmp')
-        status_data = MonitorService.get_monitor_status(monitor_type)
+        shard = int(request.GET.get('shard', 0))
+        time_range_resolution_code = int(request.GET.get('time_range_resolution_code', 1))
+        status_data = MonitorService.get_monitor_status(monitor_type, shard, time_range_resolution_code)
         return JsonResponse(status_data, safe=False)
     except MonitorStatus.DoesNotExist:
         return JsonResponse({